@@ -0,0 +1,6 @@
+-- Apply by hand to a database created before keyset pagination: create_all() only creates missing tables, not the indexes of the existing ones
+CREATE INDEX ix_challenge_kind_active_created_at_id ON challenge (kind, active, created_at, id);
+CREATE INDEX ix_game_started_at_id ON game (started_at, id);
+CREATE INDEX ix_playerfollowedplayer_followed_since ON playerfollowedplayer (followed_login, follows_since, follower_login);
+CREATE INDEX ix_playerfollowedplayer_follower_since ON playerfollowedplayer (follower_login, follows_since, followed_login);
+CREATE INDEX ix_study_created_at_id ON study (created_at, id);
@@ -1,5 +1,4 @@
 from datetime import UTC, datetime
-from secrets import token_hex
 from fastapi import APIRouter, HTTPException
 from fastapi.routing import APIRoute
 
@@ -24,8 +23,7 @@ router = APIRouter(prefix="/auth", route_class=route_class)
 
 @router.post("/guest", response_model=GuestTokenResponse)
 async def guest(state: MutableStateDependency):
-    token = token_hex()
-    guest_id = state.add_guest(token)
+    guest_id, token = await state.add_guest()
     return GuestTokenResponse(guest_id=guest_id, token=token)
 
 
@@ -37,8 +35,7 @@ async def signin(*, credentials: AuthCredentials, session: SessionDependency, st
         raise HTTPException(status_code=404, detail="User not found")
     if password_data.password_hash != bcrypt.hashpw(credentials.password, password_data.salt):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = token_hex()
-    state.add_logged(token, login)
+    token = state.add_logged(login)
     return TokenResponse(token=token)
 
 
@@ -66,8 +63,7 @@ async def register(*, credentials: AuthCredentials, session: SessionDependency,
     session.add(password)
     await session.commit()
 
-    token = token_hex()
-    state.add_logged(token, login)
+    token = state.add_logged(login)
     return TokenResponse(token=token)
 
 
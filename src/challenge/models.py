@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import TYPE_CHECKING, Literal, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from src.challenge.datatypes import ChallengeAcceptorColor, ChallengeKind
@@ -18,6 +19,10 @@ class ChallengeBase(CustomSQLModel):
 
 
 class Challenge(ChallengeBase, table=True):
+    __table_args__ = (
+        Index("ix_challenge_kind_active_created_at_id", "kind", "active", "created_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     created_at: CurrentDatetime
     caller_ref: PlayerRef
@@ -104,7 +109,7 @@ class ChallengePublic(ChallengeBase):
 class ChallengeCreateResponse(CustomModel):
     result: Literal["created", "merged"]
     challenge: ChallengePublic | None = None
-    callee_online: bool | None = None
+    callee_online: bool | None = None  # Whether the callee watches their incoming challenges; omitted if unknown (several workers share the connections)
     game: game_models.GamePublic | None = None
 
 
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException, Query, Response
+from sqlmodel import desc, select
 from src.challenge.datatypes import ChallengeKind
 from src.challenge.methods.get import get_direct_challenges
 from src.challenge.methods.merge import try_merging
@@ -7,8 +7,9 @@ from src.challenge.methods.validation import perform_common_validations, validat
 from src.challenge.methods.update import cancel_challenge as cancel_specific_challenge
 from src.challenge.models import Challenge, ChallengeCreateDirect, ChallengeCreateOpen, ChallengeCreateResponse, ChallengePublic
 from src.challenge.methods.cast import to_public_challenge
-from src.common.dependencies import MainConfigDependency, MandatoryUserDependency, MutableStateDependency, SecretConfigDependency, SessionDependency
+from src.common.dependencies import KeysetCursorDependency, MainConfigDependency, MandatoryUserDependency, MutableStateDependency, SecretConfigDependency, SessionDependency
 from src.common.models import Id
+from src.common.pagination import set_next_cursor
 from src.net.base_router import LoggingRoute
 from src.net.utils.early_response import supports_early_responses
 from src.pubsub.models.channel import IncomingChallengesEventChannel, OutgoingChallengesEventChannel, PublicChallengeListEventChannel
@@ -67,11 +68,13 @@ async def create_direct_challenge(
     secret_config: SecretConfigDependency
 ):
     await perform_common_validations(challenge, caller, state.shutdown_activated, main_config.limits, session)
-    callee = await validate_direct_callee(challenge, caller, state.last_guest_id, session)
+    callee = await validate_direct_callee(challenge, caller, await state.get_last_guest_id(), session)
     await try_merging(challenge, caller, session, state, secret_config)
 
     direct_challenges_observer_channel = IncomingChallengesEventChannel(user_ref=challenge.callee_ref)
-    callee_online = state.has_user_subscriber(callee, direct_challenges_observer_channel)
+    callee_online = None  # Unknown: the connections are only tracked per worker, and the callee's may be held by another one
+    if not state.ws_subscribers.backplane.has_peers:
+        callee_online = state.has_user_subscriber(callee, direct_challenges_observer_channel)
 
     db_challenge = challenge.to_db_challenge(caller.reference)
     session.add(db_challenge)
@@ -86,17 +89,32 @@ async def create_direct_challenge(
 
 
 @router.get("/public", response_model=list[ChallengePublic])
-async def get_public_challenges(*, session: SessionDependency, offset: int = 0, limit: int = Query(default=50, le=50)):
-    challenges_result = await session.exec(select(
+async def get_public_challenges(
+    *,
+    session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
+    offset: int = 0,
+    limit: int = Query(default=50, le=50)
+):
+    query = select(
         Challenge
     ).where(
         Challenge.active == True,  # noqa
         Challenge.kind == ChallengeKind.PUBLIC
+    )
+    if cursor:
+        query = query.where(cursor.construct_condition(Challenge.created_at, Challenge.id))
+    challenges_result = await session.exec(query.order_by(
+        desc(Challenge.created_at),
+        desc(Challenge.id)
     ).offset(offset).limit(limit))
+    challenges = challenges_result.all()
 
+    set_next_cursor(response, challenges, limit, lambda challenge: (challenge.created_at, challenge.id))
     return [
         await to_public_challenge(session, challenge)
-        for challenge in challenges_result.all()
+        for challenge in challenges
     ]
 
 
@@ -0,0 +1,104 @@
+from argparse import ArgumentParser
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import col, func, select
+
+from src.common.sql import count_if
+from src.common.time_control import TimeControlKind
+from src.config.loader import load
+from src.config.models import MainConfig, SecretConfig
+from src.game.datatypes import OutcomeKind
+from src.game.models.main import Game
+from src.game.models.outcome import GameOutcome
+from src.player.models import Player, PlayerEloProgress, PlayerStats
+from src.rules.piece import PieceColor
+from src.utils.async_orm_session import AsyncSession
+
+import asyncio
+import src.net.core  # noqa: F401  # Registers every table model
+
+
+async def collect_player_stats(session: AsyncSession, calibration_games: int) -> list[PlayerStats]:
+    stats: dict[tuple[str, TimeControlKind], PlayerStats] = {}
+
+    for color, player_ref_column in ((PieceColor.WHITE, Game.white_player_ref), (PieceColor.BLACK, Game.black_player_ref)):
+        result = await session.exec(select(
+            player_ref_column,
+            Game.time_control_kind,
+            func.count(col(Game.id)),
+            count_if(GameOutcome.winner == color),
+            count_if(GameOutcome.winner == color.opposite()),
+            count_if(GameOutcome.winner == None),  # noqa
+            count_if(Game.rated == True)  # noqa
+        ).join(
+            GameOutcome,
+            col(GameOutcome.game_id) == col(Game.id)
+        ).join(
+            Player,
+            col(Player.login) == col(player_ref_column)
+        ).where(
+            GameOutcome.kind != OutcomeKind.ABORT
+        ).group_by(
+            player_ref_column,
+            Game.time_control_kind
+        ))
+
+        for login, time_control_kind, games_cnt, wins, losses, draws, ranked_games_played in result:
+            time_control_kind = TimeControlKind(time_control_kind)
+            stats_entry = stats.setdefault((login, time_control_kind), PlayerStats(login=login, time_control_kind=time_control_kind))
+            stats_entry.games_cnt += int(games_cnt)
+            stats_entry.wins += int(wins)
+            stats_entry.losses += int(losses)
+            stats_entry.draws += int(draws)
+            stats_entry.ranked_games_played += int(ranked_games_played)
+
+    latest_elo_entry_ids = select(
+        func.max(PlayerEloProgress.id)
+    ).group_by(
+        PlayerEloProgress.login,
+        PlayerEloProgress.time_control_kind
+    )
+    elo_entries = await session.exec(select(
+        PlayerEloProgress
+    ).where(
+        col(PlayerEloProgress.id).in_(latest_elo_entry_ids)
+    ))
+    for elo_entry in elo_entries:
+        key = (elo_entry.login, elo_entry.time_control_kind)
+        stats_entry = stats.setdefault(key, PlayerStats(login=elo_entry.login, time_control_kind=elo_entry.time_control_kind))
+        stats_entry.elo = elo_entry.elo
+        stats_entry.ranked_games_played = elo_entry.ranked_games_played
+
+    for stats_entry in stats.values():
+        stats_entry.is_elo_provisional = stats_entry.ranked_games_played < calibration_games
+
+    return list(stats.values())
+
+
+async def rebuild_player_stats(session: AsyncSession, calibration_games: int) -> int:
+    stats = await collect_player_stats(session, calibration_games)
+    await session.exec(delete(PlayerStats))  # type: ignore
+    session.add_all(stats)
+    await session.commit()
+    return len(stats)
+
+
+async def backfill_player_stats() -> None:
+    calibration_games = load('main', MainConfig).elo.calibration_games
+    engine = create_async_engine(load('secret', SecretConfig).db.url)
+    try:
+        async with AsyncSession(engine) as session:
+            stats_cnt = await rebuild_player_stats(session, calibration_games)
+            print(f"Rebuilt {stats_cnt} player stats entries")
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Rebuilds the PlayerStats table from the whole game and Elo history")
+    parser.parse_args()
+    asyncio.run(backfill_player_stats())
+
+
+if __name__ == "__main__":
+    main()
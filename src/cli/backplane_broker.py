@@ -0,0 +1,93 @@
+from argparse import ArgumentParser
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from src.config.loader import load
+from src.config.models import MainConfig
+from src.net.resp import RESPError, RESPValue, encode_value, read_value
+
+import asyncio
+
+
+class Broker:  # The subset of Redis the backplane relies on: PUBLISH/SUBSCRIBE and integer counters
+    def __init__(self) -> None:
+        self._subscribers: defaultdict[bytes, set[asyncio.StreamWriter]] = defaultdict(set)
+        self._values: dict[bytes, int] = {}
+
+    def _increment(self, key: bytes, delta: int) -> int:
+        self._values[key] = self._values.get(key, 0) + delta
+        return self._values[key]
+
+    def _execute(self, command: list[bytes]) -> RESPValue | RESPError:
+        name, args = command[0].upper(), command[1:]
+        match name, len(args):
+            case b'PING', 0:
+                return b'PONG'
+            case b'PUBLISH', 2:
+                topic, message = args
+                publication = encode_value([b'message', topic, message])
+                for subscriber in self._subscribers.get(topic, ()):
+                    subscriber.write(publication)
+                return len(self._subscribers.get(topic, ()))
+            case b'INCR', 1:
+                return self._increment(args[0], 1)
+            case b'INCRBY', 2:
+                return self._increment(args[0], int(args[1]))
+            case b'GET', 1:
+                value = self._values.get(args[0])
+                return str(value).encode() if value is not None else None
+            case _:
+                return RESPError(f"Unsupported command: {name.decode(errors='replace')} with {len(args)} arguments")
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscribed_topics: list[bytes] = []
+        try:
+            while True:
+                command = await read_value(reader)
+                if not isinstance(command, list) or not command or not all(isinstance(arg, bytes) for arg in command):
+                    writer.write(encode_value(RESPError("Commands must be arrays of bulk strings")))
+                elif command[0].upper() == b'SUBSCRIBE':  # Unlike the other commands, gets one reply per topic
+                    for topic in command[1:]:
+                        assert isinstance(topic, bytes)
+                        self._subscribers[topic].add(writer)
+                        subscribed_topics.append(topic)
+                        writer.write(encode_value([b'subscribe', topic, len(subscribed_topics)]))
+                else:
+                    writer.write(encode_value(self._execute(command)))  # type: ignore
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for topic in subscribed_topics:
+                self._subscribers[topic].discard(writer)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+            writer.close()
+
+
+async def serve(socket_path: Path) -> None:
+    socket_path.unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(Broker().serve_client, path=str(socket_path))
+    print(f"Backplane broker listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Runs the local broker connecting the worker processes whose backplane kind is 'broker'")
+    parser.add_argument("--socket", type=Path, help="Defaults to the path from backplane.broker_url in the main config")
+    args = parser.parse_args()
+
+    socket_path = args.socket
+    if not socket_path:
+        broker_url = urlsplit(load('main', MainConfig).backplane.broker_url)
+        if broker_url.scheme != "unix":
+            parser.error("The configured broker is not a Unix socket, pass --socket explicitly or point the workers at that broker instead")
+        socket_path = Path(broker_url.path)
+
+    asyncio.run(serve(socket_path))
+
+
+if __name__ == "__main__":
+    main()
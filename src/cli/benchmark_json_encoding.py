@@ -0,0 +1,66 @@
+from argparse import ArgumentParser
+from typing import Callable
+
+from src.game.models.ply import GamePlyEventPublic
+from src.pubsub.models.channel import GameEventChannel
+from src.pubsub.outgoing_event.base import OutgoingEvent
+from src.pubsub.outgoing_event.refresh import GameRefresh
+from src.pubsub.outgoing_event.update import NewPly
+
+import json
+import time
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+
+def compose_game_refresh(ply_cnt: int) -> GameRefresh:
+    ply = NewPly.payload_example()
+    state = GameRefresh.payload_example()
+    state.events = [
+        GamePlyEventPublic(
+            occurred_at=ply.occurred_at,
+            ply_index=ply_index,
+            from_i=ply_index % 13,
+            from_j=ply_index % 11,
+            to_i=(ply_index + 1) % 13,
+            to_j=(ply_index + 2) % 11,
+            morph_into=ply.morph_into,
+            time_update=ply.time_update
+        )
+        for ply_index in range(ply_cnt)
+    ]
+    return GameRefresh(state)
+
+
+def measure(title: str, repeats: int, encode: Callable[[], str]) -> None:
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        encode()
+    elapsed = time.perf_counter() - started_at
+    print(f"  {title}: {elapsed / repeats * 1e6:.2f} us/event")
+
+
+def benchmark(event_name: str, event: OutgoingEvent, repeats: int) -> None:
+    assert json.loads(event.to_json()) == event.to_dict()
+    print(f"{event_name} ({len(event.to_json().encode())} bytes)")
+    measure("model_dump + stdlib json", repeats, lambda: json.dumps(event.to_dict(), ensure_ascii=False))
+    if orjson:
+        measure("model_dump + orjson", repeats, lambda: orjson.dumps(event.to_dict()).decode())
+    measure("model_dump_json", repeats, event.to_json)
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Compares the ways to serialize outgoing WebSocket events into JSON")
+    parser.add_argument("--plys", type=int, default=80, help="Plys in the refreshed game state")
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    benchmark("NewPly (PlyBroadcastedData)", NewPly(NewPly.payload_example(), GameEventChannel(game_id=123)), args.repeats * 10)
+    benchmark("GameRefresh (GameStateRefresh)", compose_game_refresh(args.plys), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from argparse import ArgumentParser
+from types import SimpleNamespace
+from typing import Callable
+
+from src.common.user_ref import UserReference
+from src.net.core import WebSocketWrapper
+from src.net.sub_storage import SubscriberStorage, SubscriberTag
+from src.pubsub.models.channel import EventChannel, EveryoneEventChannel, GameEventChannel
+
+import random
+import time
+
+
+def measure(title: str, operation_cnt: int, operation: Callable[[], object]) -> None:
+    started_at = time.perf_counter()
+    operation()
+    elapsed = time.perf_counter() - started_at
+    print(f"{title}: {elapsed:.3f}s, {operation_cnt / elapsed:.0f} ops/s")
+
+
+def benchmark(connection_cnt: int, channel_cnt: int, subscriptions_per_connection: int) -> None:
+    rng = random.Random(0)
+    storage = SubscriberStorage()
+    connections = []
+    for index in range(connection_cnt):
+        connection = WebSocketWrapper(app=None, ws=SimpleNamespace(send_json=None), last_activity=0, last_message=0)  # type: ignore  # Never sends anything
+        connection.saved_user = UserReference.guest(index)
+        connections.append(connection)
+    channels: list[EventChannel] = [GameEventChannel(game_id=game_id) for game_id in range(channel_cnt)]
+    subscriptions = [
+        (connection, rng.choice(channels), {SubscriberTag.PARTICIPATING_PLAYER} if rng.random() < 0.05 else set())
+        for connection in connections
+        for _ in range(subscriptions_per_connection)
+    ]
+    probes = [(rng.choice(connections), rng.choice(channels)) for _ in range(connection_cnt)]
+
+    def subscribe_all() -> None:
+        for connection in connections:
+            storage.subscribe(connection, EveryoneEventChannel())
+        for connection, channel, tags in subscriptions:
+            storage.subscribe(connection, channel, tags)
+
+    def probe_users() -> None:
+        for connection, channel in probes:
+            if connection.saved_user:
+                storage.has_user_subscriber(connection.saved_user, channel)
+
+    def probe_subscriptions() -> None:
+        for connection, _ in probes:
+            storage.get_subscriptions(connection)
+
+    def select_players() -> None:
+        for channel in channels:
+            storage._select_recipients(channel, {SubscriberTag.PARTICIPATING_PLAYER}, None)
+
+    def remove_all() -> None:
+        for connection in connections:
+            storage.fully_remove(connection)
+
+    print(f"{connection_cnt} connections, {channel_cnt} channels, {len(subscriptions)} subscriptions")
+    measure("Subscription", connection_cnt + len(subscriptions), subscribe_all)
+    measure("User lookup in a channel", len(probes), probe_users)
+    measure("Subscriptions of a connection", len(probes), probe_subscriptions)
+    measure("Participating players of a channel", len(channels), select_players)
+    measure("Full removal", connection_cnt, remove_all)
+    print(f"Channels left after the removal: {len(storage._channel_subscribers)}")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Measures the SubscriberStorage operations on a synthetic population of connections")
+    parser.add_argument("--connections", type=int, default=100000)
+    parser.add_argument("--channels", type=int, default=50000)
+    parser.add_argument("--subscriptions", type=int, default=3, help="Game channel subscriptions per connection")
+    args = parser.parse_args()
+    benchmark(args.connections, args.channels, args.subscriptions)
+
+
+if __name__ == "__main__":
+    main()
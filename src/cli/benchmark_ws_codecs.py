@@ -0,0 +1,60 @@
+from argparse import ArgumentParser
+from typing import Callable
+
+from src.net.codec import JSON_CODEC, MSGPACK_CODEC, WebSocketCodec
+from src.pubsub.models.channel import GameEventChannel
+from src.pubsub.outgoing_event.base import OutgoingEvent
+from src.pubsub.outgoing_event.update import GameEnded, NewChatMessage, NewPly, OfferActionPerformed, TimeAdded
+from src.rules.piece import PieceColor
+
+import time
+
+
+def compose_game_event_stream(ply_cnt: int) -> list[dict]:
+    channel = GameEventChannel(game_id=123)
+    events: list[OutgoingEvent] = []
+    for ply_index in range(ply_cnt):
+        ply = NewPly.payload_example()
+        ply.ply_index = ply_index
+        ply.from_i, ply.from_j, ply.to_i, ply.to_j = ply_index % 13, ply_index % 11, (ply_index + 1) % 13, (ply_index + 2) % 11
+        ply.time_update.white_ms -= ply_index * 1500
+        ply.time_update.black_ms -= ply_index * 1400
+        ply.time_update.ticking_side = PieceColor.WHITE if ply_index % 2 else PieceColor.BLACK
+        events.append(NewPly(ply, channel))
+        if ply_index % 20 == 10:
+            events.append(NewChatMessage(NewChatMessage.payload_example(), channel))
+        if ply_index % 30 == 15:
+            events.append(TimeAdded(TimeAdded.payload_example(), channel))
+    events.append(OfferActionPerformed(OfferActionPerformed.payload_example(), channel))
+    events.append(GameEnded(GameEnded.payload_example(), channel))
+    return [event.to_dict() for event in events]
+
+
+def measure(codec_name: str, codec: WebSocketCodec, messages: list[dict], repeats: int) -> None:
+    encode: Callable[[dict], str | bytes] = codec.encode
+    frames = [encode(message) for message in messages]
+    total_bytes = sum(len(frame.encode() if isinstance(frame, str) else frame) for frame in frames)
+
+    started_at = time.perf_counter()
+    for _ in range(repeats):
+        for message in messages:
+            encode(message)
+    elapsed = time.perf_counter() - started_at
+
+    print(f"{codec_name}: {total_bytes} bytes, {total_bytes / len(messages):.1f} bytes/event, {elapsed / (repeats * len(messages)) * 1e6:.2f} us/event to encode")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Compares the JSON and MessagePack WebSocket encodings on a synthetic game's event stream")
+    parser.add_argument("--plys", type=int, default=80)
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    messages = compose_game_event_stream(args.plys)
+    print(f"{len(messages)} events")
+    measure("JSON", JSON_CODEC, messages, args.repeats)
+    measure("MessagePack", MSGPACK_CODEC, messages, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
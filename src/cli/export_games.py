@@ -0,0 +1,50 @@
+from argparse import ArgumentParser
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.common.time_control import TimeControlKind
+from src.config.loader import load
+from src.config.models import SecretConfig
+from src.game.methods.export import generate_ndjson_export
+from src.game.models.rest import GameExportFilter
+from src.utils.async_orm_session import AsyncSession
+
+import asyncio
+import sys
+import src.net.core  # noqa: F401  # Registers every table model
+
+
+async def export_games(export_filter: GameExportFilter, output_path: Path | None) -> None:
+    engine = create_async_engine(load('secret', SecretConfig).db.url)
+    output = output_path.open('w', encoding='utf-8') if output_path else sys.stdout
+    try:
+        async with AsyncSession(engine) as session:
+            async for line in generate_ndjson_export(session, export_filter):
+                output.write(line)
+    finally:
+        if output_path:
+            output.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Exports finished games as NDJSON, one game per line")
+    parser.add_argument("--player", help="Only include games of this player")
+    parser.add_argument("--time-control", type=TimeControlKind, choices=list(TimeControlKind))
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Only include games started at or after this ISO datetime")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Only include games started before this ISO datetime")
+    parser.add_argument("--output", type=Path, help="Output file (defaults to stdout)")
+    args = parser.parse_args()
+
+    export_filter = GameExportFilter(
+        player_ref=args.player,
+        time_control_kind=args.time_control,
+        started_after=args.since,
+        started_before=args.until
+    )
+    asyncio.run(export_games(export_filter, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from datetime import datetime
+from sqlalchemy import delete, insert, tuple_
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import col, select
+
+from src.cli.backfill_player_stats import rebuild_player_stats
+from src.common.time_control import TimeControlKind
+from src.common.user_ref import UserReference
+from src.config.loader import load
+from src.config.models import EloParams, MainConfig, SecretConfig
+from src.game.datatypes import OutcomeKind
+from src.game.models.main import Game
+from src.game.models.outcome import GameOutcome
+from src.player.models import PlayerEloProgress
+from src.rules.piece import PieceColor
+from src.utils.async_orm_session import AsyncSession
+
+import asyncio
+import time
+import numpy as np
+import numpy.typing as npt
+import src.net.core  # noqa: F401  # Registers every table model
+
+
+type IntArray = npt.NDArray[np.int64]
+type FloatArray = npt.NDArray[np.float64]
+
+
+@dataclass
+class RatedGameHistory:
+    game_ids: IntArray
+    ended_at: list[datetime]
+    white_slots: IntArray  # A slot is a (login, time control kind) pair, i.e. a single rating
+    black_slots: IntArray
+    white_scores: FloatArray
+    slot_keys: list[tuple[str, TimeControlKind]]
+
+
+@dataclass
+class RecomputedRatings:
+    white_elo: IntArray
+    white_delta: IntArray
+    white_games: IntArray
+    black_elo: IntArray
+    black_delta: IntArray
+    black_games: IntArray
+
+
+async def load_rated_game_history(session: AsyncSession, batch_size: int = 50000) -> RatedGameHistory:
+    slot_by_key: dict[tuple[str, TimeControlKind], int] = {}
+    game_id_chunks: list[IntArray] = []
+    white_slot_chunks: list[IntArray] = []
+    black_slot_chunks: list[IntArray] = []
+    white_score_chunks: list[FloatArray] = []
+    ended_at: list[datetime] = []
+
+    last_key: tuple[datetime, int] | None = None
+    while True:
+        query = select(
+            Game.id,
+            Game.white_player_ref,
+            Game.black_player_ref,
+            Game.time_control_kind,
+            GameOutcome.winner,
+            GameOutcome.game_ended_at
+        ).join(
+            GameOutcome,
+            col(GameOutcome.game_id) == col(Game.id)
+        ).where(
+            Game.rated == True,  # noqa
+            GameOutcome.kind != OutcomeKind.ABORT
+        )
+        if last_key:
+            query = query.where(tuple_(GameOutcome.game_ended_at, Game.id) > tuple_(*last_key))
+        result = await session.exec(query.order_by(
+            col(GameOutcome.game_ended_at),
+            col(Game.id)
+        ).limit(
+            batch_size
+        ))
+        rows = result.all()
+        if not rows:
+            break
+
+        game_ids, white_slots, black_slots, white_scores = [], [], [], []
+        for game_id, white_ref, black_ref, time_control_kind, winner, game_ended_at in rows:
+            if not UserReference(white_ref).is_player() or not UserReference(black_ref).is_player():
+                continue
+            time_control_kind = TimeControlKind(time_control_kind)
+            game_ids.append(game_id)
+            white_slots.append(slot_by_key.setdefault((white_ref, time_control_kind), len(slot_by_key)))
+            black_slots.append(slot_by_key.setdefault((black_ref, time_control_kind), len(slot_by_key)))
+            white_scores.append(0.5 if winner is None else float(winner == PieceColor.WHITE))
+            ended_at.append(game_ended_at)
+
+        game_id_chunks.append(np.array(game_ids, dtype=np.int64))
+        white_slot_chunks.append(np.array(white_slots, dtype=np.int64))
+        black_slot_chunks.append(np.array(black_slots, dtype=np.int64))
+        white_score_chunks.append(np.array(white_scores, dtype=np.float64))
+
+        last_game_id, *_, last_ended_at = rows[-1]
+        last_key = (last_ended_at, last_game_id)
+
+    return RatedGameHistory(
+        game_ids=np.concatenate(game_id_chunks) if game_id_chunks else np.empty(0, dtype=np.int64),
+        ended_at=ended_at,
+        white_slots=np.concatenate(white_slot_chunks) if white_slot_chunks else np.empty(0, dtype=np.int64),
+        black_slots=np.concatenate(black_slot_chunks) if black_slot_chunks else np.empty(0, dtype=np.int64),
+        white_scores=np.concatenate(white_score_chunks) if white_score_chunks else np.empty(0, dtype=np.float64),
+        slot_keys=list(slot_by_key)
+    )
+
+
+def assign_levels(white_slots: IntArray, black_slots: IntArray, slot_cnt: int) -> IntArray:
+    # A game only depends on the previous games of its two players, so it can be processed one level
+    # after the latest of those. All games sharing a level are independent and are updated together
+    last_level = [-1] * slot_cnt
+    levels = []
+    for white_slot, black_slot in zip(white_slots.tolist(), black_slots.tolist()):
+        level = max(last_level[white_slot], last_level[black_slot]) + 1
+        last_level[white_slot] = last_level[black_slot] = level
+        levels.append(level)
+    return np.array(levels, dtype=np.int64)
+
+
+def get_k_factors(ranked_games_played: IntArray, params: EloParams) -> FloatArray:
+    if params.calibration_games > 0:
+        calibration_progress = np.minimum(ranked_games_played / params.calibration_games, 1)
+    else:
+        calibration_progress = np.ones(len(ranked_games_played))
+    return 2 ** (params.max_log_slope - (params.max_log_slope - params.normal_log_slope) * calibration_progress)
+
+
+def recompute_ratings(white_slots: IntArray, black_slots: IntArray, white_scores: FloatArray, slot_cnt: int, params: EloParams) -> RecomputedRatings:
+    game_cnt = len(white_slots)
+    elo = np.full(slot_cnt, params.default, dtype=np.int64)
+    games_played = np.zeros(slot_cnt, dtype=np.int64)
+    ratings = RecomputedRatings(*(np.empty(game_cnt, dtype=np.int64) for _ in range(6)))
+
+    levels = assign_levels(white_slots, black_slots, slot_cnt)
+    order = np.argsort(levels, kind='stable')
+    level_bounds = np.flatnonzero(np.diff(levels[order])) + 1
+
+    for batch in np.split(order, level_bounds):
+        white, black = white_slots[batch], black_slots[batch]
+        white_elo, black_elo = elo[white], elo[black]
+
+        white_expected = 1 / (1 + 10 ** ((black_elo - white_elo) / 400))
+        white_delta = np.rint(get_k_factors(games_played[white], params) * (white_scores[batch] - white_expected)).astype(np.int64)
+        black_delta = np.rint(get_k_factors(games_played[black], params) * (white_expected - white_scores[batch])).astype(np.int64)
+
+        elo[white] = white_elo + white_delta
+        elo[black] = black_elo + black_delta
+        games_played[white] += 1
+        games_played[black] += 1
+
+        ratings.white_elo[batch], ratings.white_delta[batch], ratings.white_games[batch] = elo[white], white_delta, games_played[white]
+        ratings.black_elo[batch], ratings.black_delta[batch], ratings.black_games[batch] = elo[black], black_delta, games_played[black]
+
+    return ratings
+
+
+async def rewrite_elo_progress(session: AsyncSession, history: RatedGameHistory, ratings: RecomputedRatings, batch_size: int = 10000) -> None:
+    await session.exec(delete(PlayerEloProgress))  # type: ignore
+
+    for start in range(0, len(history.game_ids), batch_size):
+        entries = []
+        for game_index in range(start, min(start + batch_size, len(history.game_ids))):
+            for slots, elo, delta, games in (
+                (history.white_slots, ratings.white_elo, ratings.white_delta, ratings.white_games),
+                (history.black_slots, ratings.black_elo, ratings.black_delta, ratings.black_games),
+            ):
+                login, time_control_kind = history.slot_keys[slots[game_index]]
+                entries.append(dict(
+                    login=login,
+                    ts=history.ended_at[game_index],
+                    time_control_kind=time_control_kind,
+                    elo=int(elo[game_index]),
+                    delta=int(delta[game_index]),
+                    causing_game_id=int(history.game_ids[game_index]),
+                    ranked_games_played=int(games[game_index])
+                ))
+        await session.exec(insert(PlayerEloProgress), params=entries)  # type: ignore
+
+    await session.commit()
+
+
+async def recompute_elo(dry_run: bool) -> None:
+    elo_params = load('main', MainConfig).elo
+    engine = create_async_engine(load('secret', SecretConfig).db.url)
+    try:
+        async with AsyncSession(engine) as session:
+            history = await load_rated_game_history(session)
+            started_at = time.perf_counter()
+            ratings = recompute_ratings(history.white_slots, history.black_slots, history.white_scores, len(history.slot_keys), elo_params)
+            print(f"Recomputed {len(history.game_ids)} games for {len(history.slot_keys)} ratings in {time.perf_counter() - started_at:.2f}s")
+
+            if dry_run:
+                return
+
+            await rewrite_elo_progress(session, history, ratings)
+            stats_cnt = await rebuild_player_stats(session, elo_params.calibration_games)
+            print(f"Rewrote the Elo history and rebuilt {stats_cnt} player stats entries")
+    finally:
+        await engine.dispose()
+
+
+def benchmark(game_cnt: int, player_cnt: int) -> None:
+    elo_params = load('main', MainConfig).elo
+    rng = np.random.default_rng(0)
+    white_slots = rng.integers(0, player_cnt, game_cnt)
+    black_slots = (white_slots + rng.integers(1, player_cnt, game_cnt)) % player_cnt
+    white_scores = rng.choice(np.array([0, 0.5, 1]), game_cnt, p=[0.45, 0.1, 0.45])
+
+    started_at = time.perf_counter()
+    levels = assign_levels(white_slots, black_slots, player_cnt)
+    leveled_at = time.perf_counter()
+    recompute_ratings(white_slots, black_slots, white_scores, player_cnt, elo_params)
+    finished_at = time.perf_counter()
+
+    print(f"{game_cnt} games, {player_cnt} players, {levels.max() + 1} levels")
+    print(f"Level assignment: {leveled_at - started_at:.2f}s")
+    print(f"Full recomputation (levels included): {finished_at - leveled_at:.2f}s, {game_cnt / (finished_at - leveled_at):.0f} games/s")
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Recomputes every rating from scratch over the whole rated game history")
+    parser.add_argument("--dry-run", action="store_true", help="Only recompute and report the timing, leaving the database intact")
+    parser.add_argument("--benchmark", type=int, metavar="GAMES", help="Run on a synthetic history of this many games instead of the database")
+    parser.add_argument("--players", type=int, default=50000, help="Number of players in the synthetic history")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.players)
+    else:
+        asyncio.run(recompute_elo(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,2 @@
 USER_TOKEN_HEADER = "intellector-user-token"
+NEXT_CURSOR_HEADER = "x-next-cursor"
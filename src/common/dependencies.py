@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, Request
 from fastapi.security import APIKeyHeader
 
 from src.common.constants import USER_TOKEN_HEADER
+from src.common.pagination import KeysetCursor
 from src.common.user_ref import UserReference
 from src.config.models import MainConfig, SecretConfig
 from src.net.core import App, MutableState
@@ -52,8 +53,20 @@ async def get_secret_config(app: AppDependency) -> SecretConfig:
 SecretConfigDependency = Annotated[SecretConfig, Depends(get_secret_config)]
 
 
+async def get_keyset_cursor(after: str | None = None) -> KeysetCursor | None:
+    if after is None:
+        return None
+    try:
+        return KeysetCursor.decode(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+KeysetCursorDependency = Annotated[KeysetCursor | None, Depends(get_keyset_cursor)]
+
+
 async def get_mandatory_user(state: MutableStateDependency, token: UserTokenHeaderDependency) -> UserReference:
-    user = state.token_to_user.get(token)
+    user = state.tokens.verify(token)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
     return user
@@ -63,7 +76,7 @@ MandatoryUserDependency = Annotated[UserReference, Depends(get_mandatory_user)]
 
 
 async def get_mandatory_player_login(state: MutableStateDependency, token: UserTokenHeaderDependency) -> str:
-    client = state.token_to_user.get(token)
+    client = state.tokens.verify(token)
     if not client:
         raise HTTPException(status_code=401, detail="Invalid token")
     if client.is_guest():
@@ -75,13 +88,13 @@ MandatoryPlayerLoginDependency = Annotated[str, Depends(get_mandatory_player_log
 
 
 async def verify_admin(client_login: MandatoryPlayerLoginDependency, session: SessionDependency) -> None:
-    if not session.get(player_models.PlayerRole, (player_datatypes.UserRole.ADMIN, client_login)):
+    if not await session.get(player_models.PlayerRole, (player_datatypes.UserRole.ADMIN, client_login)):
         raise HTTPException(status_code=403, detail="Forbidden")
 
 
 async def get_optional_player_login(state: MutableStateDependency, token: OptionalUserTokenHeaderDependency) -> str | None:
     if token is not None:
-        client = state.token_to_user.get(token)
+        client = state.tokens.verify(token)
         if not client:
             raise HTTPException(status_code=401, detail="Invalid token")
         if not client.is_guest():
@@ -0,0 +1,34 @@
+import base64
+
+from datetime import datetime
+from typing import Any, Callable, Self, Sequence
+from fastapi import Response
+from sqlalchemy import ColumnElement, tuple_
+
+from src.common.constants import NEXT_CURSOR_HEADER
+from src.utils.custom_model import CustomFrozenModel
+
+
+class KeysetCursor(CustomFrozenModel):
+    ts: datetime
+    id: int | str
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> Self:
+        padded_token = token + "=" * (-len(token) % 4)
+        return cls.model_validate_json(base64.urlsafe_b64decode(padded_token))
+
+    def construct_condition(self, ts_column: Any, id_column: Any) -> ColumnElement[bool]:
+        # Listings are ordered by (ts, id) descending, so the next page starts strictly below the cursor
+        return tuple_(ts_column, id_column) < tuple_(self.ts, self.id)
+
+
+def set_next_cursor[T](response: Response, page: Sequence[T], limit: int, key: Callable[[T], tuple[datetime, int | str | None]]) -> None:
+    if len(page) < limit:
+        return
+    last_ts, last_id = key(page[-1])
+    if last_id is not None:
+        response.headers[NEXT_CURSOR_HEADER] = KeysetCursor(ts=last_ts, id=last_id).encode()
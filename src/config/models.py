@@ -1,3 +1,4 @@
+from src.net.datatypes import BackplaneKind, OutboundOverflowPolicy
 from src.utils.custom_model import CustomModel
 
 
@@ -17,6 +18,47 @@ class RuleParams(CustomModel):
     secs_added_manually: int
 
 
+class LagCompensationParams(CustomModel):
+    max_credit_ms: int
+
+
+class LogWriterParams(CustomModel):
+    queue_size: int
+    batch_size: int
+    flush_interval_ms: int
+
+
+class LogParams(CustomModel):
+    writer: LogWriterParams
+    ws_sample_rate: float
+    rest_default_sample_rate: float
+    rest_route_sample_rates: dict[str, float] = {}  # Keyed by route path template, e.g. "/game/{game_id}"
+    rest_logged_headers: list[str] = []  # Lowercase
+
+
+class OutboundParams(CustomModel):
+    queue_size: int
+    overflow_policy: OutboundOverflowPolicy
+    batch_window_us: int  # For the connections opted into batching; 0 packs only what is queued within the same event loop tick
+    max_batch_size: int
+
+
+class BackplaneParams(CustomModel):
+    kind: BackplaneKind
+    broker_url: str  # unix:///path/to/socket or redis://host:port
+    topic: str
+    guest_id_key: str
+
+
+class ShardingParams(CustomModel):
+    shard_cnt: int  # Worker processes owning games, each started with its own SHARD_INDEX environment variable
+
+
+class AuthParams(CustomModel):
+    token_ttl_hours: int
+    revoked_token_ids: list[str] = []  # Signed tokens can't be taken back otherwise; an entry may be dropped once the token expires
+
+
 class LimitParams(CustomModel):
     max_total_active_challenges: int
     max_same_callee_active_challenges: int
@@ -28,7 +70,13 @@ class MainConfig(CustomModel):
     keep_alive: KeepAliveParams
     elo: EloParams
     rules: RuleParams
+    lag_compensation: LagCompensationParams
     limits: LimitParams
+    logging: LogParams
+    outbound: OutboundParams
+    backplane: BackplaneParams
+    sharding: ShardingParams
+    auth: AuthParams
 
 
 class DBParams(CustomModel):
@@ -68,7 +116,13 @@ class SSLParams(CustomModel):
     key_path: str
 
 
+class TokenSigningParams(CustomModel):
+    keys: dict[str, str]  # Key ID -> secret; a retired key is kept until the tokens signed with it expire
+    active_key_id: str
+
+
 class SecretConfig(CustomModel):
     db: DBParams
     integrations: IntegrationParams
     ssl: SSLParams | None = None
+    token_signing: TokenSigningParams | None = None  # Mandatory with a broker backplane; otherwise a random key is generated at startup, so the tokens are only valid in this process until it restarts
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from src.game.exceptions import TimeoutReachedException
+from src.game.models.time_update import GameTimeUpdate, GameTimeUpdateReason
+from src.rules.piece import PieceColor
+
+import time
+
+
+# The wall clock is sampled only once, all the later timestamps are derived from the monotonic counter,
+# so that NTP corrections can't make a player lose or gain time
+_REFERENCE_NS = time.monotonic_ns()
+_REFERENCE_DT = datetime.now(UTC)
+
+
+def monotonic_now() -> int:
+    return time.monotonic_ns()
+
+
+def to_datetime(monotonic_ns: int) -> datetime:
+    return _REFERENCE_DT + timedelta(microseconds=(monotonic_ns - _REFERENCE_NS) // 1000)
+
+
+def from_datetime(dt: datetime) -> int:
+    return _REFERENCE_NS + (dt - _REFERENCE_DT) // timedelta(microseconds=1) * 1000
+
+
+@dataclass
+class GameClock:
+    white_ms: int
+    black_ms: int
+    ticking_side: PieceColor | None
+    settled_at_ns: int  # Monotonic moment the remainders above are actual for
+
+    @classmethod
+    def from_time_update(cls, time_update: GameTimeUpdate) -> GameClock:
+        return cls(
+            white_ms=time_update.white_ms,
+            black_ms=time_update.black_ms,
+            ticking_side=time_update.ticking_side,
+            settled_at_ns=from_datetime(time_update.updated_at)
+        )
+
+    def get_remainders(self, now_ns: int) -> dict[PieceColor, int]:
+        remainders = {
+            PieceColor.WHITE: self.white_ms,
+            PieceColor.BLACK: self.black_ms
+        }
+        if self.ticking_side:
+            remainders[self.ticking_side] -= (now_ns - self.settled_at_ns) // 1_000_000
+        return remainders
+
+    def get_timeout_ns(self) -> int | None:
+        if not self.ticking_side:
+            return None
+        remaining_ms = self.white_ms if self.ticking_side == PieceColor.WHITE else self.black_ms
+        return self.settled_at_ns + remaining_ms * 1_000_000
+
+    def reset(self, white_ms: int, black_ms: int, ticking_side: PieceColor | None, now_ns: int) -> None:
+        self.white_ms = white_ms
+        self.black_ms = black_ms
+        self.ticking_side = ticking_side
+        self.settled_at_ns = now_ns
+
+    def settle(self, now_ns: int) -> None:
+        remainders = self.get_remainders(now_ns)
+        self.reset(remainders[PieceColor.WHITE], remainders[PieceColor.BLACK], self.ticking_side, now_ns)
+
+    def switch(self, now_ns: int, new_ply_index: int, color_to_move: PieceColor, timeout_grace_ms: int, lag_credit_ms: int = 0) -> None:
+        if self.ticking_side:
+            remaining_ms = self.get_remainders(now_ns)[self.ticking_side]
+            lag_credit_ms = min(lag_credit_ms, max((now_ns - self.settled_at_ns) // 1_000_000, 0))  # Never refund more than the ply actually took
+            if remaining_ms + lag_credit_ms <= -timeout_grace_ms:
+                raise TimeoutReachedException(winner=self.ticking_side.opposite(), reached_at=to_datetime(now_ns + remaining_ms * 1_000_000))
+
+            self.settle(now_ns)
+            if self.ticking_side == PieceColor.WHITE:
+                self.white_ms += lag_credit_ms
+            else:
+                self.black_ms += lag_credit_ms
+
+        self.settled_at_ns = now_ns
+        self.ticking_side = color_to_move if new_ply_index >= 1 else None
+
+    def add_time(self, receiver: PieceColor, ms_added: int, now_ns: int) -> None:
+        self.settle(now_ns)
+        if receiver == PieceColor.WHITE:
+            self.white_ms += ms_added
+        else:
+            self.black_ms += ms_added
+
+    def to_time_update(self, game_id: int, reason: GameTimeUpdateReason) -> GameTimeUpdate:
+        return GameTimeUpdate(
+            updated_at=to_datetime(self.settled_at_ns),
+            white_ms=self.white_ms,
+            black_ms=self.black_ms,
+            ticking_side=self.ticking_side,
+            reason=reason,
+            game_id=game_id
+        )
@@ -1,7 +1,5 @@
-from dataclasses import dataclass, field
 from enum import auto, StrEnum
 
-from src.common.time_control import TimeControlKind
 from src.rules.piece import PieceColor
 from src.utils.custom_model import CustomModel
 
@@ -42,9 +40,3 @@ class OfferAction(StrEnum):
     CANCEL = auto()
     ACCEPT = auto()
     DECLINE = auto()
-
-
-@dataclass
-class OverallGameCounts:
-    by_time_control: dict[TimeControlKind, int] = field(default_factory=dict)
-    total: int = 0
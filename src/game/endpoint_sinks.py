@@ -1,27 +1,32 @@
+from collections import Counter
+from copy import copy
 from dataclasses import dataclass
-from datetime import UTC, datetime
 from itertools import chain
 from typing import Iterable
 
 from src.config.models import MainConfig, SecretConfig
+from src.game.clock import GameClock, monotonic_now, to_datetime
 from src.game.datatypes import OutcomeKind, SimpleOutcome, TimeRemainders
 from src.game.exceptions import PlyInvalidException, SinkException
-from src.game.methods.cast import construct_new_ply_time_update
+from src.game.methods.cast import construct_ply_event
 from src.game.methods.event import append_event, append_rollback_event
-from src.game.methods.get import get_current_sip_and_ply_cnt, get_initial_time, get_last_ply_event, get_latest_time_update, get_ply_history, has_occured_thrice, is_stale
-from src.game.methods.update import cancel_all_active_offers, end_game
+from src.game.methods.get import get_current_sip_and_ply_cnt, get_initial_time, get_last_ply_event, get_ply_history, has_occured_thrice, is_stale
+from src.game.methods.update import cancel_all_active_offers, end_game, get_game_clock, store_game_clock
+from src.game.models.external import ExternalGameAppendPlyBatchPayload
 from src.game.models.main import Game
-from src.game.models.ply import GamePlyEvent
+from src.game.models.ply import GamePlyEvent, PlyBatchBroadcastedData
 from src.game.models.polymorphous import PayloadWithGameId, PlyPayload
 from src.game.models.rollback import GameRollbackEvent
 from src.game.models.time_added import GameTimeAddedEvent
-from src.game.models.time_update import GameTimeUpdate, GameTimeUpdateReason
+from src.game.models.time_update import GameTimeUpdateReason
 from src.net.core import MutableState
+from src.pubsub.models.channel import GameEventChannel
+from src.pubsub.outgoing_event.update import NewPlyBatch
 from src.rules.constants.sip import DEFAULT_STARTING_SIP
 from src.rules.coords import HexCoordinates
 from src.rules.deserializers.sip import color_to_move_from_sip, position_from_sip
-from src.rules.piece import PieceColor
-from src.rules.ply import Ply
+from src.rules.piece import PieceColor, PieceKind
+from src.rules.ply import Ply, PlyKind
 from src.rules.position import Position, PositionFinalityGroup
 from src.rules.serializers.sip import get_sip
 from src.utils.async_orm_session import AsyncSession
@@ -51,12 +56,23 @@ class RollbackSuccessfulValidationResults:
     requested_by: PieceColor
 
 
-def _get_simple_outcome(session: AsyncSession, game_id: int, new_position: Position, new_sip: str, new_ply_index: int) -> SimpleOutcome | None:
+def _get_finality_outcome(new_position: Position) -> SimpleOutcome | None:
     match new_position.get_finality_group():
         case PositionFinalityGroup.FATUM:
             return SimpleOutcome(kind=OutcomeKind.FATUM, winner=new_position.color_to_move.opposite())
         case PositionFinalityGroup.BREAKTHROUGH:
             return SimpleOutcome(kind=OutcomeKind.BREAKTHROUGH, winner=new_position.color_to_move.opposite())
+    return None
+
+
+def _is_progressive(ply_event: GamePlyEvent) -> bool:
+    return (ply_event.target_piece is not None and ply_event.kind != PlyKind.SWAP) or ply_event.moved_piece == PieceKind.PROGRESSOR
+
+
+def _get_simple_outcome(session: AsyncSession, game_id: int, new_position: Position, new_sip: str, new_ply_index: int) -> SimpleOutcome | None:
+    finality_outcome = _get_finality_outcome(new_position)
+    if finality_outcome:
+        return finality_outcome
 
     if has_occured_thrice(session, game_id, new_sip):
         return SimpleOutcome(kind=OutcomeKind.REPETITION)
@@ -70,11 +86,13 @@ def _get_simple_outcome(session: AsyncSession, game_id: int, new_position: Posit
 async def append_ply_sink(
     session: AsyncSession,
     mutable_state: MutableState,
+    main_config: MainConfig,
     secret_config: SecretConfig,
     payload: PlyPayload,
     db_game: Game,
     time_remainders: TimeRemainders | None,
-    assumed_moving_color: PieceColor | None = None
+    assumed_moving_color: PieceColor | None = None,
+    lag_credit_ms: int = 0
 ) -> SimpleOutcome | None:
     prev_ply_event = await get_last_ply_event(session, payload.game_id)
     prev_sip, new_ply_index = get_current_sip_and_ply_cnt(db_game, prev_ply_event)
@@ -96,57 +114,133 @@ async def append_ply_sink(
     perform_ply_result = prev_position.perform_ply(ply)
     new_sip = get_sip(perform_ply_result.new_position)
 
-    ply_dt = datetime.now(UTC)
-
-    if not db_game.external_uploader_ref:
-        await cancel_all_active_offers(session, mutable_state, payload.game_id, ply_dt)
+    ply_ns = monotonic_now()
+    ply_dt = to_datetime(ply_ns)
 
     if time_remainders:
         if not db_game.fischer_time_control:
             raise SinkException(f"Game {payload.game_id} is a correspondence one")
         if not db_game.external_uploader_ref:
             raise SinkException(f"Game {payload.game_id} is not external, therefore it's not possible to assign time remainders directly")
-        new_time_update: GameTimeUpdate | None = GameTimeUpdate(
-            updated_at=ply_dt,
-            white_ms=time_remainders.white_ms,
-            black_ms=time_remainders.black_ms,
-            ticking_side=prev_position.color_to_move.opposite() if new_ply_index >= 1 else None,
-            reason=GameTimeUpdateReason.PLY,
-            game_id=payload.game_id
-        )
-    else:
-        new_time_update = await construct_new_ply_time_update(
+
+    clock = copy(await get_game_clock(session, mutable_state, payload.game_id))  # Stored back only if the ply is accepted
+    if clock:
+        if time_remainders:
+            ticking_side = prev_position.color_to_move.opposite() if new_ply_index >= 1 else None
+            clock.reset(time_remainders.white_ms, time_remainders.black_ms, ticking_side, ply_ns)
+        else:
+            clock.switch(ply_ns, new_ply_index, perform_ply_result.new_position.color_to_move, timeout_grace_ms=0, lag_credit_ms=lag_credit_ms)
+
+    if not db_game.external_uploader_ref:
+        await cancel_all_active_offers(session, mutable_state, payload.game_id, ply_dt)
+
+    new_time_update = clock.to_time_update(payload.game_id, GameTimeUpdateReason.PLY) if clock else None
+    event = construct_ply_event(payload.game_id, new_ply_index, ply_dt, perform_ply_result, new_sip, new_time_update)
+    session.add(event)
+    await session.commit()
+    if clock:
+        store_game_clock(mutable_state, payload.game_id, clock)  # Only once committed, so that a failed commit doesn't leave the cached clock ahead of the DB
+    await append_event(session, mutable_state, event, payload.game_id, commit=False)
+
+    outcome = _get_simple_outcome(session, payload.game_id, perform_ply_result.new_position, new_sip, new_ply_index)
+    if outcome:
+        await end_game(
             session,
+            mutable_state,
+            main_config,
+            secret_config,
             payload.game_id,
-            ply_dt,
-            new_ply_index,
-            color_to_move=perform_ply_result.new_position.color_to_move,
-            timeout_grace_ms=0
+            outcome.kind,
+            outcome.winner,
+            ply_dt
         )
+    return outcome
+
+
+async def append_ply_batch_sink(
+    session: AsyncSession,
+    mutable_state: MutableState,
+    main_config: MainConfig,
+    secret_config: SecretConfig,
+    payload: ExternalGameAppendPlyBatchPayload,
+    db_game: Game
+) -> SimpleOutcome | None:
+    ply_history = list(await get_ply_history(session, payload.game_id))
+    prev_sip, first_ply_index = get_current_sip_and_ply_cnt(db_game, ply_history[-1] if ply_history else None)
+
+    if payload.original_sip and prev_sip != payload.original_sip:
+        raise SinkException(f"Wrong SIP. Current SIP is {prev_sip}")
+
+    if not db_game.fischer_time_control and any(external_ply.time_remainders for external_ply in payload.plys):
+        raise SinkException(f"Game {payload.game_id} is a correspondence one")
+
+    sip_occurences = Counter(ply_event.sip_after for ply_event in ply_history)
+    last_progressive_ply_index = max((ply_event.ply_index for ply_event in ply_history if _is_progressive(ply_event)), default=-1)
+    clock = copy(await get_game_clock(session, mutable_state, payload.game_id))
 
-    event = GamePlyEvent(
-        occurred_at=ply_dt,
-        ply_index=new_ply_index,
-        from_i=ply.departure.i,
-        from_j=ply.departure.j,
-        to_i=ply.destination.i,
-        to_j=ply.destination.j,
-        morph_into=ply.morph_into,
+    position = Position.default_starting() if prev_sip == DEFAULT_STARTING_SIP else position_from_sip(prev_sip)
+    ply_ns = monotonic_now()
+    ply_dt = to_datetime(ply_ns)
+    ply_events: list[GamePlyEvent] = []
+    outcome: SimpleOutcome | None = None
+
+    for batch_index, external_ply in enumerate(payload.plys):
+        if outcome:
+            raise SinkException(f"Ply {batch_index} of the batch follows the end of the game. Current SIP is {prev_sip}")
+
+        ply_index = first_ply_index + batch_index
+        ply = Ply(
+            HexCoordinates(external_ply.from_i, external_ply.from_j),
+            HexCoordinates(external_ply.to_i, external_ply.to_j),
+            external_ply.morph_into
+        )
+        if not position.is_ply_possible(ply):
+            raise PlyInvalidException(prev_sip, batch_index)
+
+        perform_ply_result = position.perform_ply(ply)
+        position = perform_ply_result.new_position
+        new_sip = get_sip(position)
+
+        new_time_update = None
+        if clock:
+            if external_ply.time_remainders:
+                ticking_side = position.color_to_move if ply_index >= 1 else None
+                clock.reset(external_ply.time_remainders.white_ms, external_ply.time_remainders.black_ms, ticking_side, ply_ns)
+            else:
+                clock.switch(ply_ns, ply_index, position.color_to_move, timeout_grace_ms=0)
+            new_time_update = clock.to_time_update(payload.game_id, GameTimeUpdateReason.PLY)
+
+        ply_event = construct_ply_event(payload.game_id, ply_index, ply_dt, perform_ply_result, new_sip, new_time_update)
+        ply_events.append(ply_event)
+
+        sip_occurences[new_sip] += 1
+        if _is_progressive(ply_event):
+            last_progressive_ply_index = ply_index
+
+        outcome = _get_finality_outcome(position)
+        if not outcome:
+            if sip_occurences[new_sip] >= 3:
+                outcome = SimpleOutcome(kind=OutcomeKind.REPETITION)
+            elif ply_index - last_progressive_ply_index >= 60:
+                outcome = SimpleOutcome(kind=OutcomeKind.NO_PROGRESS)
+
+    broadcasted_data = PlyBatchBroadcastedData(
         game_id=payload.game_id,
-        kind=perform_ply_result.properties.ply_kind,
-        moving_color=prev_position.color_to_move,
-        moved_piece=perform_ply_result.properties.moving_piece.kind,
-        target_piece=perform_ply_result.properties.target_piece.kind if perform_ply_result.properties.target_piece else None,
-        sip_after=new_sip,
-        time_update=new_time_update
+        plys=[ply_event.to_broadcasted_data() for ply_event in ply_events]
     )
-    await append_event(session, mutable_state, event, payload.game_id)
 
-    outcome = _get_simple_outcome(session, payload.game_id, perform_ply_result.new_position, new_sip, new_ply_index)
+    session.add_all(ply_events)
+    await session.commit()
+    if clock:
+        store_game_clock(mutable_state, payload.game_id, clock)
+
+    await mutable_state.ws_subscribers.broadcast(NewPlyBatch(broadcasted_data, GameEventChannel(game_id=payload.game_id)))
+
     if outcome:
         await end_game(
             session,
             mutable_state,
+            main_config,
             secret_config,
             payload.game_id,
             outcome.kind,
@@ -204,7 +298,8 @@ async def perform_rollback(
     db_game: Game,
     validation_results: RollbackSuccessfulValidationResults
 ) -> None:
-    rollback_dt = datetime.now(UTC)
+    rollback_ns = monotonic_now()
+    rollback_dt = to_datetime(rollback_ns)
 
     new_last_ply_event = None
     for ply_event in validation_results.reversed_ply_events:
@@ -216,17 +311,18 @@ async def perform_rollback(
             break
 
     if new_last_ply_event:
-        time_update = new_last_ply_event.time_update
+        restored_time_update = new_last_ply_event.time_update
         current_sip = new_last_ply_event.sip_after
     else:
-        time_update = await get_initial_time(session, game_id)
+        restored_time_update = await get_initial_time(session, game_id)
         current_sip = db_game.custom_starting_sip or DEFAULT_STARTING_SIP
 
-    if time_update:
-        time_update = time_update.model_copy()
-        time_update.updated_at = rollback_dt
-        time_update.reason = GameTimeUpdateReason.ROLLBACK
-        time_update.ticking_side = validation_results.requested_by if validation_results.new_ply_cnt >= 2 else None
+    clock = None
+    time_update = None
+    if restored_time_update:
+        ticking_side = validation_results.requested_by if validation_results.new_ply_cnt >= 2 else None
+        clock = GameClock(restored_time_update.white_ms, restored_time_update.black_ms, ticking_side, rollback_ns)
+        time_update = clock.to_time_update(game_id, GameTimeUpdateReason.ROLLBACK)
         session.add(time_update)
 
     event = GameRollbackEvent(
@@ -237,7 +333,11 @@ async def perform_rollback(
         game_id=game_id,
         time_update=time_update
     )
-    await append_rollback_event(session, mutable_state, event, game_id, current_sip)
+    session.add(event)
+    await session.commit()
+    if clock:
+        store_game_clock(mutable_state, game_id, clock)
+    await append_rollback_event(session, mutable_state, event, game_id, current_sip, commit=False)
 
 
 async def add_time_sink(
@@ -247,23 +347,17 @@ async def add_time_sink(
     payload: PayloadWithGameId,
     receiver: PieceColor
 ) -> None:
-    latest_time_update = await get_latest_time_update(session, payload.game_id)
+    clock = copy(await get_game_clock(session, mutable_state, payload.game_id))
 
-    if not latest_time_update:
+    if not clock:
         raise SinkException(f"Game {payload.game_id} is a correspondence game")
 
-    addition_dt = datetime.now(UTC)
+    addition_ns = monotonic_now()
+    addition_dt = to_datetime(addition_ns)
 
     secs_added = main_config.rules.secs_added_manually
-    ms_added = secs_added * 1000
-
-    appended_time_update = latest_time_update.model_copy()
-    appended_time_update.updated_at = addition_dt
-    appended_time_update.reason = GameTimeUpdateReason.TIME_ADDED
-    if receiver == PieceColor.WHITE:
-        appended_time_update.white_ms += ms_added
-    else:
-        appended_time_update.black_ms += ms_added
+    clock.add_time(receiver, secs_added * 1000, addition_ns)
+    appended_time_update = clock.to_time_update(payload.game_id, GameTimeUpdateReason.TIME_ADDED)
 
     event = GameTimeAddedEvent(
         occurred_at=addition_dt,
@@ -272,4 +366,7 @@ async def add_time_sink(
         game_id=payload.game_id,
         time_update=appended_time_update
     )
-    await append_event(session, mutable_state, event, payload.game_id)
+    session.add(event)
+    await session.commit()
+    store_game_clock(mutable_state, payload.game_id, clock)
+    await append_event(session, mutable_state, event, payload.game_id, commit=False)
@@ -13,6 +13,7 @@ class TimeoutReachedException(Exception):
 @dataclass
 class PlyInvalidException(Exception):
     current_sip: str
+    ply_index: int | None = None
 
 
 @dataclass
@@ -1,13 +1,24 @@
-from datetime import datetime, timedelta
-from typing import Literal
+from collections import defaultdict
+from datetime import datetime
+from typing import Literal, Sequence
 
-from src.game.exceptions import TimeoutReachedException
-from src.game.models.offer import GameOfferEventPublic
+from src.game.models.chat import GameChatMessageEvent, GameChatMessageEventPublic
+from src.game.models.offer import GameOfferEvent, GameOfferEventPublic
 from src.game.models.main import Game, GamePublic, GameStateRefresh, GenericEventList
+from src.game.models.ply import GamePlyEvent
+from src.game.models.rollback import GameRollbackEvent
+from src.game.models.time_added import GameTimeAddedEvent
 from src.game.models.time_control import GameFischerTimeControlPublic
-from src.game.models.time_update import GameTimeUpdate, GameTimeUpdatePublic, GameTimeUpdateReason
-from src.game.methods.get import get_ply_history, get_latest_time_update
-from src.rules.piece import PieceColor
+from src.game.models.time_update import GameTimeUpdate, GameTimeUpdatePublic
+from src.game.methods.get import (
+    get_events_of_games,
+    get_fischer_time_controls,
+    get_latest_time_update,
+    get_latest_time_updates,
+    get_outcomes,
+    get_ply_history,
+)
+from src.rules.position import PerformPlyOutput
 from src.utils.async_orm_session import AsyncSession
 
 import src.player.methods as player_methods
@@ -40,21 +51,63 @@ async def to_public_game(
     session: AsyncSession,
     game: Game
 ) -> GamePublic:
-    assert game.id
-    return GamePublic(
-        started_at=game.started_at,
-        white_player=player_methods.get_user_ref_with_nickname(session, game.white_player_ref),
-        black_player=player_methods.get_user_ref_with_nickname(session, game.black_player_ref),
-        time_control_kind=game.time_control_kind,
-        rated=game.rated,
-        custom_starting_sip=game.custom_starting_sip,
-        external_uploader_ref=game.external_uploader_ref,
-        id=game.id,
-        fischer_time_control=GameFischerTimeControlPublic.cast(game.fischer_time_control),
-        outcome=game.outcome.to_public() if game.outcome else None,
-        events=collect_game_events(session, game.id, game, include_spectator_messages=True),
-        latest_time_update=GameTimeUpdatePublic.cast(await get_latest_time_update(session, game.id))
-    )
+    public_games = await to_public_games(session, [game])
+    return public_games[0]
+
+
+async def to_public_games(
+    session: AsyncSession,
+    games: Sequence[Game]
+) -> list[GamePublic]:
+    game_ids = [game.id for game in games if game.id]
+    if not game_ids:
+        return []
+
+    time_controls = {time_control.game_id: time_control for time_control in await get_fischer_time_controls(session, game_ids)}
+    outcomes = {outcome.game_id: outcome for outcome in await get_outcomes(session, game_ids)}
+    latest_time_updates = {time_update.game_id: time_update for time_update in await get_latest_time_updates(session, game_ids)}
+
+    chat_events = await get_events_of_games(session, GameChatMessageEvent, game_ids)
+    user_refs = {ref for game in games for ref in (game.white_player_ref, game.black_player_ref)}
+    user_refs.update(chat_event.author_ref for chat_event in chat_events)
+    nicknames = await player_methods.get_user_refs_with_nicknames(session, user_refs)
+
+    events: defaultdict[int, GenericEventList] = defaultdict(list)
+    for ply_event in await get_events_of_games(session, GamePlyEvent, game_ids):
+        events[ply_event.game_id].append(ply_event.to_public())
+    for chat_event in chat_events:
+        events[chat_event.game_id].append(GameChatMessageEventPublic(
+            occurred_at=chat_event.occurred_at,
+            text=chat_event.text,
+            spectator=chat_event.spectator,
+            author=nicknames[chat_event.author_ref]
+        ))
+    for offer_event in await get_events_of_games(session, GameOfferEvent, game_ids):
+        events[offer_event.game_id].append(GameOfferEventPublic.cast(offer_event))
+    for time_added_event in await get_events_of_games(session, GameTimeAddedEvent, game_ids):
+        events[time_added_event.game_id].append(time_added_event.to_public())
+    for rollback_event in await get_events_of_games(session, GameRollbackEvent, game_ids):
+        events[rollback_event.game_id].append(rollback_event.to_public())
+
+    public_games = []
+    for game in games:
+        assert game.id
+        outcome = outcomes.get(game.id)
+        public_games.append(GamePublic(
+            started_at=game.started_at,
+            white_player=nicknames[game.white_player_ref],
+            black_player=nicknames[game.black_player_ref],
+            time_control_kind=game.time_control_kind,
+            rated=game.rated,
+            custom_starting_sip=game.custom_starting_sip,
+            external_uploader_ref=game.external_uploader_ref,
+            id=game.id,
+            fischer_time_control=GameFischerTimeControlPublic.cast(time_controls.get(game.id)),
+            outcome=outcome.to_public() if outcome else None,
+            events=sorted(events[game.id], key=lambda x: x.occurred_at),
+            latest_time_update=GameTimeUpdatePublic.cast(latest_time_updates.get(game.id))
+        ))
+    return public_games
 
 
 async def compose_state_refresh(
@@ -73,35 +126,29 @@ async def compose_state_refresh(
     )
 
 
-async def construct_new_ply_time_update(
-    session: AsyncSession,
+def construct_ply_event(
     game_id: int,
+    ply_index: int,
     ply_dt: datetime,
-    new_ply_index: int,
-    color_to_move: PieceColor,
-    timeout_grace_ms: int
-) -> GameTimeUpdate | None:
-    latest_time_update = await get_latest_time_update(session, game_id)
-    if not latest_time_update:
-        return None
-
-    new_time_update = latest_time_update.model_copy()
-    new_time_update.reason = GameTimeUpdateReason.PLY
-    new_time_update.updated_at = ply_dt
-
-    if latest_time_update.ticking_side:
-        ms_passed = int((ply_dt - latest_time_update.updated_at).total_seconds() * 1000)
-        if latest_time_update.ticking_side == PieceColor.WHITE:
-            new_time_update.white_ms -= ms_passed
-            remaining_time = new_time_update.white_ms
-        else:
-            new_time_update.black_ms -= ms_passed
-            remaining_time = new_time_update.black_ms
-
-        if remaining_time <= -timeout_grace_ms:
-            timed_out_at = ply_dt + timedelta(milliseconds=remaining_time)
-            raise TimeoutReachedException(winner=latest_time_update.ticking_side.opposite(), reached_at=timed_out_at)
-
-    new_time_update.ticking_side = color_to_move if new_ply_index >= 1 else None
-
-    return new_time_update
+    perform_ply_result: PerformPlyOutput,
+    new_sip: str,
+    time_update: GameTimeUpdate | None
+) -> GamePlyEvent:
+    ply = perform_ply_result.performed_ply
+    properties = perform_ply_result.properties
+    return GamePlyEvent(
+        occurred_at=ply_dt,
+        ply_index=ply_index,
+        from_i=ply.departure.i,
+        from_j=ply.departure.j,
+        to_i=ply.destination.i,
+        to_j=ply.destination.j,
+        morph_into=ply.morph_into,
+        game_id=game_id,
+        kind=properties.ply_kind,
+        moving_color=perform_ply_result.old_position.color_to_move,
+        moved_piece=properties.moving_piece.kind,
+        target_piece=properties.target_piece.kind if properties.target_piece else None,
+        sip_after=new_sip,
+        time_update=time_update
+    )
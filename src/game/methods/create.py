@@ -2,21 +2,34 @@ from datetime import UTC, datetime
 
 from src.common.models import Id
 from src.common.user_ref import UserReference
-from src.config.models import SecretConfig
-from src.game.methods.cast import to_public_game
+from src.config.models import MainConfig, SecretConfig
+from src.game.datatypes import OutcomeKind
+from src.game.clock import GameClock, monotonic_now, to_datetime
+from src.game.exceptions import PlyInvalidException, SinkException
+from src.game.methods.cast import construct_ply_event, to_public_game
+from src.game.models.external import ExternalGameImportPayload
+from src.game.models.outcome import GameOutcome
+from src.game.models.ply import GamePlyEvent
 from src.game.models.time_update import GameTimeUpdate, GameTimeUpdateReason
 from src.pubsub.models.channel import GameListEventChannel, OutgoingChallengesEventChannel, PublicChallengeListEventChannel, StartedPlayerGamesEventChannel
 from src.game.models.main import Game, GamePublic, GameStartedBroadcastedData
 from src.game.models.time_control import GameFischerTimeControl
 from src.net.core import MutableState
 from src.common.time_control import FischerTimeControlEntity, TimeControlKind
-from src.pubsub.outgoing_event.update import GameStarted, NewActiveGame, OutgoingChallengeAccepted, PublicChallengeFulfilled
+from src.pubsub.outgoing_event.update import GameStarted, NewActiveGame, NewRecentGame, OutgoingChallengeAccepted, PublicChallengeFulfilled
+from src.rules.constants.sip import DEFAULT_STARTING_SIP
+from src.rules.coords import HexCoordinates
+from src.rules.deserializers.sip import position_from_sip
+from src.rules.ply import Ply
+from src.rules.position import Position, PositionFinalityGroup
+from src.rules.serializers.sip import get_sip
 from src.utils.async_orm_session import AsyncSession
 
 import random
 import src.challenge.datatypes as challenge_datatypes
 import src.challenge.models as challenge_models
 import src.notification.methods as notification_methods
+import src.player.methods as player_methods
 
 
 def assign_player_colors(
@@ -47,7 +60,8 @@ async def create_game(
     state: MutableState,
     deactivated_challenge: challenge_models.Challenge | None = None
 ) -> GamePublic:
-    started_at = datetime.now(UTC)
+    started_ns = monotonic_now()
+    started_at = to_datetime(started_ns)
 
     db_game = Game(
         started_at=started_at,
@@ -80,6 +94,16 @@ async def create_game(
         session.add(deactivated_challenge)
 
     await session.commit()
+    await session.refresh(db_game)
+
+    assert db_game.id
+    if time_control and state.game_router.is_local(db_game.id):  # Otherwise the owning worker loads the clock on the game's first intent
+        state.game_clocks[db_game.id] = GameClock(
+            white_ms=time_control.start_seconds * 1000,
+            black_ms=time_control.start_seconds * 1000,
+            ticking_side=None,
+            settled_at_ns=started_ns
+        )
 
     public_game = await to_public_game(session, db_game)
 
@@ -161,3 +185,121 @@ async def create_external_game(
         session=session,
         state=state
     )
+
+
+async def import_external_game(
+    uploader: UserReference,
+    payload: ExternalGameImportPayload,
+    session: AsyncSession,
+    state: MutableState,
+    main_config: MainConfig
+) -> GamePublic:
+    imported_at = datetime.now(UTC)
+    started_at = payload.started_at or imported_at
+    time_control = payload.time_control
+
+    db_game = Game(
+        started_at=started_at,
+        white_player_ref=payload.white_player_ref,
+        black_player_ref=payload.black_player_ref,
+        time_control_kind=TimeControlKind.of(time_control),
+        rated=False,
+        custom_starting_sip=payload.custom_starting_sip,
+        external_uploader_ref=uploader.reference,
+        fischer_time_control=GameFischerTimeControl(
+            start_seconds=time_control.start_seconds,
+            increment_seconds=time_control.increment_seconds
+        ) if time_control else None
+    )
+    session.add(db_game)
+    await session.flush()  # Nothing is committed until every ply is validated
+    assert db_game.id
+
+    latest_time_update = None
+    if time_control:
+        latest_time_update = GameTimeUpdate(
+            updated_at=started_at,
+            white_ms=time_control.start_seconds * 1000,
+            black_ms=time_control.start_seconds * 1000,
+            ticking_side=None,
+            reason=GameTimeUpdateReason.INIT,
+            game_id=db_game.id
+        )
+        session.add(latest_time_update)
+
+    current_sip = payload.custom_starting_sip or DEFAULT_STARTING_SIP
+    position = Position.default_starting() if current_sip == DEFAULT_STARTING_SIP else position_from_sip(current_sip)
+    ply_events: list[GamePlyEvent] = []
+
+    for ply_index, imported_ply in enumerate(payload.plys):
+        if position.get_finality_group() != PositionFinalityGroup.VALID_NON_FINAL:
+            raise SinkException(f"Ply {ply_index} follows a final position. Current SIP is {current_sip}")
+
+        ply = Ply(
+            HexCoordinates(imported_ply.from_i, imported_ply.from_j),
+            HexCoordinates(imported_ply.to_i, imported_ply.to_j),
+            imported_ply.morph_into
+        )
+        if not position.is_ply_possible(ply):
+            raise PlyInvalidException(current_sip, ply_index)
+
+        perform_ply_result = position.perform_ply(ply)
+        position = perform_ply_result.new_position
+        current_sip = get_sip(position)
+
+        new_time_update = None
+        if imported_ply.time_remainders:
+            latest_time_update = new_time_update = GameTimeUpdate(
+                updated_at=started_at,
+                white_ms=imported_ply.time_remainders.white_ms,
+                black_ms=imported_ply.time_remainders.black_ms,
+                ticking_side=position.color_to_move if ply_index >= 1 else None,
+                reason=GameTimeUpdateReason.PLY,
+                game_id=db_game.id
+            )
+
+        ply_events.append(construct_ply_event(db_game.id, ply_index, started_at, perform_ply_result, current_sip, new_time_update))
+
+    match position.get_finality_group():
+        case PositionFinalityGroup.FATUM:
+            expected_outcome = OutcomeKind.FATUM
+        case PositionFinalityGroup.BREAKTHROUGH:
+            expected_outcome = OutcomeKind.BREAKTHROUGH
+        case _:
+            expected_outcome = None
+    if expected_outcome and (payload.outcome_kind != expected_outcome or payload.winner != position.color_to_move.opposite()):
+        raise SinkException(f"The final position implies {expected_outcome} for {position.color_to_move.opposite()}")
+    if not expected_outcome and payload.outcome_kind in (OutcomeKind.FATUM, OutcomeKind.BREAKTHROUGH):
+        raise SinkException(f"The final position does not imply {payload.outcome_kind}. Current SIP is {current_sip}")
+
+    final_time_update = None
+    if latest_time_update:
+        final_time_update = GameTimeUpdate(
+            updated_at=started_at,
+            white_ms=latest_time_update.white_ms,
+            black_ms=latest_time_update.black_ms,
+            ticking_side=None,
+            reason=GameTimeUpdateReason.GAME_ENDED,
+            game_id=db_game.id
+        )
+
+    db_outcome = GameOutcome(
+        game_ended_at=started_at,
+        kind=payload.outcome_kind,
+        winner=payload.winner,
+        game_id=db_game.id,
+        time_update=final_time_update
+    )
+
+    session.add_all(ply_events)
+    session.add(db_outcome)
+    await player_methods.record_game_result(session, db_game, payload.outcome_kind, payload.winner, main_config.elo)
+    broadcasted_data = db_outcome.to_broadcasted_data()
+    await session.commit()
+
+    await session.refresh(db_game)
+    public_game = await to_public_game(session, db_game)
+
+    await state.ws_subscribers.broadcast(NewRecentGame(broadcasted_data, GameListEventChannel()))
+
+    return public_game
@@ -0,0 +1,100 @@
+from collections import defaultdict
+from typing import AsyncGenerator
+from sqlalchemy.orm import selectinload
+from sqlmodel import col, select
+
+from src.game.models.export import ClockTimes, GameExportEntry
+from src.game.models.main import Game
+from src.game.models.outcome import GameOutcome
+from src.game.models.ply import GamePlyEvent
+from src.game.models.rest import GameExportFilter
+from src.game.models.time_update import GameTimeUpdate
+from src.rules.serializers.sip import piece_letter
+from src.utils.async_orm_session import AsyncSession
+
+
+def compact_ply(ply_event: GamePlyEvent) -> str:
+    morph_suffix = piece_letter(ply_event.morph_into) if ply_event.morph_into else ""
+    return f"{ply_event.from_i}{ply_event.from_j}{ply_event.to_i}{ply_event.to_j}{morph_suffix}"
+
+
+def to_clock_times(time_update: GameTimeUpdate | None) -> ClockTimes | None:
+    return ClockTimes(white_ms=time_update.white_ms, black_ms=time_update.black_ms) if time_update else None
+
+
+async def iterate_finished_games(
+    session: AsyncSession,
+    export_filter: GameExportFilter,
+    batch_size: int = 500
+) -> AsyncGenerator[GameExportEntry, None]:
+    last_game_id = 0
+    while True:
+        games_result = await session.exec(select(
+            Game,
+            GameOutcome
+        ).join(
+            GameOutcome,
+            col(GameOutcome.game_id) == col(Game.id)
+        ).where(
+            col(Game.id) > last_game_id,
+            *export_filter.construct_conditions()
+        ).order_by(
+            col(Game.id)
+        ).limit(
+            batch_size
+        ).options(
+            selectinload(Game.fischer_time_control),  # type: ignore
+            selectinload(GameOutcome.time_update)  # type: ignore
+        ))
+        games = games_result.all()
+        if not games:
+            return
+
+        game_ids = [game.id for game, _ in games]
+        ply_events_by_game_id: defaultdict[int, list[tuple[GamePlyEvent, GameTimeUpdate | None]]] = defaultdict(list)
+        plys_result = await session.exec(select(
+            GamePlyEvent,
+            GameTimeUpdate
+        ).join(
+            GameTimeUpdate,
+            col(GamePlyEvent.time_update_id) == col(GameTimeUpdate.id),
+            isouter=True
+        ).where(
+            col(GamePlyEvent.game_id).in_(game_ids),
+            col(GamePlyEvent.is_cancelled) == False  # noqa
+        ).order_by(
+            col(GamePlyEvent.game_id),
+            col(GamePlyEvent.ply_index)
+        ))
+        for ply_event, time_update in plys_result:
+            ply_events_by_game_id[ply_event.game_id].append((ply_event, time_update))
+
+        for game, outcome in games:
+            assert game.id
+            ply_events = ply_events_by_game_id[game.id]
+            yield GameExportEntry(
+                id=game.id,
+                started_at=game.started_at,
+                ended_at=outcome.game_ended_at,
+                white_player_ref=game.white_player_ref,
+                black_player_ref=game.black_player_ref,
+                time_control_kind=game.time_control_kind,
+                start_seconds=game.fischer_time_control.start_seconds if game.fischer_time_control else None,
+                increment_seconds=game.fischer_time_control.increment_seconds if game.fischer_time_control else None,
+                rated=game.rated,
+                custom_starting_sip=game.custom_starting_sip,
+                external_uploader_ref=game.external_uploader_ref,
+                outcome_kind=outcome.kind,
+                winner=outcome.winner,
+                plys=[compact_ply(ply_event) for ply_event, _ in ply_events],
+                clocks=[to_clock_times(time_update) for _, time_update in ply_events],
+                final_clock=to_clock_times(outcome.time_update)
+            )
+
+        last_game_id = game_ids[-1]
+        session.expunge_all()  # Keeps the identity map (and thus the memory footprint) bounded by a single batch
+
+
+async def generate_ndjson_export(session: AsyncSession, export_filter: GameExportFilter) -> AsyncGenerator[str, None]:
+    async for entry in iterate_finished_games(session, export_filter):
+        yield entry.model_dump_json() + "\n"
@@ -1,16 +1,22 @@
-from typing import Iterable
+from typing import Iterable, Sequence
 from sqlalchemy import ScalarResult
+from sqlalchemy.orm import selectinload
 from sqlmodel import and_, col, desc, or_, select, func
 from sqlmodel.sql.expression import SelectOfScalar
 
+from src.common.pagination import KeysetCursor
 from src.common.sql import count_if
 from src.common.time_control import TimeControlKind
-from src.game.datatypes import OfferAction, OfferKind, OverallGameCounts
+from src.game.datatypes import OfferAction, OfferKind
+from src.game.models.chat import GameChatMessageEvent
 from src.game.models.main import Game
 from src.game.models.offer import GameOfferEvent
 from src.game.models.outcome import GameOutcome
 from src.game.models.ply import GamePlyEvent
 from src.game.models.rest import GameFilter
+from src.game.models.rollback import GameRollbackEvent
+from src.game.models.time_added import GameTimeAddedEvent
+from src.game.models.time_control import GameFischerTimeControl
 from src.game.models.time_update import GameTimeUpdate
 from src.rules.constants.sip import DEFAULT_STARTING_SIP
 from src.rules.piece import PieceColor, PieceKind
@@ -78,53 +84,36 @@ async def is_offer_active(session: AsyncSession, game_id: int, offer_kind: Offer
     return result.first() == OfferAction.CREATE.value
 
 
-async def get_overall_player_game_counts(session: AsyncSession, player_login: str) -> OverallGameCounts:
-    db_games_cnt = await session.exec(select(
-        Game.time_control_kind,
-        func.count(col(Game.id))
-    ).where(
-        or_(
-            Game.white_player_ref == player_login,
-            Game.black_player_ref == player_login
-        )
-    ).group_by(
-        Game.time_control_kind
-    ))
-
-    game_counts = OverallGameCounts()
-    for db_games_cnt_item in db_games_cnt:
-        game_counts.by_time_control[TimeControlKind(db_games_cnt_item[0])] = db_games_cnt_item[1]
-        game_counts.total += db_games_cnt_item[1]
-    return game_counts
+def _paginate_games(query: SelectOfScalar[Game], offset: int, limit: int, cursor: KeysetCursor | None) -> SelectOfScalar[Game]:
+    if cursor:
+        query = query.where(cursor.construct_condition(Game.started_at, Game.id))
+    return query.order_by(
+        desc(Game.started_at),
+        desc(Game.id)
+    ).offset(
+        offset
+    ).limit(
+        limit
+    )
 
 
-async def get_current_games(session: AsyncSession, game_filter: GameFilter, offset: int = 0, limit: int = 10) -> Iterable[Game]:
-    result = await session.exec(select(
+async def get_current_games(session: AsyncSession, game_filter: GameFilter, offset: int = 0, limit: int = 10, cursor: KeysetCursor | None = None) -> Iterable[Game]:
+    result = await session.exec(_paginate_games(select(
         Game
     ).where(
         Game.outcome == None,  # noqa
         *game_filter.construct_conditions()
-    ).offset(
-        offset
-    ).limit(
-        limit
-    ))
+    ), offset, limit, cursor))
     return result.all()
 
 
-async def get_recent_games(session: AsyncSession, game_filter: GameFilter, offset: int = 0, limit: int = 10) -> Iterable[Game]:
-    result = await session.exec(select(
+async def get_recent_games(session: AsyncSession, game_filter: GameFilter, offset: int = 0, limit: int = 10, cursor: KeysetCursor | None = None) -> Iterable[Game]:
+    result = await session.exec(_paginate_games(select(
         Game
     ).where(
         Game.outcome != None,  # noqa
         *game_filter.construct_conditions()
-    ).order_by(
-        desc(Game.started_at)
-    ).offset(
-        offset
-    ).limit(
-        limit
-    ))
+    ), offset, limit, cursor))
     return result.all()
 
 
@@ -208,3 +197,60 @@ async def is_stale(session: AsyncSession, game_id: int, last_ply_index: int) ->
     ))
     last_progressive_ply_index = result.first()
     return last_ply_index - (last_progressive_ply_index or -1) >= 60
+
+
+async def get_fischer_time_controls(session: AsyncSession, game_ids: list[int]) -> Sequence[GameFischerTimeControl]:
+    result = await session.exec(select(
+        GameFischerTimeControl
+    ).where(
+        col(GameFischerTimeControl.game_id).in_(game_ids)
+    ))
+    return result.all()
+
+
+async def get_outcomes(session: AsyncSession, game_ids: list[int]) -> Sequence[GameOutcome]:
+    result = await session.exec(select(
+        GameOutcome
+    ).where(
+        col(GameOutcome.game_id).in_(game_ids)
+    ).options(
+        selectinload(GameOutcome.time_update)  # type: ignore
+    ))
+    return result.all()
+
+
+async def get_latest_time_updates(session: AsyncSession, game_ids: list[int]) -> Sequence[GameTimeUpdate]:
+    latest_ids = select(
+        func.max(GameTimeUpdate.id)
+    ).where(
+        col(GameTimeUpdate.game_id).in_(game_ids)
+    ).group_by(
+        GameTimeUpdate.game_id
+    )
+    result = await session.exec(select(
+        GameTimeUpdate
+    ).where(
+        col(GameTimeUpdate.id).in_(latest_ids)
+    ))
+    return result.all()
+
+
+type GameEventModel = GamePlyEvent | GameChatMessageEvent | GameOfferEvent | GameTimeAddedEvent | GameRollbackEvent
+
+
+async def get_events_of_games[T: GameEventModel](session: AsyncSession, event_type: type[T], game_ids: list[int]) -> Sequence[T]:
+    query = select(
+        event_type
+    ).where(
+        col(event_type.game_id).in_(game_ids)
+    )
+    if event_type is GamePlyEvent:
+        query = query.where(
+            col(GamePlyEvent.is_cancelled) == False  # noqa
+        )
+    if event_type in (GamePlyEvent, GameTimeAddedEvent, GameRollbackEvent):
+        query = query.options(
+            selectinload(event_type.time_update)  # type: ignore
+        )
+    result = await session.exec(query)
+    return result.all()
@@ -1,33 +1,92 @@
-from datetime import UTC, datetime, timedelta
+from datetime import datetime
 
-from src.config.models import SecretConfig
+from src.common.time_control import TimeControlKind
+from src.config.models import MainConfig, SecretConfig
+from src.game.clock import GameClock, from_datetime, monotonic_now, to_datetime
 from src.game.models.main import Game
 from src.game.models.offer import GameOfferEvent, OfferActionBroadcastedData
 from src.game.models.outcome import GameOutcome
+from src.game.models.time_update import GameTimeUpdateReason
 from src.game.methods.get import get_active_offers, get_latest_time_update, get_ongoing_finite_game
 from src.game.datatypes import OfferAction, OutcomeKind
-from src.net.core import MutableState
-from src.pubsub.models.channel import GameEventChannel
-from src.pubsub.outgoing_event.update import OfferActionPerformed
+from src.net.core import App, MutableState
+from src.net.sharding import forwardable
+from src.player.models import LeaderboardChangeBroadcastedData
+from src.pubsub.models.channel import GameEventChannel, GameListEventChannel, LeaderboardEventChannel
+from src.pubsub.outgoing_event.update import GameEnded, LeaderboardChanged, NewRecentGame, OfferActionPerformed
 from src.rules.piece import PieceColor
 from src.utils.async_orm_session import AsyncSession
 
-import time
 import src.notification.methods as notification_methods
+import src.player.methods as player_methods
 
 
 async def end_game(
     session: AsyncSession,
     state: MutableState,
+    main_config: MainConfig,
     secret_config: SecretConfig,
     game_id: int,
     outcome: OutcomeKind,
     winner_color: PieceColor | None,
     ended_at: datetime | None = None
 ) -> None:  # TODO: Add (and sometimes validate) precalculated args: time reserves, last ply, ...
-    # TODO: Add to outcome table
-    # TODO: Add to time updates table (calculate that!)
-    # TODO: Send game ended events (multiple channels)
+    game = await session.get(Game, game_id)
+    if not game or await session.get(GameOutcome, game_id):
+        return
+
+    ended_ns = from_datetime(ended_at) if ended_at else monotonic_now()
+    ended_at = to_datetime(ended_ns)
+
+    final_time_update = None
+    clock = await get_game_clock(session, state, game_id)
+    if clock:
+        time_remainders = clock.get_remainders(ended_ns)
+        final_clock = GameClock(
+            white_ms=max(time_remainders[PieceColor.WHITE], 0),
+            black_ms=max(time_remainders[PieceColor.BLACK], 0),
+            ticking_side=None,
+            settled_at_ns=ended_ns
+        )
+        final_time_update = final_clock.to_time_update(game_id, GameTimeUpdateReason.GAME_ENDED)
+
+    db_outcome = GameOutcome(
+        game_ended_at=ended_at,
+        kind=outcome,
+        winner=winner_color,
+        game_id=game_id,
+        time_update=final_time_update
+    )
+    session.add(db_outcome)
+    updated_stats = await player_methods.record_game_result(session, game, outcome, winner_color, main_config.elo)
+    broadcasted_data = db_outcome.to_broadcasted_data()
+    time_control_kind = game.time_control_kind
+    rating_changes = [
+        (stats_entry.login, stats_entry.elo, stats_entry.is_elo_provisional)
+        for stats_entry in updated_stats.values()
+        if game.rated and stats_entry.elo is not None
+    ]
+    await session.commit()
+
+    discard_game_clock(state, game_id)
+
+    for login, elo, is_provisional in rating_changes:
+        state.update_rating(login, time_control_kind, elo, is_provisional)
+    if rating_changes:
+        state.game_router.forward_call_to_peers("update_ratings", dict(time_control_kind=time_control_kind.value, changes=rating_changes))
+
+    await state.ws_subscribers.broadcast(GameEnded(broadcasted_data, GameEventChannel(game_id=game_id)))
+    await state.ws_subscribers.broadcast(NewRecentGame(broadcasted_data, GameListEventChannel()))
+
+    leaderboard = state.leaderboards[time_control_kind]
+    ranked_players = [ranked_player for login, _, _ in rating_changes if (ranked_player := leaderboard.get_player(login))]
+    if ranked_players:
+        leaderboard_change = LeaderboardChangeBroadcastedData(
+            time_control_kind=time_control_kind,
+            changed_entries=await player_methods.to_leaderboard_entries(session, ranked_players),
+            total_players=len(leaderboard)
+        )
+        await state.ws_subscribers.broadcast(LeaderboardChanged(leaderboard_change, LeaderboardEventChannel(time_control_kind=time_control_kind)))
 
     await notification_methods.delete_game_started_notifications(
         game_id=game_id,
@@ -38,39 +97,80 @@ async def end_game(
     if state.shutdown_activated and not get_ongoing_finite_game(session):
         raise KeyboardInterrupt
 
-    state.game_timeout_not_earlier_than.pop(game_id, None)
+
+async def get_game_clock(session: AsyncSession, state: MutableState, game_id: int) -> GameClock | None:
+    clock = state.game_clocks.get(game_id)
+    if clock:
+        return clock
+
+    latest_time_update = await get_latest_time_update(session, game_id)  # Only needed once per game after a restart
+    if not latest_time_update or latest_time_update.reason == GameTimeUpdateReason.GAME_ENDED:
+        return None
+
+    clock = GameClock.from_time_update(latest_time_update)
+    if state.game_router.is_local(game_id):  # Elsewhere it is reloaded every time, as the owner's copy may change in the meantime
+        state.game_clocks[game_id] = clock
+    return clock
+
+
+def store_game_clock(state: MutableState, game_id: int, clock: GameClock) -> None:  # Call once the change is committed
+    if state.game_router.is_local(game_id):
+        state.game_clocks[game_id] = clock
+    else:
+        discard_game_clock(state, game_id)
+
+
+def discard_game_clock(state: MutableState, game_id: int) -> None:
+    state.game_clocks.pop(game_id, None)
+    if not state.game_router.is_local(game_id):  # E.g. an external game's REST mutation, the owner has to reload the clock from the DB
+        state.game_router.forward_call(game_id, "discard_game_clock", game_id)
+
+
+@forwardable("update_ratings")
+async def update_ratings_on_peer(app: App, argument: dict) -> None:  # Keeps the leaderboards of the other shards in sync
+    time_control_kind = TimeControlKind(argument["time_control_kind"])
+    for login, elo, is_provisional in argument["changes"]:
+        app.mutable_state.update_rating(login, time_control_kind, elo, is_provisional)
+
+
+@forwardable("discard_game_clock")
+async def discard_game_clock_on_owner(app: App, game_id: int) -> None:
+    app.mutable_state.game_clocks.pop(game_id, None)
 
 
 async def check_timeout(
     *,
     session: AsyncSession,
     state: MutableState,
+    main_config: MainConfig,
     secret_config: SecretConfig,
     game_id: int,
     outcome_abscence_checked: bool = False,
 ) -> bool:
-    threshold = state.game_timeout_not_earlier_than.get(game_id)
-    if not threshold or threshold > time.time():
-        return False
+    now_ns = monotonic_now()
+
+    loaded_clock = state.game_clocks.get(game_id)
+    if loaded_clock:
+        timeout_ns = loaded_clock.get_timeout_ns()
+        if timeout_ns is None or timeout_ns > now_ns:
+            return False
 
     existing_outcome = await session.get(GameOutcome, game_id)
     if not outcome_abscence_checked and existing_outcome is not None:
         return False
 
-    latest_time_update = await get_latest_time_update(session, game_id)
-    if not latest_time_update or not latest_time_update.ticking_side:
+    clock = await get_game_clock(session, state, game_id)
+    if not clock or not clock.ticking_side:
         return False
 
     game = await session.get(Game, game_id)
     timeout_delta_threshold = -60000 if game and game.external_uploader_ref else 0  # 1 minute grace time for external games to account for delays
 
-    now_dt = datetime.now(UTC)
-    time_remainders = latest_time_update.get_actual_time_remainders(now_dt)
-    timeout_delta_ms = time_remainders[latest_time_update.ticking_side]
+    timeout_delta_ms = clock.get_remainders(now_ns)[clock.ticking_side]
     if timeout_delta_ms <= timeout_delta_threshold:
-        timeout_dt = now_dt + timedelta(milliseconds=timeout_delta_ms)
-        winner = latest_time_update.ticking_side.opposite()
-        await end_game(session, state, secret_config, game_id, OutcomeKind.TIMEOUT, winner, timeout_dt)
+        timeout_dt = to_datetime(now_ns + timeout_delta_ms * 1_000_000)
+        winner = clock.ticking_side.opposite()
+        await end_game(session, state, main_config, secret_config, game_id, OutcomeKind.TIMEOUT, winner, timeout_dt)
         return True
 
     return False
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from src.common.time_control import TimeControlKind
+from src.game.datatypes import OutcomeKind
+from src.rules.piece import PieceColor
+from src.utils.custom_model import CustomModel
+
+
+class ClockTimes(CustomModel):
+    white_ms: int
+    black_ms: int
+
+
+class GameExportEntry(CustomModel):
+    id: int
+    started_at: datetime
+    ended_at: datetime
+    white_player_ref: str
+    black_player_ref: str
+    time_control_kind: TimeControlKind
+    start_seconds: int | None
+    increment_seconds: int | None
+    rated: bool
+    custom_starting_sip: str | None
+    external_uploader_ref: str | None
+    outcome_kind: OutcomeKind
+    winner: PieceColor | None
+    plys: list[str]  # Compact form: from_i, from_j, to_i, to_j digits followed by an optional SIP letter of the piece to morph into
+    clocks: list[ClockTimes | None]  # Remainders after each ply from the list above
+    final_clock: ClockTimes | None
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Literal, Self
 from pydantic import Field as PydanticField, model_validator
 
@@ -26,6 +27,21 @@ class ExternalGameAppendPlyPayload(CustomModel):
     time_remainders: TimeRemainders | None = None
 
 
+class ExternalGamePly(CustomModel):
+    from_i: int
+    from_j: int
+    to_i: int
+    to_j: int
+    morph_into: PieceKind | None = None
+    time_remainders: TimeRemainders | None = None
+
+
+class ExternalGameAppendPlyBatchPayload(CustomModel):
+    game_id: int
+    original_sip: OptionalSip
+    plys: list[ExternalGamePly] = PydanticField(min_length=1, max_length=100)
+
+
 class ExternalGameAppendPlyResponse(CustomModel):
     outcome: SimpleOutcome | None
 
@@ -45,6 +61,28 @@ class ExternalGameEndPayload(CustomModel):
         return self
 
 
+class ExternalGameImportPayload(CustomModel):
+    white_player_ref: PlayerRef
+    black_player_ref: PlayerRef
+    custom_starting_sip: OptionalSip
+    time_control: GameFischerTimeControlCreate | None = None
+    started_at: datetime | None = None
+    plys: list[ExternalGamePly] = PydanticField(max_length=1000)
+    outcome_kind: OutcomeKind
+    winner: PieceColor | None = None
+
+    @model_validator(mode='after')
+    def check_outcome_consistency(self) -> Self:
+        if self.outcome_kind.drawish:
+            if self.winner:
+                raise ValueError("This outcome kind cannot have a winner")
+        elif not self.winner:
+            raise ValueError("This outcome kind should have a winner")
+        if self.time_control is None and any(ply.time_remainders for ply in self.plys):
+            raise ValueError("Time remainders cannot be specified for a correspondence game")
+        return self
+
+
 class ExternalGameRollbackPayload(CustomModel):
     game_id: int
     new_ply_cnt: int = PydanticField(ge=0)
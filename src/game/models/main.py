@@ -1,4 +1,5 @@
 from typing import Literal, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from src.common.field_types import CurrentDatetime, OptionalSip, PlayerRef, OptionalPlayerRef
@@ -28,6 +29,10 @@ class GameBase(CustomSQLModel):
 
 
 class Game(GameBase, table=True):
+    __table_args__ = (
+        Index("ix_game_started_at_id", "started_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     white_player_ref: PlayerRef
     black_player_ref: PlayerRef
@@ -4,7 +4,7 @@ from src.rules.piece import PieceColor, PieceKind
 from src.common.field_types import CurrentDatetime, Sip
 from src.game.models.time_update import GameTimeUpdate, GameTimeUpdatePublic
 from src.rules.ply import PlyKind
-from src.utils.custom_model import CustomSQLModel
+from src.utils.custom_model import CustomModel, CustomSQLModel
 
 import src.game.models.main as game_main_models
 
@@ -70,3 +70,8 @@ class PlyBroadcastedData(GamePlyEventBase):
     game_id: int
     sip_after: Sip
     time_update: GameTimeUpdatePublic | None
+
+
+class PlyBatchBroadcastedData(CustomModel):
+    game_id: int
+    plys: list[PlyBroadcastedData]
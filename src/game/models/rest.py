@@ -1,9 +1,10 @@
+from datetime import datetime
 from sqlalchemy import ColumnElement
-from sqlmodel import or_
+from sqlmodel import col, or_
 
 from src.game.models.main import Game
 from src.common.field_types import OptionalPlayerRef
-from src.game.datatypes import TimeControlKind
+from src.common.time_control import TimeControlKind
 from src.utils.custom_model import CustomModel
 
 
@@ -21,3 +22,16 @@ class GameFilter(CustomModel):
         if self.time_control_kind:
             conditions.append(Game.time_control_kind == self.time_control_kind)
         return conditions
+
+
+class GameExportFilter(GameFilter):
+    started_after: datetime | None = None
+    started_before: datetime | None = None
+
+    def construct_conditions(self) -> list[bool | ColumnElement[bool]]:
+        conditions = super().construct_conditions()
+        if self.started_after:
+            conditions.append(col(Game.started_at) >= self.started_after)
+        if self.started_before:
+            conditions.append(col(Game.started_at) < self.started_before)
+        return conditions
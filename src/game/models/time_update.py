@@ -1,5 +1,5 @@
 from typing import Optional
-from datetime import UTC, datetime
+from datetime import datetime
 from enum import StrEnum, auto
 from sqlmodel import Field, Relationship
 
@@ -31,24 +31,6 @@ class GameTimeUpdate(GameTimeUpdateBase, table=True):
 
     game: Optional["Game"] = Relationship()
 
-    def get_actual_time_remainders(self, reference_ts: datetime | None = None) -> dict[PieceColor, int]:
-        remainders = {
-            PieceColor.WHITE: self.white_ms,
-            PieceColor.BLACK: self.black_ms
-        }
-
-        if not self.ticking_side:
-            return remainders
-
-        if not reference_ts:
-            reference_ts = datetime.now(UTC)
-
-        delta_secs = (reference_ts - self.updated_at).total_seconds()
-        delta_ms = int(delta_secs * 1000)
-        remainders[self.ticking_side] -= delta_ms
-
-        return remainders
-
 
 class GameTimeUpdatePublic(GameTimeUpdateBase):
     pass
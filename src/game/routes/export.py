@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from src.common.dependencies import AppDependency
+from src.game.methods.export import generate_ndjson_export
+from src.game.models.rest import GameExportFilter
+
+
+router = APIRouter(prefix="/game")  # LoggingRoute is not used here as it would buffer the whole export in memory
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_games(
+    *,
+    app: AppDependency,
+    export_filter: GameExportFilter = GameExportFilter()
+):
+    async def stream_export():
+        async with app.get_db_session() as session:  # The request-scoped session would be closed before the streaming starts
+            async for line in generate_ndjson_export(session, export_filter):
+                yield line
+
+    return StreamingResponse(stream_export(), media_type="application/x-ndjson")
@@ -10,16 +10,25 @@ from src.common.dependencies import (
     SessionDependency,
 )
 from src.game.dependencies.rest import CLIENT_IS_UPLOADER_DEPENDENCY, GAME_EXISTS_DEPENDENCY, GAME_IS_ONGOING_DEPENDENCY, GameDependency
-from src.game.endpoint_sinks import RollbackPlyCountInput, add_time_sink, append_ply_sink, perform_rollback, validate_rollback
+from src.game.endpoint_sinks import (
+    RollbackPlyCountInput,
+    add_time_sink,
+    append_ply_batch_sink,
+    append_ply_sink,
+    perform_rollback,
+    validate_rollback,
+)
 from src.game.exceptions import PlyInvalidException, SinkException, TimeoutReachedException
-from src.game.methods.create import create_external_game
+from src.game.methods.create import create_external_game, import_external_game
 from src.game.methods.update import end_game
 from src.game.models.external import (
     ExternalGameAddTimePayload,
+    ExternalGameAppendPlyBatchPayload,
     ExternalGameAppendPlyPayload,
     ExternalGameAppendPlyResponse,
     ExternalGameCreatePayload,
     ExternalGameEndPayload,
+    ExternalGameImportPayload,
     ExternalGameRollbackPayload,
 )
 from src.game.models.main import GamePublic
@@ -56,34 +65,70 @@ async def create(
     )
 
 
+@router.post("/import", status_code=201, response_model=GamePublic)
+async def import_game(
+    *,
+    payload: ExternalGameImportPayload,
+    client: MandatoryUserDependency,
+    session: SessionDependency,
+    state: MutableStateDependency,
+    main_config: MainConfigDependency
+):
+    try:
+        with sink_exception_wrapper():
+            return await import_external_game(
+                uploader=client,
+                payload=payload,
+                session=session,
+                state=state,
+                main_config=main_config
+            )
+    except PlyInvalidException as e:
+        raise HTTPException(status_code=400, detail=f"Impossible ply at index {e.ply_index}. SIP before it is {e.current_sip}")
+
+
 @router.get("/append_ply", response_model=ExternalGameAppendPlyResponse, dependencies=[
     CLIENT_IS_UPLOADER_DEPENDENCY,
     GAME_IS_ONGOING_DEPENDENCY,
 ])
 async def append_ply(
     *,
-    payload: ExternalGameAppendPlyPayload,
+    payload: ExternalGameAppendPlyPayload | ExternalGameAppendPlyBatchPayload,
     db_game: GameDependency,
     session: SessionDependency,
     state: MutableStateDependency,
+    main_config: MainConfigDependency,
     secret_config: SecretConfigDependency
 ):
     try:
         with sink_exception_wrapper():
-            outcome = await append_ply_sink(
-                session,
-                state,
-                secret_config,
-                payload,
-                db_game,
-                payload.time_remainders
-            )
+            if isinstance(payload, ExternalGameAppendPlyBatchPayload):
+                outcome = await append_ply_batch_sink(
+                    session,
+                    state,
+                    main_config,
+                    secret_config,
+                    payload,
+                    db_game
+                )
+            else:
+                outcome = await append_ply_sink(
+                    session,
+                    state,
+                    main_config,
+                    secret_config,
+                    payload,
+                    db_game,
+                    payload.time_remainders
+                )
     except TimeoutReachedException as e:
         raise HTTPException(status_code=400, detail=(
             "Server-side timeouts for external games are not implemented yet. "
             "Please end the game explicitly via the respecitive HTTP route or provide time remainders"
         ))
     except PlyInvalidException as e:
+        if e.ply_index is not None:
+            raise HTTPException(status_code=400, detail=f"Impossible ply at index {e.ply_index}. Current SIP is {e.current_sip}")
         raise HTTPException(status_code=400, detail=f"Impossible ply. Current SIP is {e.current_sip}")
     else:
         return ExternalGameAppendPlyResponse(outcome=outcome)
@@ -99,10 +144,11 @@ async def end(
     payload: ExternalGameEndPayload,
     session: SessionDependency,
     state: MutableStateDependency,
+    main_config: MainConfigDependency,
     secret_config: SecretConfigDependency
 ):
     with sink_exception_wrapper():
-        await end_game(session, state, secret_config, payload.game_id, payload.outcome_kind, payload.winner)
+        await end_game(session, state, main_config, secret_config, payload.game_id, payload.outcome_kind, payload.winner)
 
 
 @router.get("/rollback", dependencies=[
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 
-from src.common.dependencies import MutableStateDependency, SecretConfigDependency, SessionDependency
-from src.game.methods.cast import to_public_game
+from src.common.dependencies import KeysetCursorDependency, MainConfigDependency, MutableStateDependency, SecretConfigDependency, SessionDependency
+from src.common.pagination import set_next_cursor
+from src.game.methods.cast import to_public_game, to_public_games
 from src.game.methods.get import get_current_games, get_recent_games
 from src.game.methods.update import check_timeout
 from src.game.models.main import Game, GamePublic
 from src.game.models.rest import GameFilter
 from src.net.base_router import LoggingRoute
+from src.net.core import App
+from src.net.sharding import forwardable
 
 
 router = APIRouter(prefix="/game", route_class=LoggingRoute)
@@ -16,28 +19,30 @@ router = APIRouter(prefix="/game", route_class=LoggingRoute)
 async def get_current_games_route(
     *,
     session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
     offset: int = 0,
     limit: int = Query(default=10, le=50),
     game_filter: GameFilter = GameFilter()
 ):
-    return [
-        await to_public_game(session, game)
-        for game in await get_current_games(session, game_filter, offset, limit)
-    ]
+    games = list(await get_current_games(session, game_filter, offset, limit, cursor))
+    set_next_cursor(response, games, limit, lambda game: (game.started_at, game.id))
+    return await to_public_games(session, games)
 
 
 @router.get("/recent", response_model=list[GamePublic])
 async def get_recent_games_route(
     *,
     session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
     offset: int = 0,
     limit: int = Query(default=10, le=50),
     game_filter: GameFilter = GameFilter()
 ):
-    return [
-        await to_public_game(session, game)
-        for game in await get_recent_games(session, game_filter, offset, limit)
-    ]
+    games = list(await get_recent_games(session, game_filter, offset, limit, cursor))
+    set_next_cursor(response, games, limit, lambda game: (game.started_at, game.id))
+    return await to_public_games(session, games)
 
 
 @router.get("/{game_id}", response_model=GamePublic)
@@ -59,7 +64,17 @@ async def check_timeout_route(
     *,
     session: SessionDependency,
     state: MutableStateDependency,
+    main_config: MainConfigDependency,
     secret_config: SecretConfigDependency,
     game_id: int
 ):
-    await check_timeout(session=session, state=state, secret_config=secret_config, game_id=game_id)
+    if not state.game_router.is_local(game_id):
+        state.game_router.forward_call(game_id, "check_timeout", game_id)  # The clock only ticks on the owning worker
+        return
+    await check_timeout(session=session, state=state, main_config=main_config, secret_config=secret_config, game_id=game_id)
+
+
+@forwardable("check_timeout")
+async def check_timeout_on_owner(app: App, game_id: int) -> None:
+    async with app.get_db_session() as session:
+        await check_timeout(session=session, state=app.mutable_state, main_config=app.main_config, secret_config=app.secret_config, game_id=game_id)
@@ -26,23 +26,26 @@ from src.game.datatypes import OfferAction, OfferKind, OutcomeKind
 collection = WebSocketHandlerCollection()
 
 
-@collection.register(PlyIntentData)
+@collection.register(PlyIntentData, game_affinity=True)
 async def ply(ws: WebSocketWrapper, client: UserReference | None, payload: PlyIntentData):
     async with player_dependencies(ws, client, payload.game_id, ended=False) as deps:
         try:
             await append_ply_sink(
                 deps.session,
                 ws.app.mutable_state,
+                ws.app.main_config,
                 ws.app.secret_config,
                 payload,
                 deps.db_game,
                 None,
-                deps.client_color
+                deps.client_color,
+                ws.rtt.get_lag_credit_ms(ws.app.main_config.lag_compensation.max_credit_ms)
             )
         except TimeoutReachedException as e:
             await end_game(
                 deps.session,
                 ws.app.mutable_state,
+                ws.app.main_config,
                 ws.app.secret_config,
                 payload.game_id,
                 OutcomeKind.TIMEOUT,
@@ -60,7 +63,7 @@ async def ply(ws: WebSocketWrapper, client: UserReference | None, payload: PlyIn
             await ws.send_event(GameRefresh(refresh_payload))
 
 
-@collection.register(ChatMessageIntentData)
+@collection.register(ChatMessageIntentData, game_affinity=True)
 async def send_chat_message(ws: WebSocketWrapper, client: UserReference | None, payload: ChatMessageIntentData):
     async with any_user_dependencies(ws, client, payload.game_id, ended=False) as deps:
         is_spectator = deps.db_game.outcome or deps.client.reference not in (deps.db_game.white_player_ref, deps.db_game.black_player_ref)
@@ -81,7 +84,7 @@ async def send_chat_message(ws: WebSocketWrapper, client: UserReference | None,
         await ws.app.mutable_state.ws_subscribers.broadcast(event, tag_blacklist)
 
 
-@collection.register(OfferActionIntentData)
+@collection.register(OfferActionIntentData, game_affinity=True)
 async def perform_offer_action(ws: WebSocketWrapper, client: UserReference | None, payload: OfferActionIntentData):
     async with player_dependencies(ws, client, payload.game_id, ended=False) as deps:
         match payload.action_kind:
@@ -100,17 +103,17 @@ async def perform_offer_action(ws: WebSocketWrapper, client: UserReference | Non
                     await accept_takeback(deps.session, ws, payload.game_id, deps.client_color.opposite(), deps.db_game)
 
 
-@collection.register(AddTimeIntentData)
+@collection.register(AddTimeIntentData, game_affinity=True)
 async def add_time(ws: WebSocketWrapper, client: UserReference | None, payload: AddTimeIntentData):
     async with player_dependencies(ws, client, payload.game_id, ended=False) as deps:
         await add_time_sink(deps.session, ws.app.main_config, ws.app.mutable_state, payload, deps.client_color.opposite())
 
 
-@collection.register(GameId)
+@collection.register(GameId, game_affinity=True)
 async def resign(ws: WebSocketWrapper, client: UserReference | None, payload: GameId):
     async with player_dependencies(ws, client, payload.game_id, ended=False) as deps:
         last_ply_event = await get_last_ply_event(deps.session, payload.game_id)
         if not last_ply_event or last_ply_event.ply_index < 1:
-            await end_game(deps.session, ws.app.mutable_state, ws.app.secret_config, payload.game_id, OutcomeKind.ABORT, None)
+            await end_game(deps.session, ws.app.mutable_state, ws.app.main_config, ws.app.secret_config, payload.game_id, OutcomeKind.ABORT, None)
         else:
-            await end_game(deps.session, ws.app.mutable_state, ws.app.secret_config, payload.game_id, OutcomeKind.RESIGN, deps.client_color.opposite())
+            await end_game(deps.session, ws.app.mutable_state, ws.app.main_config, ws.app.secret_config, payload.game_id, OutcomeKind.RESIGN, deps.client_color.opposite())
@@ -78,7 +78,7 @@ async def accept_draw(session: AsyncSession, ws: WebSocketWrapper, game_id: int,
 
     await append_offer_event(session, ws.app.mutable_state, OfferAction.ACCEPT, OfferKind.DRAW, offer_author, game_id)
 
-    await end_game(session, ws.app.mutable_state, ws.app.secret_config, game_id, OutcomeKind.DRAW_AGREEMENT, None)
+    await end_game(session, ws.app.mutable_state, ws.app.main_config, ws.app.secret_config, game_id, OutcomeKind.DRAW_AGREEMENT, None)
 
 
 async def accept_takeback(session: AsyncSession, ws: WebSocketWrapper, game_id: int, offer_author: PieceColor, game: Game) -> None:
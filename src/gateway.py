@@ -0,0 +1,9 @@
+from src.net.core import App
+from src.net.datatypes import ServerRole
+
+
+app = App(  # Terminates the WebSockets in front of the cores started from src.main, see ServerRole.GATEWAY
+    rest_routers=[],
+    ws_collections=[],
+    role=ServerRole.GATEWAY
+)
@@ -46,6 +46,16 @@ class WSLog(CustomSQLModel, table=True):
     incoming: bool
 
 
+# <private>
+class WSBroadcastLog(CustomSQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    ts: CurrentDatetime
+    channel: str
+    recipients_cnt: int
+    connection_ids: str = Field(sa_column=Column(MEDIUMTEXT))  # Comma-separated
+    payload: str
+
+
 # <private>
 class ServiceLog(CustomSQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
@@ -0,0 +1,73 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel
+
+from src.config.models import LogWriterParams
+from src.utils.async_orm_session import AsyncSession
+
+import asyncio
+import random
+
+
+class BatchedLogWriter:  # Accepts log rows without ever waiting on the database and persists them in batches from a single background task
+    def __init__(self, db_engine: AsyncEngine, params: LogWriterParams) -> None:
+        self._db_engine = db_engine
+        self._params = params
+        self._queue: asyncio.Queue[SQLModel] = asyncio.Queue(maxsize=params.queue_size)
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+        self.written_cnt = 0
+        self.sampled_out_cnt = 0
+        self.dropped_cnt = 0  # Rejected because the queue was full
+        self.failed_cnt = 0  # Lost in batches the database refused
+
+    def submit(self, entry: SQLModel, sample_rate: float = 1.0) -> None:
+        if sample_rate < 1 and random.random() >= sample_rate:
+            self.sampled_out_cnt += 1
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped_cnt += 1
+
+    def start(self) -> None:
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task:
+            await self._task  # Exits once the queue is flushed
+            self._task = None
+
+    async def _collect_batch(self) -> list[SQLModel]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._params.flush_interval_ms / 1000
+        batch: list[SQLModel] = []
+        while len(batch) < self._params.batch_size:
+            if self._stopping and self._queue.empty():
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: list[SQLModel]) -> None:
+        try:
+            async with AsyncSession(self._db_engine) as session:
+                session.add_all(batch)
+                await session.commit()
+        except Exception:
+            self.failed_cnt += len(batch)
+        else:
+            self.written_cnt += len(batch)
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect_batch()
+            if batch:
+                await self._write(batch)
@@ -2,6 +2,7 @@ from src.auth import routes as auth_routes
 from src.challenge import routes as challenge_routes
 from src.game.routes import main as main_game_routes
 from src.game.routes import external as external_game_routes
+from src.game.routes import export as export_game_routes
 from src.player import routes as player_routes
 from src.other import routes as other_routes
 from src.study import routes as study_routes
@@ -15,6 +16,7 @@ app = App(
     rest_routers=[
         auth_routes.router,
         challenge_routes.router,
+        export_game_routes.router,
         main_game_routes.router,
         external_game_routes.router,
         player_routes.router,
@@ -0,0 +1,248 @@
+from collections import deque
+from typing import Callable, Protocol
+from urllib.parse import urlsplit
+
+from src.config.models import BackplaneParams
+from src.net.datatypes import BackplaneKind
+from src.net.resp import RESPError, RESPValue, encode_command, read_value
+
+import asyncio
+import logging
+
+
+RECONNECT_MIN_DELAY_S = 0.1
+RECONNECT_MAX_DELAY_S = 10.0
+
+logger = logging.getLogger(__name__)
+
+type EnvelopeHandler = Callable[[bytes], None]
+
+
+class Backplane(Protocol):  # Connects the worker processes serving the same clientele
+    has_peers: bool  # Whether broadcasts have to leave the process at all
+
+    async def start(self, on_broadcast: EnvelopeHandler, on_forwarded: EnvelopeHandler, address: str) -> None:
+        ...
+
+    async def stop(self) -> None:
+        ...
+
+    async def publish(self, envelope: bytes) -> None:
+        ...
+
+    def forward(self, address: str, envelope: bytes) -> None:  # Addressed to a single process, see GameRouter
+        ...
+
+    async def allocate_guest_id(self) -> int:
+        ...
+
+    async def get_last_guest_id(self) -> int:
+        ...
+
+    async def raise_last_guest_id(self, value: int) -> None:
+        ...
+
+
+class InProcessBackplane:  # A single worker holds every connection, so there is nobody to relay broadcasts to
+    has_peers = False
+
+    def __init__(self) -> None:
+        self._last_guest_id = 0
+        self._on_forwarded: EnvelopeHandler | None = None
+
+    async def start(self, on_broadcast: EnvelopeHandler, on_forwarded: EnvelopeHandler, address: str) -> None:
+        self._on_forwarded = on_forwarded
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, envelope: bytes) -> None:
+        pass
+
+    def forward(self, address: str, envelope: bytes) -> None:
+        if self._on_forwarded:
+            self._on_forwarded(envelope)  # The only process has every address
+
+    async def allocate_guest_id(self) -> int:
+        self._last_guest_id += 1
+        return self._last_guest_id
+
+    async def get_last_guest_id(self) -> int:
+        return self._last_guest_id
+
+    async def raise_last_guest_id(self, value: int) -> None:
+        self._last_guest_id = max(self._last_guest_id, value)
+
+
+class BrokerBackplane:  # Speaks RESP, so the broker may be either the bundled one (src/cli/backplane_broker.py) or a Redis server
+    has_peers = True
+
+    def __init__(self, params: BackplaneParams) -> None:
+        self._params = params
+        self._command_writer: asyncio.StreamWriter | None = None
+        self._subscription_writer: asyncio.StreamWriter | None = None
+        self._pending: deque[asyncio.Future | None] = deque()  # Reply slots in command order, None for the publications nobody waits for
+        self._topic_handlers: dict[bytes, EnvelopeHandler] = {}
+        self._task: asyncio.Task | None = None
+        self._restore_task: asyncio.Task | None = None
+        self._connected = False
+        self._highest_guest_id = 0  # Restored after a reconnection, in case the broker has lost the counter
+
+        self.lost_publications_cnt = 0
+        self.reconnect_cnt = 0
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        url = urlsplit(self._params.broker_url)
+        if url.scheme == "unix":
+            return await asyncio.open_unix_connection(url.path)
+        return await asyncio.open_connection(url.hostname, url.port or 6379)
+
+    def _get_address_topic(self, address: str) -> str:
+        return f"{self._params.topic}.{address}"
+
+    async def start(self, on_broadcast: EnvelopeHandler, on_forwarded: EnvelopeHandler, address: str) -> None:
+        self._topic_handlers = {
+            self._params.topic.encode(): on_broadcast,
+            self._get_address_topic(address).encode(): on_forwarded
+        }
+        readers = await self._open()  # Unlike a later outage, an unreachable broker fails the startup
+        self._task = asyncio.create_task(self._maintain(*readers))
+
+    async def stop(self) -> None:
+        for task in (self._task, self._restore_task):
+            if task:
+                task.cancel()
+        self._task = self._restore_task = None
+        self._close()
+
+    async def _open(self) -> tuple[asyncio.StreamReader, asyncio.StreamReader]:
+        try:
+            command_reader, self._command_writer = await self._connect()
+            subscription_reader, self._subscription_writer = await self._connect()
+            self._subscription_writer.write(encode_command("SUBSCRIBE", *self._topic_handlers))
+            await self._subscription_writer.drain()
+        except OSError:
+            self._close()
+            raise
+        self._connected = True
+        return command_reader, subscription_reader
+
+    def _close(self) -> None:
+        self._connected = False
+        for future in self._pending:
+            if future and not future.done():
+                future.set_exception(ConnectionError("Backplane broker connection lost"))
+        self._pending.clear()
+        for writer in (self._command_writer, self._subscription_writer):
+            if writer:
+                writer.close()
+        self._command_writer = self._subscription_writer = None
+
+    async def _maintain(self, command_reader: asyncio.StreamReader, subscription_reader: asyncio.StreamReader) -> None:  # Reconnects with an exponential backoff whenever the broker drops either connection
+        while True:
+            tasks = [
+                asyncio.create_task(self._read_replies(command_reader)),
+                asyncio.create_task(self._read_publications(subscription_reader))
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            reason = next((task.exception() for task in done if not task.cancelled()), None)
+            logger.error("Backplane broker connection lost (%r), the peers' broadcasts and forwarded intents are missed until it's back", reason)
+            self._close()
+
+            delay_s = RECONNECT_MIN_DELAY_S
+            while True:
+                await asyncio.sleep(delay_s)
+                try:
+                    command_reader, subscription_reader = await self._open()
+                    break
+                except OSError as e:
+                    delay_s = min(delay_s * 2, RECONNECT_MAX_DELAY_S)
+                    logger.warning("Backplane broker is still unreachable (%r), retrying in %.1f s", e, delay_s)
+            self.reconnect_cnt += 1
+            logger.info("Reconnected to the backplane broker")
+            self._restore_task = asyncio.create_task(self._restore_guest_id_counter())  # Its reply is read once the loop restarts the readers
+
+    def _send(self, *args: str | bytes | int, expect_reply: bool) -> asyncio.Future | None:
+        if not self._connected or not self._command_writer:
+            raise ConnectionError("Backplane broker is unreachable")
+        future = asyncio.get_running_loop().create_future() if expect_reply else None
+        self._pending.append(future)
+        self._command_writer.write(encode_command(*args))
+        return future
+
+    async def _execute(self, *args: str | bytes | int) -> RESPValue:
+        future = self._send(*args, expect_reply=True)
+        assert future and self._command_writer
+        await self._command_writer.drain()
+        return await future
+
+    async def _read_replies(self, reader: asyncio.StreamReader) -> None:  # Commands are pipelined, the broker answers them in order
+        while True:
+            reply = await read_value(reader)  # Raises once the connection is gone, the pending commands are failed by _close()
+            future = self._pending.popleft()
+            if future is None or future.done():
+                continue
+            if isinstance(reply, RESPError):
+                future.set_exception(reply)
+            else:
+                future.set_result(reply)
+
+    async def _read_publications(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            value = await read_value(reader)
+            if not isinstance(value, list) or len(value) != 3 or value[0] != b'message' or not isinstance(value[2], bytes):
+                continue
+            handler = self._topic_handlers.get(value[1])  # type: ignore
+            if handler:
+                try:
+                    handler(value[2])
+                except Exception:
+                    logger.exception("Failed to handle a backplane envelope")  # A malformed envelope must not stop the delivery of the following ones
+
+    async def publish(self, envelope: bytes) -> None:
+        try:
+            self._send("PUBLISH", self._params.topic, envelope, expect_reply=False)
+        except ConnectionError:
+            self.lost_publications_cnt += 1
+            return
+        assert self._command_writer
+        await self._command_writer.drain()
+
+    def forward(self, address: str, envelope: bytes) -> None:  # Doesn't wait for the socket buffer to drain, the volume of intents is modest
+        try:
+            self._send("PUBLISH", self._get_address_topic(address), envelope, expect_reply=False)
+        except ConnectionError:
+            self.lost_publications_cnt += 1
+
+    async def _restore_guest_id_counter(self) -> None:
+        try:
+            await self.raise_last_guest_id(self._highest_guest_id)
+        except (ConnectionError, RESPError) as e:
+            logger.error("Failed to restore the guest id counter on the backplane broker (%r)", e)
+
+    async def allocate_guest_id(self) -> int:
+        guest_id = int(await self._execute("INCR", self._params.guest_id_key))  # type: ignore
+        self._highest_guest_id = max(self._highest_guest_id, guest_id)
+        return guest_id
+
+    async def get_last_guest_id(self) -> int:
+        value = await self._execute("GET", self._params.guest_id_key)
+        return int(value) if isinstance(value, (bytes, int)) else 0
+
+    async def raise_last_guest_id(self, value: int) -> None:
+        self._highest_guest_id = max(self._highest_guest_id, value)
+        current = await self.get_last_guest_id()
+        if current < value:
+            await self._execute("INCRBY", self._params.guest_id_key, value - current)  # Workers starting simultaneously may overshoot, which only leaves a gap
+
+
+def create_backplane(params: BackplaneParams) -> Backplane:
+    match params.kind:
+        case BackplaneKind.IN_PROCESS:
+            return InProcessBackplane()
+        case BackplaneKind.BROKER:
+            return BrokerBackplane(params)
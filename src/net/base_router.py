@@ -1,10 +1,8 @@
-from fastapi import BackgroundTasks, Response, Request
+from fastapi import Response, Request
 from fastapi.datastructures import Headers
-from sqlmodel import Session
-from starlette.background import BackgroundTask
 from starlette.responses import StreamingResponse
 from fastapi.routing import APIRoute
-from typing import Callable
+from typing import AsyncIterator, Callable
 
 from src.net.core import App
 from src.common.constants import USER_TOKEN_HEADER
@@ -13,9 +11,12 @@ import json
 import src.log.models as log_models
 
 
-def headers_to_str(headers: Headers) -> str:
+MAX_LOGGED_BODY_LENGTH = 4000
+
+
+def headers_to_str(headers: Headers, allowed_headers: list[str]) -> str:
     try:
-        return json.dumps(dict(headers.items()), ensure_ascii=False)
+        return json.dumps({key: value for key, value in headers.items() if key.lower() in allowed_headers}, ensure_ascii=False)
     except Exception:
         return "unparsable"
 
@@ -24,7 +25,7 @@ def request_body_to_str(body: bytes) -> str:
     try:
         if not body:
             return "missing"
-        elif len(body) > 4000:
+        elif len(body) > MAX_LOGGED_BODY_LENGTH:
             return "too_long"
         else:
             return body.decode()
@@ -33,7 +34,7 @@ def request_body_to_str(body: bytes) -> str:
 
 
 def response_body_to_str(body: bytes) -> str:
-    if len(body) > 4000:
+    if len(body) > MAX_LOGGED_BODY_LENGTH:
         return "too_long"
     else:
         try:
@@ -45,59 +46,59 @@ def response_body_to_str(body: bytes) -> str:
 def get_client_ref(request: Request, app: App) -> str | None:
     token = request.headers.get(USER_TOKEN_HEADER)
     if token:
-        user_ref = app.mutable_state.token_to_user.get(token)
+        user_ref = app.mutable_state.tokens.verify(token)
         return user_ref.reference if user_ref else None
     return None
 
 
-async def log_info(request: Request, response_code: int, response_body: bytes, app: App):
-    with Session(app.db_engine) as session:
-        request_entry = log_models.RESTRequestLog(
-            client_host=request.client.host if request.client else "unknown",
-            authorized_as=get_client_ref(request, app),
-            endpoint=request.url.path,
-            method=request.method,
-            headers_json=headers_to_str(request.headers),
-            payload=request_body_to_str(await request.body()),
-        )
-        response_entry = log_models.RESTResponseLog(
-            response_code=response_code,
-            response=response_body_to_str(response_body),
-            request=request_entry
-        )
-        session.add(request_entry)
-        session.add(response_entry)
-        session.commit()
+def submit_log_entry(request: Request, request_body: bytes, response_code: int, response_body: bytes, app: App, sample_rate: float) -> None:
+    request_entry = log_models.RESTRequestLog(
+        client_host=request.client.host if request.client else "unknown",
+        authorized_as=get_client_ref(request, app),
+        endpoint=request.url.path,
+        method=request.method,
+        headers_json=headers_to_str(request.headers, app.main_config.logging.rest_logged_headers),
+        payload=request_body_to_str(request_body),
+    )
+    log_models.RESTResponseLog(
+        response_code=response_code,
+        response=response_body_to_str(response_body),
+        request=request_entry
+    )
+    app.log_writer.submit(request_entry, sample_rate)  # The response entry is saved along via the relationship
+
+
+async def tee_body_iterator(body_iterator: AsyncIterator[str | bytes], on_complete: Callable[[bytes], None]) -> AsyncIterator[str | bytes]:
+    captured = bytearray()  # Just one byte over the limit is enough to tell the body is too long to be logged
+    async for chunk in body_iterator:
+        if len(captured) <= MAX_LOGGED_BODY_LENGTH:
+            encoded_chunk = chunk.encode() if isinstance(chunk, str) else chunk
+            captured += encoded_chunk[:MAX_LOGGED_BODY_LENGTH + 1 - len(captured)]
+        yield chunk
+    on_complete(bytes(captured))
 
 
 class LoggingRoute(APIRoute):
     def get_route_handler(self) -> Callable:
         original_route_handler = super().get_route_handler()
+        route_path = self.path
 
         async def custom_route_handler(request: Request) -> Response:
             response = await original_route_handler(request)
-            existing_task = response.background
+
+            app: App = request.app
+            log_params = app.main_config.logging
+            sample_rate = log_params.rest_route_sample_rates.get(route_path, log_params.rest_default_sample_rate)
+            request_body = await request.body()
 
             if isinstance(response, StreamingResponse):
-                chunks = []
-                async for chunk in response.body_iterator:
-                    chunks.append(chunk)
-                response_body = b''.join(chunks)  # type: ignore
-
-                task = BackgroundTask(log_info, request, response.status_code, response_body, request.app)
-                response = Response(
-                    content=response_body,
-                    status_code=response.status_code,
-                    headers=dict(response.headers),
-                    media_type=response.media_type
+                status_code = response.status_code
+                response.body_iterator = tee_body_iterator(
+                    response.body_iterator,
+                    lambda response_body: submit_log_entry(request, request_body, status_code, response_body, app, sample_rate)
                 )
             else:
-                task = BackgroundTask(log_info, request, response.status_code, response.body, request.app)
-
-            if existing_task:
-                response.background = BackgroundTasks([existing_task, task])
-            else:
-                response.background = task
+                submit_log_entry(request, request_body, response.status_code, bytes(response.body), app, sample_rate)
 
             return response
 
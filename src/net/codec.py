@@ -0,0 +1,163 @@
+from typing import Any, Protocol
+from fastapi import WebSocket
+from pydantic import TypeAdapter
+
+from src.pubsub.outgoing_event.base import OutgoingEvent
+
+import json
+import msgpack  # type: ignore
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # Optional, the JSON protocol falls back to pydantic's serializer and the stdlib parser
+    orjson = None
+
+
+MSGPACK_SUBPROTOCOL = "msgpack.v1"
+
+# The positions are the integer IDs used by the binary protocol, so these lists are append-only
+OUTGOING_EVENT_NAMES = [
+    "server_shutdown",
+    "game_started",
+    "new_public_challenge",
+    "public_challenge_cancelled",
+    "public_challenge_fulfilled",
+    "public_challenges_cancelled_by_server",
+    "new_active_game",
+    "new_recent_game",
+    "incoming_challenge_received",
+    "incoming_challenge_cancelled",
+    "incoming_challenges_cancelled_by_server",
+    "outgoing_challenge_accepted",
+    "outgoing_challenge_rejected",
+    "outgoing_challenges_cancelled_by_server",
+    "new_ply",
+    "new_ply_batch",
+    "new_chat_message",
+    "offer_action_performed",
+    "time_added",
+    "rollback",
+    "game_ended",
+    "leaderboard_changed",
+    "new_subscriber",
+    "subscriber_left",
+    "refresh.player.started_games",
+    "refresh.public_challenge_list",
+    "refresh.game_list",
+    "refresh.incoming_challenges",
+    "refresh.outgoing_challenges",
+    "refresh.game.main",
+    "refresh.subscriber_list",
+    "channel_resync_required",
+]
+INCOMING_EVENT_NAMES = [
+    "ping",
+    "ply",
+    "send_chat_message",
+    "perform_offer_action",
+    "add_time",
+    "resign",
+]
+CHANNEL_GROUPS = [
+    "everyone",
+    "public_challenge_list",
+    "game_list",
+    "incoming_challenges",
+    "outgoing_challenges",
+    "game.main",
+    "player.started_games",
+    "leaderboard",
+    "subscriber_list",
+]
+
+_OUTGOING_EVENT_IDS = {name: index for index, name in enumerate(OUTGOING_EVENT_NAMES)}
+_CHANNEL_GROUP_IDS = {group: index for index, group in enumerate(CHANNEL_GROUPS)}
+
+_ANY_ADAPTER: TypeAdapter[Any] = TypeAdapter(Any)
+
+
+class WebSocketCodec(Protocol):
+    subprotocol: str | None
+
+    def encode(self, message: dict) -> str | bytes:
+        ...
+
+    def encode_event(self, event_instance: OutgoingEvent) -> str | bytes:
+        ...
+
+    def encode_batch(self, frames: list[str | bytes]) -> str | bytes:
+        ...
+
+    async def receive(self, ws: WebSocket) -> tuple[Any, str | None]:  # The decoded message and, if the protocol is textual, its raw form
+        ...
+
+
+class JsonCodec:
+    subprotocol = None
+
+    def encode(self, message: dict) -> str:
+        if orjson:
+            return orjson.dumps(message).decode()
+        return _ANY_ADAPTER.dump_json(message).decode()
+
+    def encode_event(self, event_instance: OutgoingEvent) -> str:
+        return event_instance.to_json()
+
+    def encode_batch(self, frames: list[str | bytes]) -> str | bytes:  # {"batch": [...]}, built from the already encoded frames
+        return '{"batch":[' + ",".join(frame if isinstance(frame, str) else frame.decode() for frame in frames) + ']}'
+
+    async def receive(self, ws: WebSocket) -> tuple[Any, str | None]:
+        raw = await ws.receive_text()
+        return orjson.loads(raw) if orjson else json.loads(raw), raw
+
+
+class MessagePackCodec:  # Outgoing events become [event_id, channel, body] with the channel group replaced by its ID, errors stay maps
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    @staticmethod
+    def _compact_channel(channel: dict | None) -> dict | None:
+        if channel is None:
+            return None
+        group = channel.get("channel_group")
+        return dict(channel, channel_group=_CHANNEL_GROUP_IDS.get(group, group))
+
+    def encode(self, message: dict) -> str | bytes:
+        if "event" not in message:
+            return msgpack.packb(message)
+        event = message["event"]
+        return msgpack.packb([_OUTGOING_EVENT_IDS.get(event, event), self._compact_channel(message["channel"]), message["body"]])
+
+    def encode_event(self, event_instance: OutgoingEvent) -> str | bytes:
+        return self.encode(event_instance.to_dict())
+
+    def encode_batch(self, frames: list[str | bytes]) -> str | bytes:  # {"batch": [...]}, the packed frames are concatenated after a manually written array header
+        cnt = len(frames)
+        if cnt < 16:
+            array_header = bytes([0x90 | cnt])
+        elif cnt < 2 ** 16:
+            array_header = b'\xdc' + cnt.to_bytes(2, 'big')
+        else:
+            array_header = b'\xdd' + cnt.to_bytes(4, 'big')
+        return b'\x81' + msgpack.packb("batch") + array_header + b''.join(frame if isinstance(frame, bytes) else msgpack.packb(frame) for frame in frames)
+
+    @staticmethod
+    def _expand_message(data: Any) -> Any:
+        if not isinstance(data, list) or not data:  # Maps are accepted as they are, the same way as JSON objects
+            return data
+        event, token, body = (data + [None, None])[:3]
+        if isinstance(event, int) and 0 <= event < len(INCOMING_EVENT_NAMES):
+            event = INCOMING_EVENT_NAMES[event]
+        return dict(event=event, token=token, body=body or {})
+
+    async def receive(self, ws: WebSocket) -> tuple[Any, str | None]:
+        return self._expand_message(msgpack.unpackb(await ws.receive_bytes())), None
+
+
+JSON_CODEC = JsonCodec()
+MSGPACK_CODEC = MessagePackCodec()
+
+
+def negotiate_codec(ws: WebSocket) -> WebSocketCodec:
+    if MSGPACK_SUBPROTOCOL in ws.scope.get("subprotocols", []):
+        return MSGPACK_CODEC
+    return JSON_CODEC
@@ -1,28 +1,39 @@
 from __future__ import annotations
 
+from collections import defaultdict
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Hashable
 from uuid import UUID, uuid4
 from fastapi import APIRouter, FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from jinja2 import Template
 from pydantic import BaseModel, ValidationError
-from sqlmodel import SQLModel
+from sqlmodel import SQLModel, select
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
+from src.auth.tokens import TokenSigner
+from src.common.time_control import TimeControlKind
 from src.common.user_ref import UserReference
 from src.pubsub.models.channel import EventChannel, EveryoneEventChannel
 from src.config.models import MainConfig, SecretConfig
+from src.game.clock import GameClock
 from src.log.models import ServerLaunch, WSLog
+from src.log.writer import BatchedLogWriter
+from src.net.datatypes import OutboundPriority, ServerRole
+from src.net.backplane import Backplane, create_backplane
+from src.net.codec import CHANNEL_GROUPS, INCOMING_EVENT_NAMES, JSON_CODEC, MSGPACK_SUBPROTOCOL, OUTGOING_EVENT_NAMES, WebSocketCodec, negotiate_codec
 from src.net.incoming import WebSocketHandlerCollection
+from src.net.lag import RoundTripTimeStats
+from src.net.outbound import OutboundMessage, OutboundQueue
+from src.net.sharding import GameRouter, get_gateway_address, get_shard_address
 from src.net.sub_storage import SubscriberStorage
 from src.net.utils.ws_error import ErrorKind
 from src.config.loader import load
 from src.player.datatypes import UserStatus
+from src.player.leaderboard import Leaderboard
 from src.pubsub.outgoing_event.base import OutgoingEvent
-from src.utils.bijective_map import BijectiveMap
 from src.utils.async_orm_session import AsyncSession
 
 from src.auth.models import *  # noqa: F401, F403
@@ -50,13 +61,18 @@ from src.player.models import *  # noqa: F401, F403
 from src.pubsub.models.channel import *  # noqa: F401, F403
 from src.study.models import *  # noqa: F401, F403
 
-import time
+import asyncio
 import json
+import logging
+import os
+import time
 import yaml  # type: ignore
 
 
 LAST_GUEST_ID_QUERY_PATH = Path('resources/sql/last_guest_id.sql')
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class WebSocketWrapper:
@@ -65,41 +81,82 @@ class WebSocketWrapper:
     last_activity: int  # unixsecs of last user activity on the front-end (received with pings; cannot decrease or be less than last_message; activity usually assumes mouse movement)
     last_message: int  # unixsecs of any last message got from this socket (including pings and invalid messages)
     uuid: UUID = field(default_factory=uuid4)
-    saved_token: str | None = None
+    saved_user: UserReference | None = None  # Whom the latest valid token belonged to, see SubscriberStorage.set_user()
+    rtt: RoundTripTimeStats = field(default_factory=RoundTripTimeStats)
+    codec: WebSocketCodec = JSON_CODEC
+    outbox: OutboundQueue = field(default_factory=OutboundQueue)
+    batch_window_us: int | None = None  # Set for the clients that opted into batch envelopes
+    _closing_task: asyncio.Task | None = None
 
     def __post_init__(self):
         self.send_json = self.ws.send_json
 
     def get_user_ref(self) -> str | None:
-        if self.saved_token:
-            user = self.app.mutable_state.token_to_user.get(self.saved_token)
-            if user:
-                return user.reference
-        return None
-
-    async def _send_logged_json(self, payload: dict) -> None:
-        async with AsyncSession(self.app.db_engine) as session:
-            session.add(WSLog(
-                connection_id=str(self.uuid),
-                authorized_as=self.get_user_ref(),
-                payload=json.dumps(payload, ensure_ascii=False),
-                incoming=False
-            ))
-            await session.commit()
+        return self.saved_user.reference if self.saved_user else None
+
+    def log(self, entry: SQLModel) -> None:
+        self.app.log_writer.submit(entry, self.app.main_config.logging.ws_sample_rate)
+
+    def _send_logged(self, json_frame: str, frame: str | bytes, priority: OutboundPriority = OutboundPriority.CRITICAL, coalesce_key: Hashable | None = None) -> None:
+        self.log(WSLog(
+            connection_id=str(self.uuid),
+            authorized_as=self.get_user_ref(),
+            payload=json_frame,  # Logged as JSON whatever the protocol is
+            incoming=False
+        ))
+        self.enqueue(OutboundMessage(frame, priority, coalesce_key))
+
+    def enqueue(self, message: OutboundMessage) -> None:  # Never waits for the socket. Unlogged, broadcasts are logged once for all the recipients
+        if not self.outbox.put(message) and not self._closing_task:
+            self._closing_task = asyncio.create_task(self.ws.close(code=1013))  # Try Again Later: the client can't keep up with the traffic
+
+    def enqueue_json_frame(self, json_frame: str, priority: OutboundPriority, coalesce_key: Hashable | None) -> None:
+        frame = json_frame if self.codec is JSON_CODEC else self.codec.encode(json.loads(json_frame))
+        self.enqueue(OutboundMessage(frame, priority, coalesce_key))
 
-        await self.ws.send_json(payload)
+    async def send_frame(self, frame: str | bytes) -> None:
+        if isinstance(frame, bytes):
+            await self.ws.send_bytes(frame)
+        else:
+            await self.ws.send_text(frame)
+
+    async def _collect_batch(self, first_message: OutboundMessage) -> str | bytes:
+        if self.batch_window_us is None or not first_message.batchable:
+            return first_message.frame
+
+        await asyncio.sleep(self.batch_window_us / 1_000_000)  # Even a zero sleep lets the rest of the current tick enqueue its events
+        frames = [first_message.frame] + [message.frame for message in self.outbox.drain_batchable(self.app.main_config.outbound.max_batch_size - 1)]
+        return self.codec.encode_batch(frames) if len(frames) > 1 else first_message.frame
+
+    async def run_writer(self) -> None:
+        try:
+            while True:
+                message = await self.outbox.get()
+                await self.send_frame(await self._collect_batch(message))
+        except (WebSocketDisconnect, ConnectionError, RuntimeError):
+            pass  # The socket is gone, the receiving loop takes care of the cleanup
+        except Exception:
+            logger.exception("Outbound writer of connection %s failed, closing the socket", self.uuid)
+            try:
+                await self.ws.close(code=1011)  # Internal Error: nothing would be sent to this client anymore
+            except (WebSocketDisconnect, ConnectionError, RuntimeError):
+                pass  # Closed by the client in the meantime
 
     async def send_event[T: BaseModel | None, C: EventChannel | None](self, event_instance: OutgoingEvent[T, C]) -> None:
-        await self._send_logged_json(event_instance.to_dict())
+        json_frame = event_instance.to_json()
+        frame = json_frame if self.codec is JSON_CODEC else self.codec.encode_event(event_instance)
+        self._send_logged(json_frame, frame, event_instance.priority, event_instance.coalesce_key())
 
-    async def send_pong(self) -> None:
-        await self.ws.send_text("pong")
+    async def send_pong(self, probe_nonce: int | None = None) -> None:  # The client is to echo the nonce right away, see RoundTripTimeStats
+        self.enqueue(OutboundMessage("pong" if probe_nonce is None else f"pong:{probe_nonce}", batchable=False))
 
     async def send_error(self, error: ErrorKind, details: Any) -> None:
-        await self._send_logged_json(dict(
+        payload = dict(
             error=error.value,
             details=details
-        ))
+        )
+        json_frame = JSON_CODEC.encode(payload)
+        self._send_logged(json_frame, json_frame if self.codec is JSON_CODEC else self.codec.encode(payload))
 
     async def send_validation_error(self, error: ValidationError) -> None:
         await self.send_error(ErrorKind.VALIDATION_ERROR, error.errors())
@@ -113,58 +170,112 @@ class WebSocketWrapper:
         return UserStatus.ONLINE
 
 
+@dataclass
+class RelayedWebSocketWrapper(WebSocketWrapper):  # Stands in for a connection held by another process, which gets everything sent to it
+    origin: str = ""  # Backplane address of that process
+
+    def __post_init__(self):
+        pass
+
+    def enqueue(self, message: OutboundMessage) -> None:
+        assert isinstance(message.frame, str)  # Always encoded with the default JSON codec, the origin worker re-encodes it if needed
+        self.app.mutable_state.game_router.relay_reply(self.origin, self.uuid, message.frame, message.priority, message.coalesce_key)
+
+
 @dataclass
 class MutableState:
     shutdown_activated: bool = False
-    token_to_user: BijectiveMap[str, UserReference] = field(default_factory=BijectiveMap)
+    tokens: TokenSigner = field(default_factory=TokenSigner.ephemeral)
     ws_subscribers: SubscriberStorage = field(default_factory=SubscriberStorage)
-    last_guest_id: int = 0
-    game_timeout_not_earlier_than: dict[int, float] = field(default_factory=dict)
+    game_router: GameRouter = field(default_factory=GameRouter)
+    game_clocks: dict[int, GameClock] = field(default_factory=dict)  # Ticking games only, every change is written through as a GameTimeUpdate
+    leaderboards: defaultdict[TimeControlKind, Leaderboard] = field(default_factory=lambda: defaultdict(Leaderboard))  # Non-provisional ratings only
+
+    async def add_guest(self) -> tuple[int, str]:
+        guest_id = await self.ws_subscribers.backplane.allocate_guest_id()  # Unique across all the workers sharing the backplane
+        return guest_id, self.tokens.issue(UserReference.guest(guest_id))
+
+    async def get_last_guest_id(self) -> int:
+        return await self.ws_subscribers.backplane.get_last_guest_id()
 
-    def add_guest(self, token: str) -> int:
-        self.last_guest_id += 1
-        self.token_to_user.add(token, UserReference.guest(self.last_guest_id))
-        return self.last_guest_id
+    def add_logged(self, login: str) -> str:
+        return self.tokens.issue(UserReference.logged(login))  # TODO: Update case
 
-    def add_logged(self, token: str, login: str) -> None:
-        self.token_to_user.add(token, UserReference.logged(login))  # TODO: Update case
+    def update_rating(self, login: str, time_control_kind: TimeControlKind, elo: int, is_provisional: bool) -> None:
+        if is_provisional:
+            self.leaderboards[time_control_kind].remove(login)
+        else:
+            self.leaderboards[time_control_kind].update(login, elo)
 
     def has_user_subscriber(self, user_ref: UserReference, channel: EventChannel = EveryoneEventChannel()) -> bool:
-        return self.ws_subscribers.has_user_subscriber(self.token_to_user, user_ref, channel)
+        return self.ws_subscribers.has_user_subscriber(user_ref, channel)
 
     def get_user_status_in_channel(self, user_ref: UserReference, channel: EventChannel) -> UserStatus:
-        return self.ws_subscribers.get_user_status_in_channel(self.token_to_user, user_ref, channel)
+        return self.ws_subscribers.get_user_status_in_channel(user_ref, channel)
 
 
 class App(FastAPI):
     @asynccontextmanager
     async def __lifespan(self):
+        backplane = self.mutable_state.ws_subscribers.backplane
+        await backplane.start(
+            self.mutable_state.ws_subscribers.deliver_remote,
+            lambda envelope: self.mutable_state.game_router.on_forwarded(self, envelope),
+            self.mutable_state.game_router.address
+        )
+
+        if self.role == ServerRole.CORE:
+            await self.__prepare_core(backplane)
+
+        self.log_writer.start()
+        yield
+        await self.log_writer.stop()
+        await backplane.stop()
+
+    async def __prepare_core(self, backplane: Backplane) -> None:
         SQLModel.metadata.create_all(self.db_engine)  # All models were imported using wildcard at the top of this file
 
         last_guest_id_query = LAST_GUEST_ID_QUERY_PATH.read_text()
         async with AsyncSession(self.db_engine) as session:
-            result = session.exec_raw(last_guest_id_query)
-            self.mutable_state.last_guest_id = result.scalar() or 0
+            result = await session.exec_raw(last_guest_id_query)
+            await backplane.raise_last_guest_id(result.scalar() or 0)
+
+            player_stats = await session.exec(select(PlayerStats))  # noqa: F405
+            for stats_entry in player_stats:
+                if stats_entry.elo is not None:
+                    self.mutable_state.update_rating(stats_entry.login, stats_entry.time_control_kind, stats_entry.elo, stats_entry.is_elo_provisional)
 
             session.add(ServerLaunch())
             await session.commit()
 
-        yield
-
     @asynccontextmanager
     async def get_db_session(self):
         async with AsyncSession(self.db_engine) as session:
             yield session
 
-    def __init__(self, rest_routers: list[APIRouter], ws_collections: list[WebSocketHandlerCollection]) -> None:
+    def __init__(self, rest_routers: list[APIRouter], ws_collections: list[WebSocketHandlerCollection], role: ServerRole = ServerRole.CORE) -> None:
         super().__init__(lifespan=App.__lifespan)
-
-        self.mutable_state: MutableState = MutableState()
+        self.role = role
 
         self.main_config: MainConfig = load('main', MainConfig)
         self.secret_config: SecretConfig = load('secret', SecretConfig)
 
+        backplane = create_backplane(self.main_config.backplane)
+        shard_cnt = self.main_config.sharding.shard_cnt
+        assert shard_cnt == 1 and role == ServerRole.CORE or backplane.has_peers, "Several shards or gateways need a broker backplane to forward the intents"
+        assert not backplane.has_peers or self.secret_config.token_signing, "Workers sharing a backplane need the same token_signing keys to accept each other's tokens"
+        if role == ServerRole.GATEWAY:
+            address = get_gateway_address(int(os.getenv("GATEWAY_INDEX", "0")))
+        else:
+            address = get_shard_address(int(os.getenv("SHARD_INDEX", "0")))
+        self.mutable_state: MutableState = MutableState(
+            tokens=TokenSigner.from_config(self.main_config.auth, self.secret_config.token_signing),
+            ws_subscribers=SubscriberStorage(backplane),
+            game_router=GameRouter(backplane, address, shard_cnt)
+        )
+
         self.db_engine: AsyncEngine = create_async_engine(self.secret_config.db.url)
+        self.log_writer: BatchedLogWriter = BatchedLogWriter(self.db_engine, self.main_config.logging.writer)
 
         for router in rest_routers:
             self.include_router(router)
@@ -174,19 +285,56 @@ class App(FastAPI):
         # self.regenerate_asyncapi_docs()  # TODO: Write v2 implementation and delegate to a separate module
 
         self.add_api_route("/ws_docs", self.websocket_docs_endpoint, response_class=HTMLResponse)
+        self.add_api_route("/ws_protocol", self.websocket_protocol_endpoint)
         self.add_websocket_route("/ws", self.websocket_endpoint)
 
     async def websocket_docs_endpoint(self):
         return HTMLResponse(content=Path('./resources/ws_api_docs/docs_page.html').read_text())
 
+    async def websocket_protocol_endpoint(self):
+        return dict(
+            binary_subprotocol=MSGPACK_SUBPROTOCOL,
+            outgoing_event_ids=OUTGOING_EVENT_NAMES,
+            incoming_event_ids=INCOMING_EVENT_NAMES,
+            channel_group_ids=CHANNEL_GROUPS
+        )
+
+    async def relay_message(self, ws: WebSocketWrapper, data: Any, raw: str | None) -> None:
+        now_ts = int(time.time())
+        ws.last_message = now_ts
+        if await WebSocketHandlerCollection.try_handling_ping(ws, data, now_ts):
+            return
+        ws.last_activity = now_ts
+        try:
+            self.mutable_state.game_router.forward_message(ws, data, raw)
+        except (TypeError, ValueError):  # E.g. binary values from a msgpack client, which the JSON envelope can't carry
+            await ws.send_error(ErrorKind.VALIDATION_ERROR, "Message can't be represented as JSON")
+
     async def websocket_endpoint(self, websocket: WebSocket):
-        await websocket.accept()
+        codec = negotiate_codec(websocket)
+        await websocket.accept(subprotocol=codec.subprotocol)
         now_ts = int(time.time())
-        ws_wrapper = WebSocketWrapper(self, websocket, now_ts, now_ts)
+        outbound_params = self.main_config.outbound
+        ws_wrapper = WebSocketWrapper(
+            self,
+            websocket,
+            now_ts,
+            now_ts,
+            codec=codec,
+            outbox=OutboundQueue(outbound_params.queue_size, outbound_params.overflow_policy),
+            batch_window_us=outbound_params.batch_window_us if websocket.query_params.get("batch") else None  # Opt-in, as older clients don't know the envelope
+        )
+        writer_task = asyncio.create_task(ws_wrapper.run_writer())
         self.mutable_state.ws_subscribers.subscribe(ws_wrapper, EveryoneEventChannel())
         try:
             while True:
-                data = await websocket.receive_json()
-                await self.ws_handlers.handle(self.mutable_state.token_to_user, ws_wrapper, data)
+                data, raw = await codec.receive(websocket)
+                if self.role == ServerRole.GATEWAY:
+                    await self.relay_message(ws_wrapper, data, raw)
+                else:
+                    await self.ws_handlers.handle(self.mutable_state.tokens, ws_wrapper, data, raw)
         except WebSocketDisconnect:
-            self.mutable_state.ws_subscribers.fully_remove(ws_wrapper)
+            pass
+        finally:
+            self.mutable_state.ws_subscribers.fully_remove(ws_wrapper)  # Whatever ended the loop, a connection without a writer must not stay subscribed
+            writer_task.cancel()
@@ -0,0 +1,23 @@
+from enum import auto, IntEnum, StrEnum
+
+
+class OutboundOverflowPolicy(StrEnum):
+    COALESCE = auto()  # Replace a queued message with the same coalescing key, then fall back to DROP_LOW_PRIORITY
+    DROP_LOW_PRIORITY = auto()  # Drop the oldest low-priority message, then fall back to DISCONNECT
+    DISCONNECT = auto()
+
+
+class OutboundPriority(IntEnum):  # Lower values are sent first
+    CRITICAL = 0  # Anything affecting an ongoing game: plies, clocks, outcomes
+    NORMAL = 1
+    LOW = 2  # Lists that can always be refreshed; may be dropped under load
+
+
+class BackplaneKind(StrEnum):
+    IN_PROCESS = auto()  # Single worker
+    BROKER = auto()  # Several workers connected through a RESP broker (the bundled one or Redis)
+
+
+class ServerRole(StrEnum):
+    CORE = auto()  # Runs the handlers and the REST API; also terminates WebSockets unless the deployment has gateways
+    GATEWAY = auto()  # Only terminates WebSockets: answers heartbeats, relays the rest to the cores and fans out their broadcasts
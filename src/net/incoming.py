@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any, Callable, Coroutine
+from typing import Annotated, Any, Callable, Coroutine, Literal, Union
 
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, create_model
 
+from src.auth.tokens import TokenSigner
 from src.common.user_ref import UserReference
 from src.log.models import WSLog
 from src.net.models import WebsocketIncomingMessage
 from src.net.utils.ws_error import ErrorKind, WebSocketException
-from src.utils.bijective_map import BijectiveMap
 
 import json
 import time
@@ -33,19 +33,41 @@ class WebSocketIncomingEventHandler[T:BaseModel]:
     title: str | None
     summary: str | None
     description: str | None
+    game_affinity: bool  # Mutates the game referenced by payload.game_id, so it has to run on the worker owning that game
+
+
+def build_message_adapter(slug_to_handler: dict[str, WebSocketIncomingEventHandler]) -> TypeAdapter | None:  # Validates the envelope along with the payload of the event it names
+    message_types = tuple(
+        create_model(
+            f"{slug}_message",
+            __base__=WebsocketIncomingMessage,
+            event=(Literal[slug], ...),
+            body=(handler.payload_type, Field(default_factory=dict, validate_default=True))
+        )
+        for slug, handler in slug_to_handler.items()
+    )
+    if not message_types:
+        return None
+    return TypeAdapter(Annotated[Union[message_types], Field(discriminator="event")])  # type: ignore
+
+
+def strip_event_tag(errors: list[dict], event: Any) -> list[dict]:  # Error locations start with the event name the union was discriminated by
+    return [dict(error, loc=error["loc"][1:]) if error["loc"][:1] == (event,) else error for error in errors]
 
 
 @dataclass
 class WebSocketHandlerCollection:
     _slug_to_handler: dict[str, WebSocketIncomingEventHandler] = field(default_factory=dict)
+    _message_adapter: TypeAdapter | None = None  # Only built for the final collection, see union()
 
     @classmethod
     def union(cls, collections: list[WebSocketHandlerCollection]) -> WebSocketHandlerCollection:
-        return WebSocketHandlerCollection({
+        slug_to_handler = {
             slug: handler
             for collection in collections
             for slug, handler in collection._slug_to_handler.items()
-        })
+        }
+        return WebSocketHandlerCollection(slug_to_handler, build_message_adapter(slug_to_handler))
 
     def register[T:BaseModel](
         self,
@@ -54,26 +76,36 @@ class WebSocketHandlerCollection:
         slug: str | None = None,
         title: str | None = None,
         summary: str | None = None,
-        description: str | None = None
+        description: str | None = None,
+        game_affinity: bool = False
     ):
         def decorator(handler_callable: WebSocketIncomingEventHandlerCallable[T]) -> WebSocketIncomingEventHandlerCallable[T]:
             actual_slug = slug or handler_callable.__name__
             assert actual_slug not in self._slug_to_handler
-            self._slug_to_handler[actual_slug] = WebSocketIncomingEventHandler(payload_type, handler_callable, title, summary, description)
+            assert not game_affinity or "game_id" in payload_type.model_fields
+            self._slug_to_handler[actual_slug] = WebSocketIncomingEventHandler(payload_type, handler_callable, title, summary, description, game_affinity)
             return handler_callable
         return decorator
 
-    async def handle(self, token_map: BijectiveMap[str, UserReference], ws: core.WebSocketWrapper, data: Any) -> None:
+    async def handle(self, tokens: TokenSigner, ws: core.WebSocketWrapper, data: Any, raw: str | None = None) -> None:
         now_ts = int(time.time())
         ws.last_message = now_ts
 
-        try:
-            payload = json.dumps(data, ensure_ascii=False)[:1000]
-        except Exception:
+        if await self.try_handling_ping(ws, data, now_ts):
+            return
+
+        event = data.get("event") if isinstance(data, dict) else None
+
+        if raw is not None:  # Textual protocols hand over the received text, so it doesn't have to be serialized again
+            payload = raw[:1000]
+        else:
             try:
-                payload = str(data)[:1000]
+                payload = json.dumps(data, ensure_ascii=False)[:1000]
             except Exception:
-                payload = "unparsable"
+                try:
+                    payload = str(data)[:1000]
+                except Exception:
+                    payload = "unparsable"
 
         log_entry = WSLog(
             connection_id=str(ws.uuid),
@@ -82,50 +114,73 @@ class WebSocketHandlerCollection:
             incoming=True
         )
 
-        try:
-            message = WebsocketIncomingMessage.model_validate(data)
-        except ValidationError as e:
-            async with ws.app.get_db_session() as session:
-                session.add(log_entry)
-                await session.commit()
-            await ws.send_validation_error(e)
+        if not self._message_adapter:
+            ws.log(log_entry)
+            await ws.send_error(ErrorKind.UNKNOWN_EVENT, f"Event not found: {event}")
             return
 
-        if message.event == "ping":
-            last_activity_ts = message.body.get("last_activity")
-            if last_activity_ts and isinstance(last_activity_ts, int):
-                ws.last_activity = min(max(ws.last_activity, last_activity_ts), now_ts)
-            await ws.send_pong()
+        try:
+            message = self._message_adapter.validate_python(data)
+        except ValidationError as e:
+            ws.log(log_entry)
+            errors = e.errors()
+            if any(error["type"] == "union_tag_invalid" for error in errors):
+                await ws.send_error(ErrorKind.UNKNOWN_EVENT, f"Event not found: {event}")
+            else:
+                await ws.send_error(ErrorKind.VALIDATION_ERROR, strip_event_tag(errors, event))
             return
 
         ws.last_activity = now_ts
 
+        client = None
         if message.token:
-            client = token_map.get(message.token)
+            client = tokens.verify(message.token)
             if not client:
-                async with ws.app.get_db_session() as session:
-                    session.add(log_entry)
-                    await session.commit()
+                ws.log(log_entry)
                 await ws.send_error(ErrorKind.AUTH_ERROR, "Invalid token")
                 return
+            if client != ws.saved_user:  # Remembered for the presence index and the logs, the token itself is checked on every message anyway
+                ws.app.mutable_state.ws_subscribers.set_user(ws, client)
             log_entry.authorized_as = client.reference
-            async with ws.app.get_db_session() as session:
-                session.add(log_entry)
-                await session.commit()
+            ws.log(log_entry)
 
-        handler = self._slug_to_handler.get(message.event)
-        if not handler:
-            await ws.send_error(ErrorKind.UNKNOWN_EVENT, f"Event not found: {message.event}")
+        handler = self._slug_to_handler[message.event]
+        game_router = ws.app.mutable_state.game_router
+        if handler.game_affinity and not game_router.is_local(message.body.game_id):
+            game_router.forward_intent(ws, client, message.event, message.body.game_id, message.body)
             return
-        else:
-            client = None
 
+        await self._run(handler, ws, client, message.body)
+
+    @staticmethod
+    async def try_handling_ping(ws: core.WebSocketWrapper, data: Any, now_ts: int) -> bool:  # By far the most frequent message, so it bypasses the validation
+        if not isinstance(data, dict) or data.get("event") != "ping":
+            return False
+        body = data.get("body")
+        probe_nonce = None
+        if isinstance(body, dict):
+            last_activity_ts = body.get("last_activity")
+            if last_activity_ts and isinstance(last_activity_ts, int):
+                ws.last_activity = min(max(ws.last_activity, last_activity_ts), now_ts)
+            echo = body.get("echo")
+            if isinstance(echo, int):
+                ws.rtt.complete_probe(echo)  # Answered with a plain pong, so that the echoes don't chain into a ping storm
+            elif body.get("probe") is True:  # Opt-in, the clients unaware of the probes keep receiving the bare "pong"
+                probe_nonce = ws.rtt.start_probe()
+        await ws.send_pong(probe_nonce)
+        return True
+
+    async def execute(self, slug: str, ws: core.WebSocketWrapper, client: UserReference | None, body: dict) -> None:  # For the intents forwarded by other workers, already authorized there
+        handler = self._slug_to_handler[slug]
         try:
-            payload = handler.payload_type.model_validate(message.body)
+            payload = handler.payload_type.model_validate(body)
         except ValidationError as e:
             await ws.send_validation_error(e)
             return
+        await self._run(handler, ws, client, payload)
 
+    @staticmethod
+    async def _run(handler: WebSocketIncomingEventHandler, ws: core.WebSocketWrapper, client: UserReference | None, payload: BaseModel) -> None:
         try:
             await handler.handler_callable(ws, client, payload)
         except WebSocketException as e:
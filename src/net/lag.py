@@ -0,0 +1,44 @@
+from collections import deque
+from dataclasses import dataclass, field
+
+import time
+
+
+RTT_WINDOW_SIZE = 32
+MAX_RTT_SAMPLE_MS = 60000
+
+
+@dataclass
+class RoundTripTimeStats:
+    samples: deque[int] = field(default_factory=lambda: deque(maxlen=RTT_WINDOW_SIZE))  # Latest round trips timed by the server, ms
+    pending_probe: tuple[int, float] | None = None  # Nonce sent with the latest "pong:<nonce>" and the monotonic time it was sent at
+    _last_nonce: int = 0
+
+    def start_probe(self) -> int:
+        self._last_nonce += 1
+        self.pending_probe = (self._last_nonce, time.monotonic())
+        return self._last_nonce
+
+    def complete_probe(self, nonce: int) -> bool:  # The client echoes the nonce in a ping as soon as the pong arrives
+        if not self.pending_probe or self.pending_probe[0] != nonce:
+            return False
+        self.add_sample(int((time.monotonic() - self.pending_probe[1]) * 1000))
+        self.pending_probe = None
+        return True
+
+    def add_sample(self, rtt_ms: int) -> None:
+        self.samples.append(min(max(rtt_ms, 0), MAX_RTT_SAMPLE_MS))
+
+    def get_percentile(self, percentile: float) -> int | None:
+        if not self.samples:
+            return None
+        ordered_samples = sorted(self.samples)
+        return ordered_samples[min(int(len(ordered_samples) * percentile / 100), len(ordered_samples) - 1)]
+
+    def get_lag_credit_ms(self, max_credit_ms: int) -> int:
+        # Half of the median round trip estimates the one-way delay a ply spent in transit. The median resists
+        # occasional spikes, and the bound keeps a client holding back its echoes from gaining much
+        median_rtt_ms = self.get_percentile(50)
+        if median_rtt_ms is None:
+            return 0
+        return min(median_rtt_ms // 2, max_credit_ms)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Hashable
+
+from src.net.datatypes import OutboundOverflowPolicy, OutboundPriority
+
+import asyncio
+
+
+DEFAULT_QUEUE_SIZE = 256
+
+
+@dataclass
+class OutboundMessage:
+    frame: str | bytes
+    priority: OutboundPriority = OutboundPriority.CRITICAL
+    coalesce_key: Hashable | None = None  # Messages sharing a key supersede each other
+    batchable: bool = True  # Whether the frame may be wrapped into a batch envelope (false for non-JSON frames like pongs)
+    resync: OutboundMessage | None = None  # Queued instead if this message gets dropped, so that the client learns it has missed an update
+
+
+class OutboundQueue:  # Bounded per-connection backlog, filled by the broadcasters without waiting and drained by the connection's writer task, higher priority lanes first
+    def __init__(self, capacity: int = DEFAULT_QUEUE_SIZE, overflow_policy: OutboundOverflowPolicy = OutboundOverflowPolicy.COALESCE) -> None:
+        self._capacity = capacity
+        self._overflow_policy = overflow_policy
+        self._lanes: list[deque[OutboundMessage]] = [deque() for _ in OutboundPriority]
+        self._size = 0
+        self._ready = asyncio.Event()
+
+        self.coalesced_cnt = 0
+        self.dropped_cnt = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _append(self, message: OutboundMessage) -> None:
+        self._lanes[message.priority].append(message)
+        self._size += 1
+        self._ready.set()
+
+    def _coalesce(self, message: OutboundMessage) -> bool:
+        if message.coalesce_key is None:
+            return False
+        lane = self._lanes[message.priority]
+        for index, queued_message in enumerate(lane):
+            if queued_message.coalesce_key == message.coalesce_key:
+                del lane[index]  # The newer message goes to the tail: it may already include the ones queued after the stale one
+                lane.append(message)
+                self.coalesced_cnt += 1
+                return True
+        return False
+
+    def _drop(self, message: OutboundMessage) -> None:
+        self.dropped_cnt += 1
+        if message.resync and not self._coalesce(message.resync):
+            self._append(message.resync)  # Overflows the capacity by at most one notice per channel, as they coalesce
+
+    def _drop_low_priority(self, message: OutboundMessage) -> bool:
+        if message.priority == OutboundPriority.LOW:
+            self._drop(message)
+            return True
+        low_priority_lane = self._lanes[OutboundPriority.LOW]
+        if low_priority_lane:
+            self._size -= 1
+            self._drop(low_priority_lane.popleft())
+            self._append(message)
+            return True
+        return False
+
+    def put(self, message: OutboundMessage) -> bool:  # False means the connection is hopelessly behind and should be closed
+        if self._size >= self._capacity:
+            match self._overflow_policy:
+                case OutboundOverflowPolicy.COALESCE:
+                    resolved = self._coalesce(message) or self._drop_low_priority(message)
+                case OutboundOverflowPolicy.DROP_LOW_PRIORITY:
+                    resolved = self._drop_low_priority(message)
+                case OutboundOverflowPolicy.DISCONNECT:
+                    resolved = False
+            return resolved
+
+        self._append(message)
+        return True
+
+    def drain_batchable(self, limit: int) -> list[OutboundMessage]:
+        drained: list[OutboundMessage] = []
+        while len(drained) < limit:
+            lane = next((lane for lane in self._lanes if lane), None)
+            if not lane or not lane[0].batchable:
+                break
+            drained.append(lane.popleft())
+            self._size -= 1
+        return drained
+
+    async def get(self) -> OutboundMessage:
+        while not self._size:
+            self._ready.clear()
+            await self._ready.wait()
+        self._size -= 1
+        return next(lane for lane in self._lanes if lane).popleft()
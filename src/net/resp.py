@@ -0,0 +1,58 @@
+import asyncio
+
+
+type RESPValue = bytes | int | list[RESPValue] | None
+
+
+class RESPError(Exception):
+    pass
+
+
+def encode_command(*args: str | bytes | int) -> bytes:  # Commands are arrays of bulk strings, the form every Redis-compatible server accepts
+    chunks = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        encoded_arg = arg if isinstance(arg, bytes) else str(arg).encode()
+        chunks.append(b'$%d\r\n%s\r\n' % (len(encoded_arg), encoded_arg))
+    return b''.join(chunks)
+
+
+def encode_value(value: RESPValue | RESPError) -> bytes:
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, RESPError):
+        return b'-ERR %s\r\n' % str(value).encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return b'*%d\r\n' % len(value) + b''.join(map(encode_value, value))
+
+
+async def read_value(reader: asyncio.StreamReader) -> RESPValue | RESPError:  # Raises IncompleteReadError once the peer is gone
+    line = await reader.readuntil(b'\r\n')
+    kind, content = line[:1], line[1:-2]
+    match kind:
+        case b'+':
+            return content
+        case b'-':
+            return RESPError(content.decode(errors='replace'))
+        case b':':
+            return int(content)
+        case b'$':
+            length = int(content)
+            if length < 0:
+                return None
+            return (await reader.readexactly(length + 2))[:-2]
+        case b'*':
+            length = int(content)
+            if length < 0:
+                return None
+            items: list[RESPValue] = []
+            for _ in range(length):
+                item = await read_value(reader)
+                if isinstance(item, RESPError):
+                    raise item
+                items.append(item)
+            return items
+        case _:
+            raise RESPError(f"Unexpected reply type: {line!r}")
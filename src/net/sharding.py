@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Callable, Coroutine
+from uuid import UUID
+from pydantic import BaseModel
+
+from src.common.user_ref import UserReference
+from src.net.backplane import Backplane, InProcessBackplane
+from src.net.datatypes import OutboundPriority
+from src.net.lag import RTT_WINDOW_SIZE, RoundTripTimeStats
+
+import asyncio
+import json
+import time
+import src.net.core as core
+
+
+type ForwardableProcedure = Callable[[core.App, Any], Coroutine[Any, Any, None]]
+
+FORWARDABLE_PROCEDURES: dict[str, ForwardableProcedure] = {}
+
+
+def forwardable(name: str) -> Callable[[ForwardableProcedure], ForwardableProcedure]:  # Game mutations that may be run on the owning worker with a JSON argument
+    def decorator(procedure: ForwardableProcedure) -> ForwardableProcedure:
+        assert name not in FORWARDABLE_PROCEDURES
+        FORWARDABLE_PROCEDURES[name] = procedure
+        return procedure
+    return decorator
+
+
+def get_shard_address(shard_index: int) -> str:
+    return f"shard.{shard_index}"
+
+
+def get_gateway_address(gateway_index: int) -> str:
+    return f"gateway.{gateway_index}"
+
+
+def jump_consistent_hash(key: int, bucket_cnt: int) -> int:  # Lamping & Veach: growing the bucket count by one moves just 1/n of the keys
+    bucket, next_bucket = -1, 0
+    key &= 0xFFFFFFFFFFFFFFFF
+    while next_bucket < bucket_cnt:
+        bucket = next_bucket
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        next_bucket = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class GameRouter:  # Assigns each game to the worker owning its live state (clocks, timeouts), other processes forward the game's intents there
+    def __init__(self, backplane: Backplane | None = None, address: str = get_shard_address(0), shard_cnt: int = 1) -> None:
+        self.backplane: Backplane = backplane or InProcessBackplane()
+        self.address = address  # Where this process receives the forwarded envelopes: a shard's or a gateway's one
+        self.shard_cnt = shard_cnt
+        self._tails: dict[str, asyncio.Task] = {}  # Latest forwarded work per connection (or per call key), see _spawn()
+
+    def get_owner(self, game_id: int) -> int:
+        return jump_consistent_hash(game_id, self.shard_cnt)
+
+    def is_local(self, game_id: int) -> bool:
+        return get_shard_address(self.get_owner(game_id)) == self.address
+
+    def _forward(self, address: str, **envelope: Any) -> None:
+        self.backplane.forward(address, json.dumps(envelope, ensure_ascii=False).encode())
+
+    def _get_origin(self, ws: core.WebSocketWrapper) -> str:  # Where the replies to a connection are to be sent
+        return ws.origin if isinstance(ws, core.RelayedWebSocketWrapper) else self.address
+
+    def forward_intent(self, ws: core.WebSocketWrapper, client: UserReference | None, event: str, game_id: int, payload: BaseModel) -> None:
+        self._forward(
+            get_shard_address(self.get_owner(game_id)),
+            kind="intent",
+            origin=self._get_origin(ws),
+            connection_id=str(ws.uuid),
+            client=client.reference if client else None,
+            event=event,
+            body=payload.model_dump(mode='json'),
+            rtt_samples=list(ws.rtt.samples)
+        )
+
+    def forward_message(self, ws: core.WebSocketWrapper, data: Any, raw: str | None) -> None:  # Unvalidated, as a gateway received it
+        body = data.get("body") if isinstance(data, dict) else None
+        game_id = body.get("game_id") if isinstance(body, dict) else None
+        shard_index = self.get_owner(game_id) if isinstance(game_id, int) else jump_consistent_hash(ws.uuid.int, self.shard_cnt)  # Straight to the owner if any
+        self._forward(
+            get_shard_address(shard_index),
+            kind="message",
+            origin=self.address,
+            connection_id=str(ws.uuid),
+            data=data,
+            raw=raw,
+            rtt_samples=list(ws.rtt.samples)
+        )
+
+    def forward_call(self, game_id: int, procedure: str, argument: Any) -> None:
+        assert procedure in FORWARDABLE_PROCEDURES
+        self._forward(get_shard_address(self.get_owner(game_id)), kind="call", key=f"game.{game_id}", procedure=procedure, argument=argument)
+
+    def forward_call_to_peers(self, procedure: str, argument: Any) -> None:  # For the state every shard keeps a copy of, e.g. the leaderboards
+        assert procedure in FORWARDABLE_PROCEDURES
+        for shard_index in range(self.shard_cnt):
+            address = get_shard_address(shard_index)
+            if address != self.address:
+                self._forward(address, kind="call", key=procedure, procedure=procedure, argument=argument)
+
+    def relay_reply(self, origin: str, connection_id: UUID, json_frame: str, priority: OutboundPriority, coalesce_key: Any) -> None:
+        self._forward(
+            origin,
+            kind="reply",
+            connection_id=str(connection_id),
+            frame=json_frame,
+            priority=priority.value,
+            coalesce_key=coalesce_key
+        )
+
+    def on_forwarded(self, app: core.App, envelope: bytes) -> None:
+        data = json.loads(envelope)
+        match data["kind"]:
+            case "intent":
+                client = UserReference(data["client"]) if data["client"] else None
+                self._spawn(data["connection_id"], app.ws_handlers.execute(data["event"], self._relayed_connection(app, data), client, data["body"]))
+            case "message":
+                self._spawn(data["connection_id"], app.ws_handlers.handle(app.mutable_state.tokens, self._relayed_connection(app, data), data["data"], data["raw"]))
+            case "call":
+                self._spawn(data["key"], FORWARDABLE_PROCEDURES[data["procedure"]](app, data["argument"]))
+            case "reply":
+                connection = app.mutable_state.ws_subscribers.get_connection(UUID(data["connection_id"]))
+                if connection:  # Otherwise it has disconnected in the meantime
+                    connection.enqueue_json_frame(
+                        data["frame"],
+                        OutboundPriority(data["priority"]),
+                        tuple(data["coalesce_key"]) if data["coalesce_key"] else None
+                    )
+
+    @staticmethod
+    def _relayed_connection(app: core.App, data: dict) -> core.RelayedWebSocketWrapper:
+        now_ts = int(time.time())
+        return core.RelayedWebSocketWrapper(
+            app,
+            None,  # type: ignore  # Held by the origin process
+            now_ts,
+            now_ts,
+            uuid=UUID(data["connection_id"]),
+            rtt=RoundTripTimeStats(deque(data["rtt_samples"], maxlen=RTT_WINDOW_SIZE)),
+            origin=data["origin"]
+        )
+
+    def _spawn(self, key: str, coroutine: Coroutine[Any, Any, None]) -> None:  # Runs after the previous work with the same key, like a local connection's messages do
+        task = asyncio.create_task(self._run_after(self._tails.get(key), coroutine))
+        self._tails[key] = task  # Also the strong reference the loop doesn't keep
+
+        def forget(finished_task: asyncio.Task) -> None:
+            if self._tails.get(key) is finished_task:
+                del self._tails[key]
+
+        task.add_done_callback(forget)
+
+    @staticmethod
+    async def _run_after(previous_task: asyncio.Task | None, coroutine: Coroutine[Any, Any, None]) -> None:
+        if previous_task:
+            await asyncio.wait([previous_task])  # Its failure is not this task's concern
+        await coroutine
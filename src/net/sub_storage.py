@@ -1,20 +1,27 @@
 from __future__ import annotations
 
-from collections import defaultdict
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import DefaultDict, Iterable
-from uuid import UUID
-from pydantic import BaseModel
+from typing import Callable, Hashable, Iterable
+from uuid import UUID, uuid4
+from pydantic import BaseModel, TypeAdapter
 
 from src.common.user_ref import UserReference
-from src.pubsub.models.channel import EventChannel, EveryoneEventChannel
+from src.log.models import WSBroadcastLog
+from src.net.backplane import Backplane, InProcessBackplane
+from src.net.codec import JSON_CODEC, WebSocketCodec
+from src.net.datatypes import OutboundPriority
+from src.net.outbound import OutboundMessage
+from src.pubsub.models.channel import DISCRIMINATED_EVENT_CHANNEL_FIELD_ANNOTATION, EventChannel, EveryoneEventChannel
 from src.player.datatypes import UserStatus
 from src.pubsub.outgoing_event.base import OutgoingEvent
-from src.utils.bijective_map import BijectiveMap
 
-import asyncio
+import json
 import src.net.core as core
+import src.pubsub.outgoing_event.update as update_events
+
+
+_CHANNEL_ADAPTER: TypeAdapter[EventChannel] = TypeAdapter(DISCRIMINATED_EVENT_CHANNEL_FIELD_ANNOTATION)
 
 
 class SubscriberTag(Enum):
@@ -28,85 +35,208 @@ class Subscriber:
 
 
 class SubscriberStorage:
-    subscribers: DefaultDict[EventChannel, dict[UUID, Subscriber]] = defaultdict(dict)
+    def __init__(self, backplane: Backplane | None = None) -> None:
+        self.backplane: Backplane = backplane or InProcessBackplane()
+        self._origin = uuid4().hex  # Tells this worker's own broadcasts apart when the backplane echoes them
+        self._channel_subscribers: dict[EventChannel, dict[UUID, Subscriber]] = {}
+        self._connection_channels: dict[UUID, set[EventChannel]] = {}
+        self._user_connections: dict[tuple[EventChannel, UserReference], dict[UUID, Subscriber]] = {}  # A user may be connected several times, with the same token or not
+        self._tagged_subscribers: dict[tuple[EventChannel, SubscriberTag], dict[UUID, Subscriber]] = {}
 
     @staticmethod
     def _resolve_websocket_reference(websocket_ref: core.WebSocketWrapper | UUID) -> UUID:
         return websocket_ref.uuid if isinstance(websocket_ref, core.WebSocketWrapper) else websocket_ref
 
+    @staticmethod
+    def _discard[K](index: dict[K, dict[UUID, Subscriber]], key: K, uuid: UUID) -> None:
+        entries = index.get(key)
+        if entries is not None:
+            entries.pop(uuid, None)
+            if not entries:
+                del index[key]  # Empty entries are never kept, so that abandoned channels don't pile up
+
+    def _index(self, subscriber: Subscriber, channel: EventChannel) -> None:
+        uuid = subscriber.ws.uuid
+        if subscriber.ws.saved_user:
+            self._user_connections.setdefault((channel, subscriber.ws.saved_user), {})[uuid] = subscriber
+        for tag in subscriber.tags:
+            self._tagged_subscribers.setdefault((channel, tag), {})[uuid] = subscriber
+
+    def _unindex(self, subscriber: Subscriber, channel: EventChannel) -> None:
+        uuid = subscriber.ws.uuid
+        if subscriber.ws.saved_user:
+            self._discard(self._user_connections, (channel, subscriber.ws.saved_user), uuid)
+        for tag in subscriber.tags:
+            self._discard(self._tagged_subscribers, (channel, tag), uuid)
+
     def subscribe(self, websocket: core.WebSocketWrapper, channel: EventChannel, tags: set[SubscriberTag] | None = None) -> None:
-        self.subscribers[channel][websocket.uuid] = Subscriber(websocket, tags or set())
+        self.unsubscribe(websocket, channel)
+        subscriber = Subscriber(websocket, tags or set())
+        self._channel_subscribers.setdefault(channel, {})[websocket.uuid] = subscriber
+        self._connection_channels.setdefault(websocket.uuid, set()).add(channel)
+        self._index(subscriber, channel)
 
     def unsubscribe(self, websocket_ref: core.WebSocketWrapper | UUID, channel: EventChannel) -> None:
         uuid = self._resolve_websocket_reference(websocket_ref)
-        self.subscribers[channel].pop(uuid, None)
+        subscriber = self._channel_subscribers.get(channel, {}).get(uuid)
+        if not subscriber:
+            return
+
+        self._unindex(subscriber, channel)
+        self._discard(self._channel_subscribers, channel, uuid)
+        channels = self._connection_channels[uuid]
+        channels.discard(channel)
+        if not channels:
+            del self._connection_channels[uuid]
 
     def fully_remove(self, websocket_ref: core.WebSocketWrapper | UUID) -> None:
         uuid = self._resolve_websocket_reference(websocket_ref)
-        for channel_subs in self.subscribers.values():
-            channel_subs.pop(uuid, None)
+        for channel in list(self._connection_channels.get(uuid, ())):
+            self.unsubscribe(uuid, channel)
+
+    def set_user(self, websocket: core.WebSocketWrapper, user_ref: UserReference | None) -> None:
+        subscriptions = [(self._channel_subscribers[channel][websocket.uuid], channel) for channel in self.get_subscriptions(websocket)]
+        for subscriber, channel in subscriptions:
+            self._unindex(subscriber, channel)
+        websocket.saved_user = user_ref
+        for subscriber, channel in subscriptions:
+            self._index(subscriber, channel)
 
     def get_subscriptions(self, websocket_ref: core.WebSocketWrapper | UUID) -> set[EventChannel]:
         uuid = self._resolve_websocket_reference(websocket_ref)
-        return set(channel for channel, channel_subs in self.subscribers.items() if uuid in channel_subs)
+        return set(self._connection_channels.get(uuid, ()))
+
+    def get_connection(self, uuid: UUID) -> core.WebSocketWrapper | None:
+        subscriber = self._channel_subscribers.get(EveryoneEventChannel(), {}).get(uuid)  # Every connection stays subscribed to it
+        return subscriber.ws if subscriber else None
 
     def count_subscribers(self, channel: EventChannel = EveryoneEventChannel()) -> int:
-        return len(self.subscribers[channel])
+        return len(self._channel_subscribers.get(channel, {}))
 
     def get_subscribers(self, channel: EventChannel = EveryoneEventChannel()) -> Iterable[Subscriber]:
-        return self.subscribers[channel].values()
+        return self._channel_subscribers.get(channel, {}).values()
 
-    def has_ws_subscriber(self, websocket_ref: core.WebSocketWrapper | UUID, channel: EventChannel = EveryoneEventChannel()) -> bool:
-        return self._resolve_websocket_reference(websocket_ref) in self.subscribers[channel]
+    def get_tagged_subscribers(self, tag: SubscriberTag, channel: EventChannel = EveryoneEventChannel()) -> Iterable[Subscriber]:
+        return self._tagged_subscribers.get((channel, tag), {}).values()
 
-    def has_token_subscriber(self, token: str, channel: EventChannel = EveryoneEventChannel()) -> bool:
-        for subscriber in self.get_subscribers(channel):
-            if subscriber.ws.saved_token and subscriber.ws.saved_token == token:
-                return True
-        return False
+    def has_ws_subscriber(self, websocket_ref: core.WebSocketWrapper | UUID, channel: EventChannel = EveryoneEventChannel()) -> bool:
+        return self._resolve_websocket_reference(websocket_ref) in self._channel_subscribers.get(channel, {})
 
-    def has_user_subscriber(
-        self,
-        token_map: BijectiveMap[str, UserReference],
-        user_ref: UserReference,
-        channel: EventChannel = EveryoneEventChannel()
-    ) -> bool:
-        token = token_map.get_inverse(user_ref)
-        return self.has_token_subscriber(token, channel) if token else False
-
-    def get_user_status_in_channel(
-        self,
-        token_map: BijectiveMap[str, UserReference],
-        user_ref: UserReference,
-        channel: EventChannel
-    ) -> UserStatus:
-        token = token_map.get_inverse(user_ref)
-        if not token:
-            return UserStatus.OFFLINE
+    def has_user_subscriber(self, user_ref: UserReference, channel: EventChannel = EveryoneEventChannel()) -> bool:
+        return (channel, user_ref) in self._user_connections
 
+    def get_user_status_in_channel(self, user_ref: UserReference, channel: EventChannel) -> UserStatus:
         most_active_status_over_connections = UserStatus.OFFLINE
 
-        for subscriber in self.get_subscribers(channel):
-            if subscriber.ws.saved_token != token:
-                continue
-
+        for subscriber in self._user_connections.get((channel, user_ref), {}).values():
             iterated_status = subscriber.ws.get_status()
             if iterated_status.is_more_active_than(most_active_status_over_connections):
                 most_active_status_over_connections = iterated_status
 
         return most_active_status_over_connections
 
+    def _select_recipients(
+        self,
+        channel: EventChannel,
+        tag_whitelist: set[SubscriberTag] | None,
+        tag_blacklist: set[SubscriberTag] | None
+    ) -> list[core.WebSocketWrapper]:
+        if tag_whitelist:
+            candidates = min((self._tagged_subscribers.get((channel, tag), {}) for tag in tag_whitelist), key=len).values()
+        else:
+            candidates = self.get_subscribers(channel)
+
+        recipients = []
+        for subscriber in candidates:
+            if tag_whitelist and tag_whitelist.difference(subscriber.tags):
+                continue
+            if tag_blacklist and subscriber.tags.intersection(tag_blacklist):
+                continue
+            recipients.append(subscriber.ws)
+        return recipients
+
+    def _fan_out(
+        self,
+        channel: EventChannel,
+        encode: Callable[[WebSocketCodec], str | bytes],
+        priority: OutboundPriority,
+        coalesce_key: Hashable | None,
+        tag_whitelist: set[SubscriberTag] | None,
+        tag_blacklist: set[SubscriberTag] | None
+    ) -> None:
+        recipients = self._select_recipients(channel, tag_whitelist, tag_blacklist)
+        if not recipients:
+            return
+
+        frames: dict[str | None, str | bytes] = {}  # Serialized once per protocol, the same frame goes to every recipient speaking it
+        resyncs: dict[str | None, OutboundMessage] = {}
+        resync_event = update_events.ChannelResyncRequired(None, channel) if priority == OutboundPriority.LOW else None  # Droppable, so a lagging client has to be told to resubscribe
+        for ws in recipients:
+            if ws.codec.subprotocol not in frames:
+                frames[ws.codec.subprotocol] = encode(ws.codec)
+                if resync_event:
+                    resyncs[ws.codec.subprotocol] = OutboundMessage(
+                        ws.codec.encode_event(resync_event),
+                        resync_event.priority,
+                        resync_event.coalesce_key()
+                    )
+
+        recipients[0].log(WSBroadcastLog(
+            channel=channel.model_dump_json(),
+            recipients_cnt=len(recipients),
+            connection_ids=",".join(str(ws.uuid) for ws in recipients),
+            payload=str(frames[None] if None in frames else encode(JSON_CODEC))
+        ))
+
+        for ws in recipients:
+            ws.enqueue(OutboundMessage(frames[ws.codec.subprotocol], priority, coalesce_key, resync=resyncs.get(ws.codec.subprotocol)))
+
     async def broadcast[T: BaseModel | None, C: EventChannel](
         self,
         event_instance: OutgoingEvent[T, C],
         tag_whitelist: set[SubscriberTag] | None = None,
         tag_blacklist: set[SubscriberTag] | None = None
     ) -> None:
-        sending_coroutines = []
-        for subscriber in self.get_subscribers(event_instance.target_channel):
-            if tag_whitelist and tag_whitelist.difference(subscriber.tags):
-                continue
-            if tag_blacklist and subscriber.tags.intersection(tag_blacklist):
-                continue
-            sending_coroutines.append(subscriber.ws.send_event(event_instance))
-        await asyncio.gather(*sending_coroutines)
+        self._fan_out(
+            event_instance.target_channel,
+            lambda codec: codec.encode_event(event_instance),
+            event_instance.priority,
+            event_instance.coalesce_key(),
+            tag_whitelist,
+            tag_blacklist
+        )
+
+        if self.backplane.has_peers:  # The other workers fan the event out to their own connections
+            await self.backplane.publish(json.dumps(dict(
+                origin=self._origin,
+                channel=event_instance.target_channel.model_dump(mode='json'),
+                frame=event_instance.to_json(),
+                priority=event_instance.priority.value,
+                coalesce_key=event_instance.coalesce_key(),
+                tag_whitelist=[tag.name for tag in tag_whitelist or ()],
+                tag_blacklist=[tag.name for tag in tag_blacklist or ()]
+            ), ensure_ascii=False).encode())
+
+    def deliver_remote(self, envelope: bytes) -> None:
+        data = json.loads(envelope)
+        if data["origin"] == self._origin:
+            return  # Already delivered locally by broadcast()
+
+        json_frame: str = data["frame"]
+        message = None
+
+        def encode(codec: WebSocketCodec) -> str | bytes:
+            nonlocal message
+            if codec is JSON_CODEC:
+                return json_frame
+            message = message or json.loads(json_frame)
+            return codec.encode(message)
+
+        self._fan_out(
+            _CHANNEL_ADAPTER.validate_python(data["channel"]),
+            encode,
+            OutboundPriority(data["priority"]),
+            tuple(data["coalesce_key"]) if data["coalesce_key"] else None,
+            {SubscriberTag[tag] for tag in data["tag_whitelist"]},
+            {SubscriberTag[tag] for tag in data["tag_blacklist"]}
+        )
@@ -21,3 +21,13 @@ class CompatibilityResponse(CustomModel):
     resolution: CompatibilityResolution
     server_build: int
     min_client_build: int
+
+
+class ConnectionRoundTripStats(CustomModel):
+    connection_id: str
+    user_ref: str | None
+    samples_cnt: int
+    p50_ms: int | None
+    p90_ms: int | None
+    p99_ms: int | None
+    lag_credit_ms: int
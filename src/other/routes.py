@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, Response
 
 from src.net.base_router import LoggingRoute
-from src.other.models import CompatibilityCheckPayload, CompatibilityResolution, CompatibilityResponse
+from src.other.models import CompatibilityCheckPayload, CompatibilityResolution, CompatibilityResponse, ConnectionRoundTripStats
 from src.common.dependencies import MainConfigDependency, MutableStateDependency, SecretConfigDependency, SessionDependency, verify_admin
 
 import src.challenge.methods.update as challenge_update_methods
@@ -50,6 +50,22 @@ async def shutdown(
         raise KeyboardInterrupt  # A hack to break out of the FastAPI jail
 
 
+@router.get("/connections/rtt", dependencies=[Depends(verify_admin)], response_model=list[ConnectionRoundTripStats])
+async def get_connection_rtt_stats(state: MutableStateDependency, main_config: MainConfigDependency):
+    return [
+        ConnectionRoundTripStats(
+            connection_id=str(subscriber.ws.uuid),
+            user_ref=subscriber.ws.get_user_ref(),
+            samples_cnt=len(subscriber.ws.rtt.samples),
+            p50_ms=subscriber.ws.rtt.get_percentile(50),
+            p90_ms=subscriber.ws.rtt.get_percentile(90),
+            p99_ms=subscriber.ws.rtt.get_percentile(99),
+            lag_credit_ms=subscriber.ws.rtt.get_lag_credit_ms(main_config.lag_compensation.max_credit_ms)
+        )
+        for subscriber in state.ws_subscribers.get_subscribers()
+    ]
+
+
 @router.get("/mutable_state", dependencies=[Depends(verify_admin)])
 async def get_mutable_state(state: MutableStateDependency):
     raise NotImplementedError()  # TODO: Implement
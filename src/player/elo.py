@@ -0,0 +1,23 @@
+from src.config.models import EloParams
+from src.rules.piece import PieceColor
+
+
+def get_k_factor(ranked_games_played: int, params: EloParams) -> float:
+    # log2(K) goes linearly from max_log_slope for a newcomer down to normal_log_slope once the calibration is over
+    calibration_progress = min(ranked_games_played / params.calibration_games, 1) if params.calibration_games > 0 else 1
+    log_slope = params.max_log_slope - (params.max_log_slope - params.normal_log_slope) * calibration_progress
+    return 2 ** log_slope
+
+
+def get_expected_score(elo: int, opponent_elo: int) -> float:
+    return 1 / (1 + 10 ** ((opponent_elo - elo) / 400))
+
+
+def get_score(color: PieceColor, winner: PieceColor | None) -> float:
+    if winner is None:
+        return 0.5
+    return 1 if winner == color else 0
+
+
+def get_elo_delta(elo: int, opponent_elo: int, score: float, ranked_games_played: int, params: EloParams) -> int:
+    return round(get_k_factor(ranked_games_played, params) * (score - get_expected_score(elo, opponent_elo)))
@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from src.utils.indexable_skiplist import IndexableSkipList
+
+
+class RankedPlayer(NamedTuple):
+    rank: int  # 1-based
+    login: str
+    elo: int
+
+
+@dataclass
+class Leaderboard:
+    _ranking: IndexableSkipList[tuple[int, str]] = field(default_factory=IndexableSkipList)  # Keyed by (-elo, login) so that the best player goes first
+    _elo: dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def update(self, login: str, elo: int) -> None:
+        self.remove(login)
+        self._elo[login] = elo
+        self._ranking.add((-elo, login))
+
+    def remove(self, login: str) -> None:
+        old_elo = self._elo.pop(login, None)
+        if old_elo is not None:
+            self._ranking.remove((-old_elo, login))
+
+    def _ranked_slice(self, start: int, stop: int) -> list[RankedPlayer]:
+        return [
+            RankedPlayer(rank=start + offset + 1, login=login, elo=-negated_elo)
+            for offset, (negated_elo, login) in enumerate(self._ranking.islice(start, stop))
+        ]
+
+    def get_top(self, offset: int, limit: int) -> list[RankedPlayer]:
+        return self._ranked_slice(offset, offset + limit)
+
+    def get_player(self, login: str) -> RankedPlayer | None:
+        elo = self._elo.get(login)
+        if elo is None:
+            return None
+        return RankedPlayer(rank=self._ranking.index((-elo, login)) + 1, login=login, elo=elo)
+
+    def get_neighbourhood(self, login: str, radius: int) -> list[RankedPlayer]:
+        player = self.get_player(login)
+        if not player:
+            return []
+        return self._ranked_slice(max(0, player.rank - 1 - radius), player.rank + radius)  # The ranks are computed from the start, so it can't be left for islice() to clamp
@@ -1,12 +1,21 @@
-from sqlmodel import desc, select, func
+from datetime import datetime
+from typing import Iterable
+from sqlmodel import col, desc, select
 from src.common.models import UserRefWithNickname
+from src.common.pagination import KeysetCursor
 from src.common.sql import exists, not_expired
 from src.common.user_ref import UserReference
-from src.player.models import Player, PlayerEloProgress, PlayerFollowedPlayer, PlayerRestriction, PlayerRestrictionPublic, PlayerRole, PlayerRolePublic
+from src.player.models import LeaderboardEntry, Player, PlayerEloProgress, PlayerFollowedPlayer, PlayerRestriction, PlayerRestrictionPublic, PlayerRole, PlayerRolePublic, PlayerStats
 from src.player.datatypes import GameStats, OverallGameStats, UserRestrictionKind, UserRole
+from src.player.elo import get_elo_delta, get_score
+from src.player.leaderboard import RankedPlayer
+from src.config.models import EloParams
+from src.common.time_control import TimeControlKind
+from src.rules.piece import PieceColor
 from src.utils.async_orm_session import AsyncSession
 
 import src.game.datatypes as game_datatypes
+import src.game.models.main as game_models
 
 
 async def prettify_player_reference(user_ref: UserReference, session: AsyncSession) -> str:
@@ -32,6 +41,24 @@ async def get_user_ref_with_nickname(session: AsyncSession, user_ref: UserRefere
     return UserRefWithNickname(user_ref=str_user_ref, nickname=nickname)
 
 
+async def get_user_refs_with_nicknames(session: AsyncSession, user_refs: Iterable[str]) -> dict[str, UserRefWithNickname]:
+    object_user_refs = [UserReference(user_ref) for user_ref in set(user_refs)]
+    logins = [user_ref.login for user_ref in object_user_refs if user_ref.is_player()]
+
+    nicknames: dict[str, str] = {}
+    if logins:
+        result = await session.exec(select(Player.login, Player.nickname).where(col(Player.login).in_(logins)))
+        nicknames = {login: nickname for login, nickname in result}
+
+    return {
+        user_ref.reference: UserRefWithNickname(
+            user_ref=user_ref.reference,
+            nickname=nicknames.get(user_ref.login, user_ref.login) if user_ref.is_player() else user_ref.pretty()
+        )
+        for user_ref in object_user_refs
+    }
+
+
 async def get_optional_user_ref_with_nickname(session: AsyncSession, user_ref: UserReference | str | None) -> UserRefWithNickname | None:
     return await get_user_ref_with_nickname(session, user_ref) if user_ref else None
 
@@ -62,45 +89,61 @@ async def is_player_following_player(session: AsyncSession, follower: str | None
     return False
 
 
-async def get_followers(session: AsyncSession, followed_login: str, limit: int, offset: int) -> list[UserRefWithNickname]:
+async def get_followers(session: AsyncSession, followed_login: str, limit: int, offset: int, cursor: KeysetCursor | None = None) -> list[tuple[UserRefWithNickname, datetime]]:
     followers = await session.exec(select(
         PlayerFollowedPlayer.follower_login,
-        Player.nickname
+        Player.nickname,
+        PlayerFollowedPlayer.follows_since
     ).join(
         Player,
         PlayerFollowedPlayer.follower_login == Player.login,
         isouter=True
     ).where(
-        PlayerFollowedPlayer.followed_login == followed_login
+        PlayerFollowedPlayer.followed_login == followed_login,
+        cursor.construct_condition(PlayerFollowedPlayer.follows_since, PlayerFollowedPlayer.follower_login) if cursor else True
+    ).order_by(
+        desc(PlayerFollowedPlayer.follows_since),
+        desc(PlayerFollowedPlayer.follower_login)
     ).limit(limit).offset(offset))
 
     return [
-        UserRefWithNickname(
-            user_ref=login,
-            nickname=nickname
+        (
+            UserRefWithNickname(
+                user_ref=login,
+                nickname=nickname
+            ),
+            follows_since
         )
-        for login, nickname in followers
+        for login, nickname, follows_since in followers
     ]
 
 
-async def get_followed_players(session: AsyncSession, follower_login: str, limit: int, offset: int) -> list[UserRefWithNickname]:
+async def get_followed_players(session: AsyncSession, follower_login: str, limit: int, offset: int, cursor: KeysetCursor | None = None) -> list[tuple[UserRefWithNickname, datetime]]:
     followed_players = await session.exec(select(
         PlayerFollowedPlayer.followed_login,
-        Player.nickname
+        Player.nickname,
+        PlayerFollowedPlayer.follows_since
     ).join(
         Player,
         PlayerFollowedPlayer.followed_login == Player.login,
         isouter=True
     ).where(
-        PlayerFollowedPlayer.follower_login == follower_login
+        PlayerFollowedPlayer.follower_login == follower_login,
+        cursor.construct_condition(PlayerFollowedPlayer.follows_since, PlayerFollowedPlayer.followed_login) if cursor else True
+    ).order_by(
+        desc(PlayerFollowedPlayer.follows_since),
+        desc(PlayerFollowedPlayer.followed_login)
     ).limit(limit).offset(offset))
 
     return [
-        UserRefWithNickname(
-            user_ref=login,
-            nickname=nickname
+        (
+            UserRefWithNickname(
+                user_ref=login,
+                nickname=nickname
+            ),
+            follows_since
         )
-        for login, nickname in followed_players
+        for login, nickname, follows_since in followed_players
     ]
 
 
@@ -140,27 +183,103 @@ async def get_restrictions(session: AsyncSession, restriction_owner_login: str)
     ]
 
 
-async def get_overall_game_stats(
-    session: AsyncSession,
-    player_login: str,
-    overall_counts: game_datatypes.OverallGameCounts,
-    required_calibration_games_cnt: int
-) -> OverallGameStats:
-    db_elo_entries = await session.exec(select(
-        PlayerEloProgress
+async def get_overall_game_stats(session: AsyncSession, player_login: str) -> OverallGameStats:
+    db_stats_entries = await session.exec(select(
+        PlayerStats
     ).where(
-        PlayerEloProgress.login == player_login
-    ).group_by(
-        PlayerEloProgress.time_control_kind
-    ).having(
-        PlayerEloProgress.ts == func.max(PlayerEloProgress.ts)
+        PlayerStats.login == player_login
     ))
 
     full_stats = OverallGameStats()
-    for db_elo_entry in db_elo_entries:
-        full_stats.extend_with(db_elo_entry.time_control_kind, GameStats(
-            elo=db_elo_entry.elo,
-            is_elo_provisional=db_elo_entry.ranked_games_played >= required_calibration_games_cnt,
-            games_cnt=overall_counts.by_time_control[db_elo_entry.time_control_kind]
+    for db_stats_entry in db_stats_entries:
+        full_stats.extend_with(db_stats_entry.time_control_kind, GameStats(
+            elo=db_stats_entry.elo,
+            is_elo_provisional=db_stats_entry.is_elo_provisional,
+            games_cnt=db_stats_entry.games_cnt
         ))
     return full_stats
+
+
+async def to_leaderboard_entries(session: AsyncSession, ranked_players: list[RankedPlayer]) -> list[LeaderboardEntry]:
+    nicknames = await get_user_refs_with_nicknames(session, [ranked_player.login for ranked_player in ranked_players])
+    return [
+        LeaderboardEntry(
+            rank=ranked_player.rank,
+            player=nicknames[ranked_player.login],
+            elo=ranked_player.elo
+        )
+        for ranked_player in ranked_players
+    ]
+
+
+async def get_player_stats_for_update(session: AsyncSession, player_login: str, time_control_kind: TimeControlKind) -> PlayerStats:
+    db_stats_entry = await session.get(PlayerStats, (player_login, time_control_kind), with_for_update=True)
+    return db_stats_entry or PlayerStats(login=player_login, time_control_kind=time_control_kind)
+
+
+async def record_game_result(
+    session: AsyncSession,
+    game: "game_models.Game",
+    outcome_kind: game_datatypes.OutcomeKind,
+    winner: PieceColor | None,
+    elo_params: EloParams
+) -> dict[PieceColor, PlayerStats]:
+    updated_stats: dict[PieceColor, PlayerStats] = {}
+    if outcome_kind == game_datatypes.OutcomeKind.ABORT:
+        return updated_stats
+
+    players = [
+        (color, player_ref)
+        for color, player_ref in ((PieceColor.WHITE, game.white_player_ref), (PieceColor.BLACK, game.black_player_ref))
+        if UserReference(player_ref).is_player()
+    ]
+    for color, player_ref in sorted(players, key=lambda player: player[1]):  # Rows are locked in login order, so that two games between the same players with swapped colors can't deadlock
+        db_stats_entry = await get_player_stats_for_update(session, player_ref, game.time_control_kind)
+        db_stats_entry.games_cnt += 1
+        if winner is None:
+            db_stats_entry.draws += 1
+        elif winner == color:
+            db_stats_entry.wins += 1
+        else:
+            db_stats_entry.losses += 1
+
+        session.add(db_stats_entry)
+        updated_stats[color] = db_stats_entry
+
+    if game.rated and len(updated_stats) == 2:
+        update_elo(session, game, updated_stats, winner, elo_params)
+    return updated_stats
+
+
+def update_elo(
+    session: AsyncSession,
+    game: "game_models.Game",
+    stats: dict[PieceColor, PlayerStats],
+    winner: PieceColor | None,
+    elo_params: EloParams
+) -> None:
+    assert game.id
+    elo_before = {color: stats_entry.elo or elo_params.default for color, stats_entry in stats.items()}
+    deltas = {
+        color: get_elo_delta(
+            elo_before[color],
+            elo_before[color.opposite()],
+            get_score(color, winner),
+            stats_entry.ranked_games_played,
+            elo_params
+        )
+        for color, stats_entry in stats.items()
+    }
+
+    for color, stats_entry in stats.items():
+        stats_entry.elo = elo_before[color] + deltas[color]
+        stats_entry.ranked_games_played += 1
+        stats_entry.is_elo_provisional = stats_entry.ranked_games_played < elo_params.calibration_games
+        session.add(PlayerEloProgress(
+            login=stats_entry.login,
+            time_control_kind=stats_entry.time_control_kind,
+            elo=stats_entry.elo,
+            delta=deltas[color],
+            causing_game_id=game.id,
+            ranked_games_played=stats_entry.ranked_games_played
+        ))
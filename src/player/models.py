@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from src.common.field_types import CurrentDatetime
@@ -60,6 +61,11 @@ class PlayerRestrictionPublic(PlayerRestrictionBase):
 
 
 class PlayerFollowedPlayer(CustomSQLModel, table=True):
+    __table_args__ = (
+        Index("ix_playerfollowedplayer_followed_since", "followed_login", "follows_since", "follower_login"),
+        Index("ix_playerfollowedplayer_follower_since", "follower_login", "follows_since", "followed_login"),
+    )
+
     follower_login: str = Field(primary_key=True, foreign_key="player.login")
     followed_login: str = Field(primary_key=True, foreign_key="player.login")
     follows_since: CurrentDatetime
@@ -76,6 +82,18 @@ class PlayerEloProgress(CustomSQLModel, table=True):  # Used for: current elo re
     ranked_games_played: int
 
 
+class PlayerStats(CustomSQLModel, table=True):  # Materialized from the game history, kept up to date by end_game
+    login: str = Field(primary_key=True, foreign_key="player.login")
+    time_control_kind: TimeControlKind = Field(primary_key=True)
+    games_cnt: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    elo: int | None = None
+    is_elo_provisional: bool = True
+    ranked_games_played: int = 0
+
+
 class PlayerPublic(PlayerBase):
     is_friend: bool
     status: UserStatus
@@ -108,6 +126,24 @@ class RestrictionBatchRemovalPayload(CustomModel):
     restriction: UserRestrictionKind | None = None
 
 
+class LeaderboardEntry(CustomModel):
+    rank: int
+    player: UserRefWithNickname
+    elo: int
+
+
+class LeaderboardPlayerPosition(CustomModel):
+    rank: int
+    elo: int
+    neighbourhood: list[LeaderboardEntry]
+
+
+class LeaderboardChangeBroadcastedData(CustomModel):
+    time_control_kind: TimeControlKind
+    changed_entries: list[LeaderboardEntry]
+    total_players: int
+
+
 class StartedPlayerGamesStateRefresh(CustomModel):
     player_ref: str
     current_games: list[main_game_models.GamePublic]
@@ -1,5 +1,5 @@
 from datetime import datetime, UTC
-from fastapi import APIRouter, HTTPException, Query, UploadFile, Depends
+from fastapi import APIRouter, HTTPException, Query, Response, UploadFile, Depends
 from sqlalchemy import update
 from sqlmodel import col
 
@@ -7,11 +7,15 @@ from src.common.models import UserRefWithNickname
 from src.player.dependencies import DBPlayerDependency
 from src.net.base_router import LoggingRoute
 from src.common.user_ref import UserReference
-from src.player.methods import get_followed_players, get_followers, get_overall_game_stats, get_restrictions, get_roles, is_player_following_player
+from src.player.methods import get_followed_players, get_followers, get_overall_game_stats, get_restrictions, get_roles, is_player_following_player, to_leaderboard_entries
 from src.player.datatypes import GameStats
-from src.common.dependencies import MainConfigDependency, MandatoryPlayerLoginDependency, MutableStateDependency, OptionalPlayerLoginDependency, SessionDependency, verify_admin
+from src.common.dependencies import KeysetCursorDependency, MandatoryPlayerLoginDependency, MutableStateDependency, OptionalPlayerLoginDependency, SessionDependency, verify_admin
 from src.common.field_types import PlayerLogin
+from src.common.time_control import TimeControlKind
+from src.common.pagination import set_next_cursor
 from src.player.models import (
+    LeaderboardEntry,
+    LeaderboardPlayerPosition,
     PlayerFollowedPlayer,
     PlayerPublic,
     PlayerRestriction,
@@ -23,7 +27,6 @@ from src.player.models import (
     RoleOperationPayload,
 )
 
-import src.game.methods.get as game_get_methods
 import src.study.methods as study_methods
 import src.pubsub.models.channel as pubsub_models
 
@@ -31,26 +34,68 @@ import src.pubsub.models.channel as pubsub_models
 router = APIRouter(prefix="/player", route_class=LoggingRoute)
 
 
+@router.get("/leaderboard/{time_control_kind}", response_model=list[LeaderboardEntry])
+async def get_leaderboard(
+    *,
+    session: SessionDependency,
+    state: MutableStateDependency,
+    time_control_kind: TimeControlKind,
+    offset: int = 0,
+    limit: int = Query(default=50, le=100)
+):
+    ranked_players = state.leaderboards[time_control_kind].get_top(offset, limit)
+    return await to_leaderboard_entries(session, ranked_players)
+
+
+@router.get("/{login}/leaderboard/{time_control_kind}", response_model=LeaderboardPlayerPosition)
+async def get_player_leaderboard_position(
+    *,
+    session: SessionDependency,
+    state: MutableStateDependency,
+    login: PlayerLogin,
+    time_control_kind: TimeControlKind,
+    radius: int = Query(default=5, ge=0, le=25)
+):
+    leaderboard = state.leaderboards[time_control_kind]
+    ranked_player = leaderboard.get_player(login)
+    if not ranked_player:
+        raise HTTPException(status_code=404, detail="The player is not ranked in this time control")
+
+    return LeaderboardPlayerPosition(
+        rank=ranked_player.rank,
+        elo=ranked_player.elo,
+        neighbourhood=await to_leaderboard_entries(session, leaderboard.get_neighbourhood(login, radius))
+    )
+
+
 @router.get("/{login}/followers", response_model=list[UserRefWithNickname])
 async def get_player_followers(
     *,
     session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
     login: PlayerLogin,
     offset: int = 0,
     limit: int = Query(default=50, le=100)
 ):
-    await get_followers(session, login, limit, offset)
+    rows = await get_followers(session, login, limit, offset, cursor)
+    set_next_cursor(response, rows, limit, lambda row: (row[1], row[0].user_ref))
+    return [user for user, _ in rows]
 
 
 @router.get("/{login}/followed", response_model=list[UserRefWithNickname])
 async def get_player_followed_players(
     *,
     session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
     login: PlayerLogin,
     offset: int = 0,
     limit: int = Query(default=50, le=100)
 ):
-    await get_followed_players(session, login, limit, offset)
+    rows = await get_followed_players(session, login, limit, offset, cursor)
+    set_next_cursor(response, rows, limit, lambda row: (row[1], row[0].user_ref))
+    return [user for user, _ in rows]
 
 
 @router.get("/{login}", response_model=PlayerPublic)
@@ -60,11 +105,9 @@ async def get_player(
     login: PlayerLogin,
     db_player: DBPlayerDependency,
     state: MutableStateDependency,
-    client_login: OptionalPlayerLoginDependency,
-    main_config: MainConfigDependency
+    client_login: OptionalPlayerLoginDependency
 ):
-    game_counts = await game_get_methods.get_overall_player_game_counts(session, login)
-    game_stats = await get_overall_game_stats(session, login, game_counts, main_config.elo.calibration_games)
+    game_stats = await get_overall_game_stats(session, login)
 
     user_ref = UserReference.logged(login)
     player = PlayerPublic(
@@ -74,7 +117,7 @@ async def get_player(
         is_friend=await is_player_following_player(session, client_login, login),
         status=state.get_user_status_in_channel(user_ref, pubsub_models.IncomingChallengesEventChannel(user_ref=login)),
         per_time_control_stats=game_stats.by_time_control,
-        total_stats=GameStats(elo=game_stats.best.elo, is_elo_provisional=game_stats.best.is_elo_provisional, games_cnt=game_counts.total),
+        total_stats=GameStats(elo=game_stats.best.elo, is_elo_provisional=game_stats.best.is_elo_provisional, games_cnt=sum(stats.games_cnt for stats in game_stats.by_time_control.values())),
         studies_cnt=await study_methods.get_player_studies_cnt(session, login, client_login == login),
         roles=await get_roles(session, login, db_player.preferred_role),
         restrictions=await get_restrictions(session, login)
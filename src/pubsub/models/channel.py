@@ -1,6 +1,7 @@
 from typing import Annotated, ClassVar, Literal, Union
 from pydantic import Field
 
+from src.common.time_control import TimeControlKind
 from src.utils.custom_model import CustomFrozenModel
 
 
@@ -47,6 +48,13 @@ class StartedPlayerGamesEventChannel(CustomFrozenModel, frozen=True):
     watched_ref: str
 
 
+class LeaderboardEventChannel(CustomFrozenModel, frozen=True):
+    group: ClassVar[str] = 'leaderboard'
+    channel_group: Literal['leaderboard'] = 'leaderboard'
+
+    time_control_kind: TimeControlKind
+
+
 class SubscriberListEventChannel(CustomFrozenModel, frozen=True):
     group: ClassVar[str] = 'subscriber_list'
     channel_group: Literal['subscriber_list'] = 'subscriber_list'
@@ -59,6 +67,7 @@ class SubscriberListEventChannel(CustomFrozenModel, frozen=True):
         OutgoingChallengesEventChannel,
         GameEventChannel,
         StartedPlayerGamesEventChannel,
+        LeaderboardEventChannel,
     ]
 
 
@@ -69,6 +78,7 @@ type SubEligibleEventChannel = Union[
     OutgoingChallengesEventChannel,
     GameEventChannel,
     StartedPlayerGamesEventChannel,
+    LeaderboardEventChannel,
     SubscriberListEventChannel,
 ]
 
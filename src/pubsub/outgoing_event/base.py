@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 from html import escape
 from types import NoneType
-from typing import get_args
+from typing import ClassVar, get_args
 from pydantic import BaseModel
 
+import json
+
+from src.net.datatypes import OutboundPriority
 from src.pubsub.models.channel import EventChannel
 from src.utils.string import camel_to_snake
 
@@ -13,6 +16,9 @@ class OutgoingEvent[PayloadType: BaseModel | None, TargetChannelType: EventChann
     payload: PayloadType
     target_channel: TargetChannelType
 
+    priority: ClassVar[OutboundPriority] = OutboundPriority.NORMAL  # Backlogged connections get higher priorities first and may lose low ones
+    coalescable: ClassVar[bool] = False  # A newer event of the same kind on the same channel fully supersedes an undelivered older one
+
     @classmethod
     def name(cls) -> str:
         return camel_to_snake(cls.__name__)
@@ -66,13 +72,23 @@ class OutgoingEvent[PayloadType: BaseModel | None, TargetChannelType: EventChann
             return None
         return payload_example.model_dump()
 
+    def coalesce_key(self) -> tuple[str, str | None] | None:
+        if not self.coalescable:
+            return None
+        return self.name(), self.target_channel.model_dump_json() if not isinstance(self.target_channel, NoneType) else None
+
     def to_dict(self) -> dict:
         return dict(
             event=self.name(),
-            channel=self.target_channel.model_dump() if not isinstance(self.target_channel, NoneType) else None,
-            body=self.payload.model_dump() if not isinstance(self.payload, NoneType) else None
+            channel=self.target_channel.model_dump(mode='json') if not isinstance(self.target_channel, NoneType) else None,
+            body=self.payload.model_dump(mode='json') if not isinstance(self.payload, NoneType) else None
         )
 
+    def to_json(self) -> str:  # The same document as to_dict() describes, but serialized by pydantic straight from the models
+        channel = self.target_channel.model_dump_json() if not isinstance(self.target_channel, NoneType) else "null"
+        body = self.payload.model_dump_json() if not isinstance(self.payload, NoneType) else "null"
+        return f'{{"event":{json.dumps(self.name())},"channel":{channel},"body":{body}}}'
+
 
 class RefreshEvent[PayloadType: BaseModel, RefreshedChannelType: EventChannel](OutgoingEvent[PayloadType, None]):
     def __init__(self, payload: PayloadType) -> None:
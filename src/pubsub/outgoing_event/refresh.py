@@ -5,6 +5,7 @@ from src.game.models.main import GameStateRefresh
 from src.game.models.other import GameListChannelsStateRefresh
 from src.game.models.outcome import GameOutcomePublic
 from src.game.models.time_update import GameTimeUpdatePublic, GameTimeUpdateReason
+from src.net.datatypes import OutboundPriority
 from src.player.models import StartedPlayerGamesStateRefresh
 from src.pubsub.models.channel import (
     GameEventChannel,
@@ -30,6 +31,8 @@ class StartedPlayerGamesRefresh(RefreshEvent[StartedPlayerGamesStateRefresh, Sta
 
 
 class PublicChallengeListRefresh(RefreshEvent[ChallengeListStateRefresh, PublicChallengeListEventChannel]):
+    coalescable = True
+
     @classmethod
     def payload_example(cls) -> ChallengeListStateRefresh:
         return ChallengeListStateRefresh(
@@ -38,6 +41,9 @@ class PublicChallengeListRefresh(RefreshEvent[ChallengeListStateRefresh, PublicC
 
 
 class GameListRefresh(RefreshEvent[GameListChannelsStateRefresh, GameListEventChannel]):
+    priority = OutboundPriority.LOW  # The same lane as NewActiveGame and NewRecentGame, so that no stale update can overtake it
+    coalescable = True
+
     @classmethod
     def payload_example(cls) -> GameListChannelsStateRefresh:
         return GameListChannelsStateRefresh(
@@ -62,6 +68,8 @@ class OutgoingChallengesRefresh(RefreshEvent[ChallengeListStateRefresh, Outgoing
 
 
 class GameRefresh(RefreshEvent[GameStateRefresh, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def payload_example(cls) -> GameStateRefresh:
         return GameStateRefresh(  # TODO: Replace field values with imported examples
@@ -90,6 +98,7 @@ class GameRefresh(RefreshEvent[GameStateRefresh, GameEventChannel]):
 
 
 class SubscriberListRefresh(RefreshEvent[SubscriberListEventChannelState, SubscriberListEventChannel]):
+    priority = OutboundPriority.LOW  # The same lane as NewSubscriber and SubscriberLeft
     @classmethod
     def payload_example(cls) -> SubscriberListEventChannelState:
         return SubscriberListEventChannelState(
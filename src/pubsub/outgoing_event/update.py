@@ -9,16 +9,20 @@ from src.game.models.chat import ChatMessageBroadcastedData, GameChatMessageEven
 from src.game.models.main import GamePublic, GameStartedBroadcastedData
 from src.game.models.offer import GameOfferEventPublic, OfferActionBroadcastedData
 from src.game.models.outcome import GameEndedBroadcastedData, GameOutcomePublic
-from src.game.models.ply import GamePlyEventPublic, PlyBroadcastedData
+from src.game.models.ply import GamePlyEventPublic, PlyBatchBroadcastedData, PlyBroadcastedData
 from src.game.models.rollback import GameRollbackEventPublic, RollbackBroadcastedData
 from src.game.models.time_added import GameTimeAddedEventPublic, TimeAddedBroadcastedData
 from src.game.models.time_control import GameFischerTimeControlPublic
 from src.game.models.time_update import GameTimeUpdatePublic, GameTimeUpdateReason
+from src.net.datatypes import OutboundPriority
+from src.player.models import LeaderboardChangeBroadcastedData, LeaderboardEntry
 from src.pubsub.models.channel import (
+    EventChannel,
     EveryoneEventChannel,
     GameEventChannel,
     GameListEventChannel,
     IncomingChallengesEventChannel,
+    LeaderboardEventChannel,
     OutgoingChallengesEventChannel,
     PublicChallengeListEventChannel,
     StartedPlayerGamesEventChannel,
@@ -32,12 +36,16 @@ from src.rules.piece import PieceColor, PieceKind
 
 
 class ServerShutdown(OutgoingEvent[None, EveryoneEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever the server starts preparing for the shutdown"
 
 
 class GameStarted(OutgoingEvent[GamePublic, StartedPlayerGamesEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def title(cls) -> str:
         return "Game Started (for player's followers)"
@@ -209,6 +217,8 @@ class PublicChallengesCancelledByServer(OutgoingEvent[IdList, PublicChallengeLis
 
 
 class NewActiveGame(OutgoingEvent[GameStartedBroadcastedData, GameListEventChannel]):
+    priority = OutboundPriority.LOW
+
     @classmethod
     def title(cls) -> str:
         return "Game Started (for game lists watchers)"
@@ -241,6 +251,8 @@ class NewActiveGame(OutgoingEvent[GameStartedBroadcastedData, GameListEventChann
 
 
 class NewRecentGame(OutgoingEvent[GameEndedBroadcastedData, GameListEventChannel]):
+    priority = OutboundPriority.LOW
+
     @classmethod
     def title(cls) -> str:
         return "Game Ended (for game lists watchers)"
@@ -356,6 +368,8 @@ class OutgoingChallengesCancelledByServer(OutgoingEvent[IdList, OutgoingChalleng
 
 
 class NewPly(OutgoingEvent[PlyBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a new move happens on the board"
@@ -381,7 +395,25 @@ class NewPly(OutgoingEvent[PlyBroadcastedData, GameEventChannel]):
         )
 
 
+class NewPlyBatch(OutgoingEvent[PlyBatchBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
+    @classmethod
+    def description(cls) -> str:
+        return "Broadcasted whenever several moves are appended to an external game at once"
+
+    @classmethod
+    def payload_example(cls) -> PlyBatchBroadcastedData:
+        return PlyBatchBroadcastedData(
+            game_id=123,
+            plys=[
+                NewPly.payload_example()
+            ]
+        )
+
+
 class NewChatMessage(OutgoingEvent[ChatMessageBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL  # The same lane as GameRefresh, which includes the chat
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a new chat message arrives"
@@ -400,6 +432,8 @@ class NewChatMessage(OutgoingEvent[ChatMessageBroadcastedData, GameEventChannel]
 
 
 class OfferActionPerformed(OutgoingEvent[OfferActionBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a draw or takeback offer is created, cancelled, accepted or rejected"
@@ -415,6 +449,8 @@ class OfferActionPerformed(OutgoingEvent[OfferActionBroadcastedData, GameEventCh
 
 
 class TimeAdded(OutgoingEvent[TimeAddedBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a player decides to add time to the opponent's reserves"
@@ -436,6 +472,8 @@ class TimeAdded(OutgoingEvent[TimeAddedBroadcastedData, GameEventChannel]):
 
 
 class Rollback(OutgoingEvent[RollbackBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever some of the last moves get cancelled"
@@ -459,6 +497,8 @@ class Rollback(OutgoingEvent[RollbackBroadcastedData, GameEventChannel]):
 
 
 class GameEnded(OutgoingEvent[GameEndedBroadcastedData, GameEventChannel]):
+    priority = OutboundPriority.CRITICAL
+
     @classmethod
     def title(cls) -> str:
         return "Game Ended (for specific game watchers)"
@@ -483,7 +523,36 @@ class GameEnded(OutgoingEvent[GameEndedBroadcastedData, GameEventChannel]):
         )
 
 
+class LeaderboardChanged(OutgoingEvent[LeaderboardChangeBroadcastedData, LeaderboardEventChannel]):
+    priority = OutboundPriority.LOW
+
+    @classmethod
+    def description(cls) -> str:
+        return "Broadcasted whenever a rated game changes the positions of its players in the leaderboard. Ranks of other players may shift by one as a result"
+
+    @classmethod
+    def payload_example(cls) -> LeaderboardChangeBroadcastedData:
+        return LeaderboardChangeBroadcastedData(
+            time_control_kind=TimeControlKind.BLITZ,
+            changed_entries=[
+                LeaderboardEntry(
+                    rank=12,
+                    player=UserRefWithNickname(user_ref="some_login", nickname="Some Nickname"),
+                    elo=1873
+                ),
+                LeaderboardEntry(
+                    rank=40,
+                    player=UserRefWithNickname(user_ref="another_login", nickname="Another Nickname"),
+                    elo=1702
+                )
+            ],
+            total_players=1500
+        )
+
+
 class NewSubscriber(OutgoingEvent[UserRefWithNickname, SubscriberListEventChannel]):
+    priority = OutboundPriority.LOW
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a new user subscribes to a respective channel"
@@ -497,6 +566,8 @@ class NewSubscriber(OutgoingEvent[UserRefWithNickname, SubscriberListEventChanne
 
 
 class SubscriberLeft(OutgoingEvent[UserRefWithNickname, SubscriberListEventChannel]):
+    priority = OutboundPriority.LOW
+
     @classmethod
     def description(cls) -> str:
         return "Broadcasted whenever a new user unsubscribes from a respective channel"
@@ -507,3 +578,11 @@ class SubscriberLeft(OutgoingEvent[UserRefWithNickname, SubscriberListEventChann
             user_ref="some_login",
             nickname="Some Nickname"
         )
+
+
+class ChannelResyncRequired(OutgoingEvent[None, EventChannel]):
+    coalescable = True
+
+    @classmethod
+    def description(cls) -> str:
+        return "Sent to a backlogged connection in place of the channel updates it had to skip. Resubscribe to the channel to get its actual state"
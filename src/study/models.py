@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Any
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship
 
 from src.common.models import UserRefWithNickname
@@ -82,6 +83,10 @@ class StudyBase(CustomSQLModel):
 
 
 class Study(StudyBase, table=True):
+    __table_args__ = (
+        Index("ix_study_created_at_id", "created_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     created_at: CurrentDatetime
     modified_at: CurrentDatetime
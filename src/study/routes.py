@@ -1,11 +1,12 @@
-from fastapi import APIRouter, HTTPException, Query
-from sqlmodel import col, distinct, select
+from fastapi import APIRouter, HTTPException, Query, Response
+from sqlmodel import col, desc, distinct, select
 
 from src.common.field_types import PlayerLogin
 from src.net.base_router import LoggingRoute
 from src.study.models import Study, StudyCreate, StudyPublic, StudyTag, StudyUpdate
 from src.study.datatypes import StudyPublicity
-from src.common.dependencies import OptionalPlayerLoginDependency, SessionDependency, MandatoryPlayerLoginDependency
+from src.common.dependencies import KeysetCursorDependency, OptionalPlayerLoginDependency, SessionDependency, MandatoryPlayerLoginDependency
+from src.common.pagination import set_next_cursor
 
 
 router = APIRouter(prefix="/study", route_class=LoggingRoute)
@@ -26,6 +27,8 @@ async def create_study(*, session: SessionDependency, client_login: MandatoryPla
 async def list_studies(
     *,
     session: SessionDependency,
+    response: Response,
+    cursor: KeysetCursorDependency,
     author_login: PlayerLogin | None = None,
     tags: list[str] | None = None,
     offset: int = 0,
@@ -43,9 +46,15 @@ async def list_studies(
         fitting_ids = select(distinct(StudyTag.study_id)).where(col(StudyTag.tag).in_(tags))
         query = query.where(col(Study.id).in_(fitting_ids))
 
-    query = query.offset(offset).limit(limit)
+    if cursor:
+        query = query.where(cursor.construct_condition(Study.created_at, Study.id))
+
+    query = query.order_by(desc(Study.created_at), desc(Study.id)).offset(offset).limit(limit)
     result = await session.exec(query)
-    return [await db_study.to_public(session) for db_study in result]
+    db_studies = result.all()
+
+    set_next_cursor(response, db_studies, limit, lambda db_study: (db_study.created_at, db_study.id))
+    return [await db_study.to_public(session) for db_study in db_studies]
 
 
 @router.get("/{study_id}", response_model=StudyPublic)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from math import log
+from random import random
+from typing import Any, Iterator
+
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key: Any, level: int, next_node: _Node | None = None) -> None:
+        self.key = key
+        self.next: list[_Node] = [next_node or self] * level
+        self.width: list[int] = [1] * level
+
+
+class IndexableSkipList[K]:  # Sorted unique keys with O(log n) expected insertion, removal, rank lookup and access by rank
+    def __init__(self) -> None:
+        self._tail = _Node(None, 0)
+        self._head = _Node(None, MAX_LEVEL, self._tail)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _find_predecessors(self, key: K) -> tuple[list[_Node], list[int]]:
+        predecessors = [self._head] * MAX_LEVEL
+        steps_at_level = [0] * MAX_LEVEL
+        node = self._head
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            predecessors[level] = node
+        return predecessors, steps_at_level
+
+    def add(self, key: K) -> None:
+        predecessors, steps_at_level = self._find_predecessors(key)
+        if predecessors[0].next[0] is not self._tail and predecessors[0].next[0].key == key:
+            raise KeyError(key)
+
+        node_level = min(MAX_LEVEL, 1 - int(log(1 - random(), 2)))
+        new_node = _Node(key, node_level, self._tail)
+        steps = 0
+        for level in range(node_level):
+            predecessor = predecessors[level]
+            new_node.next[level] = predecessor.next[level]
+            predecessor.next[level] = new_node
+            new_node.width[level] = predecessor.width[level] - steps
+            predecessor.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(node_level, MAX_LEVEL):
+            predecessors[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key: K) -> None:
+        predecessors, _ = self._find_predecessors(key)
+        target = predecessors[0].next[0]
+        if target is self._tail or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            predecessor = predecessors[level]
+            predecessor.width[level] += target.width[level] - 1
+            predecessor.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVEL):
+            predecessors[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key: K) -> int:
+        predecessors, steps_at_level = self._find_predecessors(key)
+        target = predecessors[0].next[0]
+        if target is self._tail or target.key != key:
+            raise KeyError(key)
+        return sum(steps_at_level)
+
+    def _node_at(self, index: int) -> _Node:
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not self._tail and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> K:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+    def islice(self, start: int, stop: int) -> Iterator[K]:
+        start, stop = max(start, 0), min(stop, self._size)
+        if start >= stop:
+            return
+        node = self._node_at(start)
+        for _ in range(stop - start):
+            yield node.key
+            node = node.next[0]
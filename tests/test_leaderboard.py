@@ -0,0 +1,29 @@
+from src.player.leaderboard import Leaderboard, RankedPlayer
+
+
+def make_leaderboard(player_cnt: int) -> Leaderboard:
+    leaderboard = Leaderboard()
+    for index in range(player_cnt):
+        leaderboard.update(f"player{index}", 2000 - index)  # player0 is the best one
+    return leaderboard
+
+
+def test_neighbourhood_at_top_edge():
+    leaderboard = make_leaderboard(10)
+    assert leaderboard.get_neighbourhood("player0", 3) == [
+        RankedPlayer(rank=rank, login=f"player{rank - 1}", elo=2001 - rank)
+        for rank in range(1, 5)
+    ]
+
+
+def test_neighbourhood_at_bottom_edge():
+    leaderboard = make_leaderboard(10)
+    assert leaderboard.get_neighbourhood("player9", 3) == [
+        RankedPlayer(rank=rank, login=f"player{rank - 1}", elo=2001 - rank)
+        for rank in range(7, 11)
+    ]
+
+
+def test_neighbourhood_in_the_middle():
+    leaderboard = make_leaderboard(10)
+    assert [player.rank for player in leaderboard.get_neighbourhood("player4", 2)] == [3, 4, 5, 6, 7]